@@ -0,0 +1,308 @@
+"""
+Benchmark bmi_dbseabed against synthetic rasters served over local HTTP.
+
+Results are saved as JSON named after the current git commit, so runs on
+different commits can be compared::
+
+    python benchmarks/run.py --sizes small,medium
+    python benchmarks/run.py --compare .benchmarks/<commit>.json
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import click
+import numpy
+import yaml
+from bmi_dbseabed import BmiDbSeabed
+from bmi_dbseabed import DbSeabed
+from server import RangeServer
+from synthetic import make_rasters
+from synthetic import SIZES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, ".benchmarks")
+CACHE_DIR = os.path.join(RESULTS_DIR, "rasters")
+
+VAR_NAME = "carbonate"
+FULL_BBOX = (-98.0, 18.0, -80.0, 31.0)
+QUARTER_BBOX = (-93.5, 21.25, -84.5, 27.75)
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# run in a fresh interpreter, so each repeat starts with cold GDAL and
+# package caches, and report the growth of the peak resident set size
+_CHILD = """
+import json
+import resource
+import sys
+import time
+
+import rasterio
+import rioxarray
+from bmi_dbseabed import BmiDbSeabed
+from bmi_dbseabed import DbSeabed
+
+DbSeabed.DATA_SERVICES[{var_name!r}]["link"] = {link!r}
+
+
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+before = peak_rss()
+start = time.perf_counter()
+result = {statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "rss": peak_rss() - before, "result": result}}))
+"""
+
+
+def _measure(statement, repeat):
+    """
+    Median wall time and largest peak RSS growth of a statement, each repeat
+    run in a fresh interpreter.
+    """
+    code = _CHILD.format(
+        var_name=VAR_NAME,
+        link=DbSeabed.DATA_SERVICES[VAR_NAME]["link"],
+        statement=statement,
+    )
+    times = []
+    rss = 0
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        measure = json.loads(output.splitlines()[-1])
+        times.append(measure["seconds"])
+        rss = max(rss, measure["rss"])
+    return statistics.median(times), rss, measure["result"]
+
+
+def _per_call(func):
+    """Seconds per call of a fast function."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def bench_startup(repeat):
+    """Wall time of fresh interpreters importing the package and running the CLI."""
+    commands = {
+        "startup_import": "import bmi_dbseabed",
+        "startup_data_services": (
+            "import bmi_dbseabed; bmi_dbseabed.DbSeabed().data_services"
+        ),
+        "startup_cli_help": "from bmi_dbseabed.cli import main; main(['--help'])",
+        "startup_python": "pass",
+    }
+    results = {}
+    for key, code in commands.items():
+        times = []
+        for _ in range(max(repeat, 5)):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, check=False
+            )
+            times.append(time.perf_counter() - start)
+        results[key] = {"seconds": statistics.median(times)}
+    return results
+
+
+def bench_get_data(server, workdir, repeat):
+    results = {}
+    for label, bbox in (("full", FULL_BBOX), ("quarter", QUARTER_BBOX)):
+        output = os.path.join(workdir, f"get_data_{label}.tif")
+        sent = server.bytes_sent
+
+        seconds, rss, shape = _measure(
+            f"DbSeabed().get_data({VAR_NAME!r}, *{bbox!r}, output={output!r}).shape",
+            repeat,
+        )
+        cells = int(numpy.prod(shape))
+        results[f"get_data_{label}"] = {
+            "seconds": seconds,
+            "cells_per_s": cells / seconds,
+            "output_mb_per_s": os.path.getsize(output) / seconds / 1e6,
+            "transferred_mb": (server.bytes_sent - sent) / repeat / 1e6,
+            "peak_rss_mb": rss / 1e6,
+        }
+    return results
+
+
+def bench_bmi(workdir, repeat):
+    def write_config(name, **options):
+        path = os.path.join(workdir, name)
+        with open(path, "w") as fp:
+            yaml.safe_dump(
+                {
+                    "bmi-dbseabed": dict(
+                        zip(("west", "south", "east", "north"), FULL_BBOX),
+                        var_name=VAR_NAME,
+                        output=os.path.join(workdir, "bmi.tif"),
+                        **options,
+                    )
+                },
+                fp,
+            )
+        return path
+
+    def initialize(config_file):
+        model = BmiDbSeabed()
+        model.initialize(config_file)
+        return model
+
+    config_file = write_config("config.yaml")
+    seconds, rss, _ = _measure(f"BmiDbSeabed().initialize({config_file!r})", repeat)
+    results = {"bmi_initialize": {"seconds": seconds, "peak_rss_mb": rss / 1e6}}
+
+    # the first run writes the snapshot, the measured runs restore it
+    snapshot_config = write_config(
+        "snapshot.yaml",
+        snapshot=True,
+        snapshot_dir=os.path.join(workdir, "cache"),
+    )
+    initialize(snapshot_config).finalize()
+    seconds, rss, _ = _measure(f"BmiDbSeabed().initialize({snapshot_config!r})", repeat)
+    results["bmi_initialize_snapshot"] = {"seconds": seconds, "peak_rss_mb": rss / 1e6}
+
+    model = initialize(config_file)
+    name = model.get_output_var_names()[0]
+    dest = numpy.empty(model.get_grid_size(0), dtype=model.get_var_type(name))
+    inds = numpy.random.default_rng(0).integers(0, dest.size, 1000)
+    at_indices = numpy.empty(inds.size, dtype=dest.dtype)
+
+    calls = {
+        "bmi_get_value": lambda: model.get_value(name, dest),
+        "bmi_get_value_ptr": lambda: model.get_value_ptr(name),
+        "bmi_get_value_at_indices": lambda: model.get_value_at_indices(
+            name, at_indices, inds
+        ),
+    }
+    # the calls fill preallocated arrays, so only their time is measured
+    for key, func in calls.items():
+        results[key] = {"seconds": _per_call(func)}
+
+    model.finalize()
+    return results
+
+
+def run(sizes, repeat):
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {"startup": bench_startup(repeat)},
+    }
+    links = {key: value["link"] for key, value in DbSeabed.DATA_SERVICES.items()}
+
+    with RangeServer(CACHE_DIR) as server, tempfile.TemporaryDirectory() as workdir:
+        try:
+            for size in sizes:
+                files = make_rasters(CACHE_DIR, size, [VAR_NAME])
+                DbSeabed.DATA_SERVICES[VAR_NAME]["link"] = server.url(files[VAR_NAME])
+
+                results = bench_get_data(server, workdir, repeat)
+                results.update(bench_bmi(workdir, repeat))
+                report["results"][size] = {"shape": SIZES[size], **results}
+        finally:
+            for key, link in links.items():
+                DbSeabed.DATA_SERVICES[key]["link"] = link
+
+    return report
+
+
+def compare(base, head, threshold):
+    """Print the time ratios of two reports and return the regressions."""
+    regressions = []
+    click.echo(f"{'benchmark':<40} {base['commit']:>10} {head['commit']:>10} ratio")
+    for size, results in head["results"].items():
+        for key, values in results.items():
+            try:
+                old = base["results"][size][key]["seconds"]
+            except (KeyError, TypeError):
+                continue
+            new = values["seconds"]
+            ratio = new / old
+            flag = " *" if ratio > threshold else ""
+            click.echo(
+                f"{size + '/' + key:<40} {old:>10.3g} {new:>10.3g} {ratio:.2f}{flag}"
+            )
+            if flag:
+                regressions.append(f"{size}/{key}")
+    return regressions
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="small,medium",
+    help=f"Comma separated raster sizes to run, from {', '.join(SIZES)}.",
+)
+@click.option("--repeat", default=3, help="Repetitions of the slow benchmarks.")
+@click.option(
+    "--compare",
+    "base_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Saved result file to compare the new results with.",
+)
+@click.option(
+    "--threshold",
+    default=1.2,
+    help="Time ratio above which a benchmark is reported as a regression.",
+)
+def main(sizes, repeat, base_file, threshold):
+    sizes = sizes.split(",")
+    for size in sizes:
+        if size not in SIZES:
+            raise click.BadParameter(f"unknown size {size!r}", param_hint="--sizes")
+
+    # read the base first, it is overwritten when run again on the same commit
+    base = None
+    if base_file:
+        with open(base_file) as fp:
+            base = json.load(fp)
+
+    report = run(sizes, repeat)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    with open(output, "w") as fp:
+        json.dump(report, fp, indent=2)
+    click.echo(f"Results saved to {output}")
+
+    if base:
+        regressions = compare(base, report, threshold)
+        if regressions:
+            raise SystemExit(f"Regressions: {', '.join(regressions)}")
+    else:
+        click.echo(json.dumps(report["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
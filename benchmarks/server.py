@@ -0,0 +1,120 @@
+"""Local HTTP server with Range request support, standing in for csdms.colorado.edu."""
+from __future__ import annotations
+
+import functools
+import multiprocessing
+import os
+import re
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from a directory, answering single byte ranges with 206."""
+
+    def send_head(self):
+        match = _RANGE.match(self.headers.get("Range", "").strip())
+        if match is None or self.command != "GET":
+            return super().send_head()
+
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+
+        size = os.path.getsize(path)
+        first, last = match.groups()
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        end = min(end, size - 1)
+        if start > end:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return None
+
+        fp = open(path, "rb")
+        fp.seek(start)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", "image/tiff")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self._remaining = end - start + 1
+        return fp
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(remaining, 64 * 1024))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+        with self.server.bytes_sent.get_lock():
+            self.server.bytes_sent.value += self._remaining - remaining
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(directory, port, bytes_sent, ready):
+    handler = functools.partial(RangeRequestHandler, directory=directory)
+    httpd = ThreadingHTTPServer(("127.0.0.1", port.value), handler)
+    httpd.bytes_sent = bytes_sent
+    port.value = httpd.server_address[1]
+    ready.set()
+    httpd.serve_forever()
+
+
+class RangeServer:
+    """
+    Serve a directory on a local port in a child process.
+
+    The server runs in its own process because GDAL holds the GIL while it
+    fetches remote data, which would stall a server thread in the same process.
+
+    >>> with RangeServer(".") as server:  # doctest: +SKIP
+    ...     url = server.url("file.tif")
+    """
+
+    def __init__(self, directory, port=0):
+        context = multiprocessing.get_context("spawn")
+        self._port = context.Value("i", port)
+        self._bytes_sent = context.Value("q", 0)
+        self._ready = context.Event()
+        self._process = context.Process(
+            target=_serve,
+            args=(
+                os.path.abspath(directory),
+                self._port,
+                self._bytes_sent,
+                self._ready,
+            ),
+            daemon=True,
+        )
+
+    @property
+    def bytes_sent(self):
+        return self._bytes_sent.value
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self._port.value}/{name}"
+
+    def __enter__(self):
+        self._process.start()
+        if not self._ready.wait(timeout=30):
+            raise RuntimeError("The benchmark HTTP server did not start.")
+        return self
+
+    def __exit__(self, *args):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,82 @@
+"""Synthetic dbSEABED-like GeoTIFFs for benchmarks."""
+from __future__ import annotations
+
+import os
+
+import numpy
+import rasterio
+from rasterio.transform import from_bounds
+
+# Gulf of Mexico extent of the dbSEABED rasters
+BOUNDS = (-98.0, 18.0, -80.0, 31.0)
+NODATA = -9999.0
+
+SIZES = {
+    "small": (512, 704),
+    "medium": (2048, 2816),
+    "large": (4096, 5632),
+}
+
+
+def make_raster(path, shape, seed=0, blocksize=256):
+    """
+    Write a float32 percent field with smooth structure and a no-data "land" area.
+
+    Args:
+        path: Output GeoTIFF path.
+        shape: (rows, cols) of the raster.
+        seed: Seed of the random noise.
+        blocksize: Size of the internal tiles.
+
+    Returns:
+        str: The output path.
+    """
+    rows, cols = shape
+    rng = numpy.random.default_rng(seed)
+    profile = {
+        "driver": "GTiff",
+        "width": cols,
+        "height": rows,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:4326",
+        "transform": from_bounds(*BOUNDS, cols, rows),
+        "nodata": NODATA,
+        "tiled": True,
+        "blockxsize": blocksize,
+        "blockysize": blocksize,
+    }
+
+    y = numpy.linspace(0, 1, rows, dtype="float32")[:, None]
+    with rasterio.open(path, "w", **profile) as dst:
+        # write in strips so large rasters are never held in memory at once
+        for row in range(0, rows, blocksize):
+            stop = min(row + blocksize, rows)
+            x = numpy.linspace(0, 1, cols, dtype="float32")[None, :]
+            values = 50 + 30 * numpy.sin(6 * x) * numpy.cos(4 * y[row:stop])
+            values = values + rng.normal(0, 5, (stop - row, cols)).astype("float32")
+            values = numpy.clip(values, 0, 100).astype("float32")
+            # the north-west corner stands in for land
+            land = (y[row:stop] < 0.3) & (x < 0.25)
+            values[land] = NODATA
+            dst.write(values, 1, window=((row, stop), (0, cols)))
+
+    return path
+
+
+def make_rasters(directory, size, var_names):
+    """
+    Write one synthetic raster per variable.
+
+    Returns:
+        dict: File name of the raster of each variable.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for seed, var_name in enumerate(var_names):
+        name = f"{size}_{var_name}.tif"
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            make_raster(path, SIZES[size], seed=seed)
+        files[var_name] = name
+    return files
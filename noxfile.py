@@ -40,6 +40,13 @@ def test_notebooks(session: nox.Session) -> None:
     )
 
 
+@nox.session
+def benchmark(session: nox.Session) -> None:
+    """Run the benchmarks against synthetic rasters on a local HTTP server."""
+    session.install(".")
+    session.run("python", "benchmarks/run.py", *session.posargs)
+
+
 @nox.session
 def lint(session: nox.Session) -> None:
     """Look for lint."""
@@ -1,8 +1,27 @@
 from __future__ import annotations
 
-from bmi_dbseabed.bmi import BmiDbSeabed
-from bmi_dbseabed.dbseabed import DbSeabed
-
 from ._version import __version__
 
-__all__ = ["__version__", "BmiDbSeabed", "DbSeabed"]
+__all__ = ["__version__", "BmiDbSeabed", "DbSeabed", "DbSeabedEngine"]
+
+
+def __getattr__(name):
+    # import on first access so that the CLI and ``import bmi_dbseabed`` do
+    # not load bmipy, numpy, xarray or GDAL until they are needed
+    if name == "BmiDbSeabed":
+        from bmi_dbseabed.bmi import BmiDbSeabed
+
+        return BmiDbSeabed
+    if name == "DbSeabed":
+        from bmi_dbseabed.dbseabed import DbSeabed
+
+        return DbSeabed
+    if name == "DbSeabedEngine":
+        from bmi_dbseabed.engine import DbSeabedEngine
+
+        return DbSeabedEngine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + ["BmiDbSeabed", "DbSeabed", "DbSeabedEngine"])
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy
+from bmi_dbseabed import blocks
+from rasterio.windows import Window
+
+
+class BlockCache:
+    """
+    Thread-safe LRU cache of decoded raster blocks, bounded in bytes.
+
+    >>> cache = BlockCache(max_bytes=64)
+    >>> cache.put("a", numpy.zeros(8))
+    >>> cache.get("a").size, cache.get("b")
+    (8, None)
+    >>> cache.stats()["hits"], cache.stats()["misses"]
+    (1, 1)
+    """
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._blocks.move_to_end(key)
+            return block
+
+    def put(self, key, block):
+        if block.nbytes > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._blocks:
+                self._bytes -= self._blocks.pop(key).nbytes
+            self._blocks[key] = block
+            self._bytes += block.nbytes
+            while self._bytes > self._max_bytes:
+                _, evicted = self._blocks.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._evictions += 1
+
+    def stats(self):
+        """Get the hits, misses, evictions, blocks and bytes of the cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else None,
+                "evictions": self._evictions,
+                "blocks": len(self._blocks),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+
+class _Compressed:
+    # compressed block, sized by its compressed bytes for the LRU
+    __slots__ = ("data", "shape", "dtype", "nbytes", "raw_nbytes")
+
+    def __init__(self, block, level):
+        block = numpy.ascontiguousarray(block)
+        # grouping the bytes of each significance together lets the codec
+        # find the runs of equal exponents and high mantissa bytes
+        shuffled = block.view(numpy.uint8).reshape(-1, block.itemsize).T
+        self.data = zlib.compress(shuffled.tobytes(), level)
+        self.shape = block.shape
+        self.dtype = block.dtype
+        self.nbytes = len(self.data)
+        self.raw_nbytes = block.nbytes
+
+    def decode(self):
+        shuffled = numpy.frombuffer(zlib.decompress(self.data), dtype=numpy.uint8)
+        block = shuffled.reshape(self.dtype.itemsize, -1).T.copy().view(self.dtype)
+        block = block.reshape(self.shape)
+        block.flags.writeable = False
+        return block
+
+
+class CompressedBlockCache(BlockCache):
+    """
+    Block cache that keeps blocks compressed in memory.
+
+    Blocks are byte-shuffled and compressed with zlib at a fast level, and
+    the bound applies to the compressed size, so several times more blocks
+    fit than as raw arrays. Decoding a block takes a fraction of the time of
+    reading and decoding its tile again. Blocks are returned read-only.
+
+    >>> cache = CompressedBlockCache(max_bytes=64)
+    >>> cache.put("a", numpy.zeros(64))
+    >>> cache.get("a").size, cache.stats()["bytes"] < 64 * 8
+    (64, True)
+    """
+
+    def __init__(self, max_bytes, level=1):
+        """
+        Args:
+            max_bytes: Maximum compressed size of the cached blocks.
+            level: zlib compression level, from 1 (fastest) to 9.
+        """
+        super().__init__(max_bytes)
+        self._level = level
+
+    def get(self, key):
+        item = super().get(key)
+        return None if item is None else item.decode()
+
+    def put(self, key, block):
+        super().put(key, _Compressed(block, self._level))
+
+    def stats(self):
+        """
+        Get the hits, misses, evictions, blocks and bytes of the cache, with
+        the raw size of the blocks and the compression ratio.
+        """
+        with self._lock:
+            raw_bytes = sum(item.raw_nbytes for item in self._blocks.values())
+        stats = super().stats()
+        stats["raw_bytes"] = raw_bytes
+        stats["ratio"] = raw_bytes / stats["bytes"] if stats["bytes"] else None
+        return stats
+
+
+def read_tile(cache, key, src, row, col, dtype="float32", decode=False, loads=None):
+    """
+    Get a tile of the first band of the source tiling, reading it on a miss.
+
+    Tiles are cached read-only under ``(key, row, col, decode)``, with NaN
+    for no-data.
+
+    Args:
+        cache: Block cache.
+        key: Key of the source in the cache, e.g. its path and version.
+        src: Open rasterio dataset.
+        row: Row of the tile in the source tiling.
+        col: Column of the tile in the source tiling.
+        dtype: Float dtype of the values.
+        decode: If True, apply the band scale factor and offset, as
+            ``blocks.read_block`` does, otherwise keep the stored values, as
+            ``rioxarray.open_rasterio(masked=True)`` does.
+        loads: Optional ``engine.SingleFlight``, so concurrent misses of a
+            tile read it once.
+
+    Returns:
+        numpy.ndarray: Values of the tile.
+    """
+    tile_key = (key, row, col, decode)
+    tile = cache.get(tile_key)
+    if tile is not None:
+        return tile
+
+    def _load():
+        block_rows, block_cols = src.block_shapes[0]
+        window = Window(
+            col * block_cols,
+            row * block_rows,
+            min(block_cols, src.width - col * block_cols),
+            min(block_rows, src.height - row * block_rows),
+        )
+        if decode:
+            tile = blocks.read_block(src, window, dtype)
+        else:
+            masked = src.read(1, window=window, masked=True)
+            tile = masked.filled(numpy.nan).astype(dtype, copy=False)
+        tile.flags.writeable = False
+        cache.put(tile_key, tile)
+        return tile
+
+    return _load() if loads is None else loads.do(tile_key, _load)[0]
+
+
+def read_cached(cache, key, src, window, dtype, decode=False, loads=None):
+    """
+    Read a window of the first band from cached tiles of the source.
+
+    Args:
+        cache: Block cache.
+        key: Key of the source in the cache, e.g. its path and version.
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+        dtype: Float dtype of the values.
+        decode: If True, apply the band scale factor and offset. See
+            ``read_tile``.
+        loads: Optional ``engine.SingleFlight`` of the tile reads.
+
+    Returns:
+        numpy.ndarray: Values of the window.
+    """
+    block_rows, block_cols = src.block_shapes[0]
+    values = numpy.empty((window.height, window.width), dtype=dtype)
+    for block in blocks.iter_blocks(src, window):
+        tile = read_tile(
+            cache,
+            key,
+            src,
+            block.row_off // block_rows,
+            block.col_off // block_cols,
+            dtype,
+            decode,
+            loads,
+        )
+        tile_row, tile_col = block.row_off % block_rows, block.col_off % block_cols
+        row, col = block.row_off - window.row_off, block.col_off - window.col_off
+        values[row : row + block.height, col : col + block.width] = tile[
+            tile_row : tile_row + block.height, tile_col : tile_col + block.width
+        ]
+    return values
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import math
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.windows import Window
+
+# TIFF tags of the strip layout, and sizes of the integer types they may use
+STRIP_OFFSETS, STRIP_BYTE_COUNTS = 273, 279
+TIFF_INTEGERS = {3: "H", 4: "I", 16: "Q"}
+
+
+def bbox_window(src, west, south, east, north):
+    """
+    Get the pixel window of a source raster covering a bounding box.
+
+    The window is snapped outwards to whole pixels and clamped to the raster
+    extent, which selects the same cells as ``rio.clip_box``.
+
+    Args:
+        src: Open rasterio dataset.
+        west: x coordinate of the lower left corner of the grid extent.
+        south: y coordinate of the lower left corner of the grid extent.
+        east: x coordinate of the upper right corner of the grid extent.
+        north: y coordinate of the upper right corner of the grid extent.
+
+    Returns:
+        rasterio.windows.Window: Window of the bounding box.
+    """
+    window = rasterio.windows.from_bounds(
+        west, south, east, north, transform=src.transform
+    )
+    (row_start, row_stop), (col_start, col_stop) = window.toranges()
+    row_start = min(max(math.floor(row_start), 0), src.height)
+    row_stop = min(max(math.ceil(row_stop), 0), src.height)
+    col_start = min(max(math.floor(col_start), 0), src.width)
+    col_stop = min(max(math.ceil(col_stop), 0), src.width)
+
+    if row_stop - row_start < 1 or col_stop - col_start < 1:
+        raise ValueError("No data found in the bounding box.")
+
+    return Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+
+def iter_blocks(src, window, block_shape=None):
+    """
+    Split a window into blocks aligned with the internal tiling of a raster.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window to split.
+        block_shape: Optional (rows, cols) block size. Defaults to the internal
+            block size of the first band of the source.
+
+    Yields:
+        rasterio.windows.Window: Block windows in row-major order, in source
+        pixel coordinates.
+    """
+    block_rows, block_cols = block_shape or src.block_shapes[0]
+    row_stop = window.row_off + window.height
+    col_stop = window.col_off + window.width
+
+    # align block edges to the source tiling so every block maps to whole tiles
+    row = window.row_off
+    while row < row_stop:
+        next_row = min((row // block_rows + 1) * block_rows, row_stop)
+        col = window.col_off
+        while col < col_stop:
+            next_col = min((col // block_cols + 1) * block_cols, col_stop)
+            yield Window(col, row, next_col - col, next_row - row)
+            col = next_col
+        row = next_row
+
+
+def read_block(src, window, dtype="float32"):
+    """
+    Read a block of the first band as a float array with NaN for no-data.
+
+    The band scale factor and offset are applied, as in ``BmiDbSeabed``.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Block window in source pixel coordinates.
+        dtype: Float dtype of the returned array.
+
+    Returns:
+        numpy.ndarray: Block values.
+    """
+    masked = src.read(1, window=window, masked=True)
+    values = masked.filled(numpy.nan).astype(dtype, copy=False)
+    scale, offset = src.scales[0], src.offsets[0]
+    if scale != 1.0:
+        numpy.multiply(values, scale, out=values)
+    if offset != 0.0:
+        numpy.add(values, offset, out=values)
+    return values
+
+
+def read_halo(src, window, halo, dtype="float32", read=None):
+    """
+    Read a window of the first band with a halo of cells around it.
+
+    Cells of the halo outside the raster are NaN, as are no-data cells, and
+    the band scale factor and offset are applied as in ``read_block``.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+        halo: Width of the halo in cells.
+        dtype: Float dtype of the returned array.
+        read: Optional function of a window within the raster returning its
+            values, e.g. from cached tiles. Defaults to ``read_block``.
+
+    Returns:
+        numpy.ndarray: Values of the window padded by the halo on each side.
+    """
+    values = numpy.full(
+        (window.height + 2 * halo, window.width + 2 * halo), numpy.nan, dtype=dtype
+    )
+    row_start = max(window.row_off - halo, 0)
+    row_stop = min(window.row_off + window.height + halo, src.height)
+    col_start = max(window.col_off - halo, 0)
+    col_stop = min(window.col_off + window.width + halo, src.width)
+    inside = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    row = row_start - (window.row_off - halo)
+    col = col_start - (window.col_off - halo)
+    values[row : row + inside.height, col : col + inside.width] = (
+        read_block(src, inside, dtype=dtype) if read is None else read(inside)
+    )
+    return values
+
+
+def map_blocks(func, items, workers=1):
+    """
+    Apply a function to items in order, in a pool of threads.
+
+    Items are consumed as results are returned, so only about two items per
+    worker are held in memory, e.g. blocks read from a raster by the caller.
+
+    Args:
+        func: Function of one item.
+        items: Iterable of items.
+        workers: Number of threads. With one, items are processed in the
+            calling thread.
+
+    Yields:
+        Results of the function, in the order of the items.
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def window_profile(src, window, dtype="float32", count=1):
+    """
+    Build a GeoTIFF profile for a window of a source raster.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+        dtype: Data type of the output bands.
+        count: Number of output bands.
+
+    Returns:
+        dict: Profile to pass to ``rasterio.open`` in write mode.
+    """
+    return {
+        "driver": "GTiff",
+        "width": int(window.width),
+        "height": int(window.height),
+        "count": count,
+        "dtype": dtype,
+        "crs": src.crs,
+        "transform": rasterio.windows.transform(window, src.transform),
+        "nodata": numpy.nan,
+    }
+
+
+def check_aligned(sources):
+    """
+    Check that source rasters share the same grid.
+
+    Args:
+        sources: Mapping of variable names to open rasterio datasets.
+
+    Raises:
+        ValueError: If the rasters differ in shape, transform or crs.
+    """
+    grids = {
+        (src.width, src.height, tuple(src.transform), str(src.crs))
+        for src in sources.values()
+    }
+    if len(grids) > 1:
+        raise ValueError(
+            f"Variables {sorted(sources)} are not defined on the same grid."
+        )
+
+
+class GTiffBlockWriter:
+    """Write a raster block by block to a GeoTIFF file."""
+
+    def __init__(self, output, profile):
+        self._dst = rasterio.open(output, "w", **profile)
+
+    def write(self, values, window, band=1):
+        """
+        Write a block of values.
+
+        Args:
+            values: 2D array of block values.
+            window: Block window relative to the output raster.
+            band: Band to write, starting from 1.
+        """
+        self._dst.write(values, band, window=window)
+
+    def close(self):
+        self._dst.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _strip_header(profile, rows):
+    # GDAL writes the tags of an empty sparse GeoTIFF, and the strip layout
+    # is set so the strips follow the header in order
+    with MemoryFile() as memfile:
+        with memfile.open(**profile, blockysize=rows, sparse_ok=True):
+            pass
+        header = bytearray(memfile.read())
+    order = "<" if header[:2] == b"II" else ">"
+    if struct.unpack_from(order + "H", header, 2)[0] == 43:
+        # BigTIFF: 8-byte counts and values
+        (ifd,) = struct.unpack_from(order + "Q", header, 8)
+        number_format, count_format, entry_size, field_size = "Q", "Q", 20, 8
+    else:
+        (ifd,) = struct.unpack_from(order + "I", header, 4)
+        number_format, count_format, entry_size, field_size = "H", "I", 12, 4
+    (entries,) = struct.unpack_from(order + number_format, header, ifd)
+    start = ifd + struct.calcsize(number_format)
+
+    itemsize = numpy.dtype(profile["dtype"]).itemsize
+    row_bytes = profile["width"] * itemsize
+    heights = [
+        min(rows, profile["height"] - row) for row in range(0, profile["height"], rows)
+    ]
+    byte_counts = [height * row_bytes for height in heights]
+    offsets = numpy.cumsum([len(header), *byte_counts[:-1]]).tolist()
+    layout = {STRIP_OFFSETS: offsets, STRIP_BYTE_COUNTS: byte_counts}
+
+    for entry in range(entries):
+        position = start + entry * entry_size
+        tag, kind = struct.unpack_from(order + "HH", header, position)
+        if tag not in layout:
+            continue
+        (count,) = struct.unpack_from(order + count_format, header, position + 4)
+        value_format = f"{order}{count}{TIFF_INTEGERS[kind]}"
+        field = position + 4 + struct.calcsize(count_format)
+        if struct.calcsize(value_format) > field_size:
+            (field,) = struct.unpack_from(order + count_format, header, field)
+        try:
+            struct.pack_into(value_format, header, field, *layout[tag])
+        except struct.error:
+            raise ValueError("Please provide a smaller window to stream.") from None
+    return bytes(header), numpy.dtype(profile["dtype"]).newbyteorder(order)
+
+
+def iter_geotiff(profile, strips, rows):
+    """
+    Encode strips of rows as an uncompressed GeoTIFF, one piece at a time.
+
+    The header is written first and each strip follows as it is produced,
+    so only one strip is held in memory, e.g. to send a GeoTIFF larger than
+    the memory of a server.
+
+    Args:
+        profile: Single band profile, as returned by ``window_profile``.
+        strips: Iterable of 2D arrays of ``rows`` rows each, the last one
+            with the remaining rows, from the top of the raster.
+        rows: Number of rows of the strips.
+
+    Yields:
+        bytes: The header, then the bytes of each strip.
+    """
+    header, dtype = _strip_header(profile, rows)
+    yield header
+    for values in strips:
+        yield numpy.ascontiguousarray(values, dtype=dtype).tobytes()
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import weakref
 from collections import namedtuple
 
 import numpy
-import yaml
 from bmi_dbseabed.dbseabed import DbSeabed
+from bmi_dbseabed.overlay import SparseOverlay
+from bmi_dbseabed.packed import PackedField
+from bmi_dbseabed.profiling import CallProfiler
+from bmi_dbseabed.snapshot import data_version
+from bmi_dbseabed.snapshot import snapshot_key
+from bmi_dbseabed.snapshot import SnapshotCache
 from bmipy import Bmi
 
 BmiVar = namedtuple(
@@ -16,12 +22,171 @@ BmiGridUniformRectilinear = namedtuple(
 )
 
 
+class _SharedState:
+    # read-only field and records shared by the models initialized with the
+    # same configuration, as long as one of them holds it
+    __slots__ = ("record", "values", "__weakref__")
+
+    def __init__(self, record, values, starts=None, lengths=None):
+        self.record = record
+        for array in (values, starts, lengths):
+            if array is not None:
+                array.flags.writeable = False
+        if starts is None:
+            self.values = values
+        else:
+            self.values = PackedField(record["packed_shape"], values, starts, lengths)
+
+
+_shared_states = weakref.WeakValueDictionary()
+
+# compressed block caches of the process, by size
+_block_caches = {}
+
+
+def _fill_axis(out, start, step):
+    # start + i * step computed in the buffer, as the running sum of ones
+    # counts the nodes exactly
+    out.fill(1.0)
+    numpy.cumsum(out, out=out)
+    out -= 1.0
+    out *= step
+    out += start
+    return out
+
+
 class BmiDbSeabed(Bmi):
-    def __init__(self) -> None:
+    def __init__(self, profile: bool = False) -> None:
+        """Create a model that is ready for initialization.
+
+        Parameters
+        ----------
+        profile : bool, optional
+            If True, record call counts, latency and bytes copied of each BMI
+            method and variable. Profiling can also be turned on with the
+            ``profile`` key of the configuration file. It adds no cost when
+            turned off.
+        """
+        self._reset()
+        self._profiler = None
+        self._profile_output = None
+        if profile:
+            self._enable_profiling()
+
+    # attributes set by initialize, also restored lazily after unpickling
+    _STATE_ATTRIBUTES = frozenset(
+        (
+            "_conf",
+            "_key",
+            "_input_var_names",
+            "_output_var_names",
+            "_var",
+            "_grid",
+            "_state",
+            "_values",
+            "_overlay",
+            "_node_coordinates",
+            "_releases",
+            "_release_index",
+            "_prefetcher",
+        )
+    )
+
+    def _reset(self) -> None:
+        self._conf = None
+        self._key = None
         self._input_var_names = ()
         self._output_var_names = ()
         self._var = {}
         self._grid = {}
+        self._state = None
+        self._values = None
+        self._overlay = None
+        self._node_coordinates = {}
+        self._releases = []
+        self._release_index = 0
+        self._prefetcher = None
+
+    def __getstate__(self) -> dict:
+        # a descriptor of the model instead of its field: the configuration,
+        # the key of the data version, the time step and the edits
+        state = {
+            "profile": self._profiler is not None,
+            "profile_output": self._profile_output,
+        }
+        if self._conf is not None:
+            state.update(
+                conf=self._conf,
+                key=self._key,
+                release_index=self._release_index,
+                edits=self._overlay.edits(),
+            )
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self._profiler = None
+        self._profile_output = state["profile_output"]
+        if "conf" in state:
+            # initialized on first access of the model state
+            self._pending = state
+        else:
+            self._reset()
+        if state["profile"]:
+            self._enable_profiling()
+
+    def __getattr__(self, name: str):
+        # only called for missing attributes, i.e. before the model state of
+        # an unpickled model is restored
+        if name not in self._STATE_ATTRIBUTES:
+            raise AttributeError(name)
+        pending = self.__dict__.pop("_pending", None)
+        if pending is None:
+            raise AttributeError(name)
+        self._restore(pending)
+        return getattr(self, name)
+
+    def _restore(self, state: dict) -> None:
+        self._reset()
+        self._setup(dict(state["conf"]), key=state["key"])
+        for _ in range(state["release_index"]):
+            self.update()
+        self._overlay.set_at_indices(*state["edits"])
+
+    def _enable_profiling(self) -> None:
+        if self._profiler is not None:
+            return
+        self._profiler = CallProfiler()
+        # wrap the bound methods of this instance only, so other instances and
+        # unprofiled runs call the methods directly
+        for name in dir(Bmi):
+            if not name.startswith("_") and callable(getattr(Bmi, name)):
+                setattr(self, name, self._profiler.wrap(name, getattr(self, name)))
+
+    def get_profile(self) -> dict:
+        """Get the profile of the BMI calls.
+
+        Returns
+        -------
+        dict
+            Call counts, cumulative, mean and percentile latency in seconds,
+            and bytes copied for each method and variable or grid, or an empty
+            dict if profiling is turned off.
+        """
+        return {} if self._profiler is None else self._profiler.as_dict()
+
+    def get_fill_report(self) -> dict:
+        """Get the report of the gap fill of the field.
+
+        Returns
+        -------
+        dict
+            Fill method, wall time, blocks, and the numbers of no-data cells
+            before the fill, of cells filled and of cells left no-data
+            ("remaining"), or an empty dict if the field is not filled. The
+            time is that of the first model that filled the field, e.g. in
+            the run that saved a snapshot.
+        """
+        return dict(self._state.record.get("fill", {})) if self._state else {}
 
     def finalize(self) -> None:
         """Perform tear-down tasks for the model.
@@ -29,11 +194,12 @@ class BmiDbSeabed(Bmi):
         loop. This typically includes deallocating memory, closing files and
         printing reports.
         """
-        self._var = {}
-        self._grid = {}
-        self._input_var_names = ()
-        self._output_var_names = ()
-        self._dataset = None
+        if self._profiler is not None and self._profile_output:
+            self._profiler.export(self._profile_output)
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        self._reset()
 
     def get_component_name(self) -> str:
         """Name of the component.
@@ -51,7 +217,9 @@ class BmiDbSeabed(Bmi):
         float
             The current model time.
         """
-        return 0.0
+        if not self._releases:
+            return 0.0
+        return float(self._releases[self._release_index])
 
     def get_end_time(self) -> float:
         """End time of the model.
@@ -60,7 +228,7 @@ class BmiDbSeabed(Bmi):
         float
             The maximum model time.
         """
-        return 0.0
+        return float(self._releases[-1]) if self._releases else 0.0
 
     def get_grid_face_edges(
         self, grid: int, face_edges: numpy.ndarray
@@ -92,7 +260,8 @@ class BmiDbSeabed(Bmi):
         int
             The total number of grid edges.
         """
-        raise NotImplementedError("get_grid_edge_count")
+        rows, cols = self._grid[grid].shape
+        return rows * max(cols - 1, 0) + cols * max(rows - 1, 0)
 
     def get_grid_edge_nodes(
         self, grid: int, edge_nodes: numpy.ndarray
@@ -124,7 +293,8 @@ class BmiDbSeabed(Bmi):
         int
             The total number of grid faces.
         """
-        raise NotImplementedError("get_grid_face_count")
+        rows, cols = self._grid[grid].shape
+        return max(rows - 1, 0) * max(cols - 1, 0)
 
     def get_grid_face_nodes(
         self, grid: int, face_nodes: numpy.ndarray
@@ -156,7 +326,8 @@ class BmiDbSeabed(Bmi):
         int
             The total number of grid nodes.
         """
-        raise NotImplementedError("get_grid_node_count")
+        rows, cols = self._grid[grid].shape
+        return rows * cols
 
     def get_grid_nodes_per_face(
         self, grid: int, nodes_per_face: numpy.ndarray
@@ -173,7 +344,9 @@ class BmiDbSeabed(Bmi):
         ndarray of int
             The input numpy array that holds the number of nodes per edge.
         """
-        raise NotImplementedError("get_grid_nodes_per_face")
+        # faces of a rectilinear grid are quadrilaterals
+        nodes_per_face[: self.get_grid_face_count(grid)] = 4
+        return nodes_per_face
 
     def get_grid_origin(self, grid: int, origin: numpy.ndarray) -> numpy.ndarray:
         """Get coordinates for the lower-left corner of the computational grid.
@@ -280,7 +453,10 @@ class BmiDbSeabed(Bmi):
         ndarray of float
             The input numpy array that holds the grid's column x-coordinates.
         """
-        x[:] = self._dataset.x.values
+        record = self._grid[grid]
+        _fill_axis(
+            x[: record.shape[1]], record.yx_of_lower_left[1], record.yx_spacing[1]
+        )
         return x
 
     def get_grid_y(self, grid: int, y: numpy.ndarray) -> numpy.ndarray:
@@ -296,9 +472,43 @@ class BmiDbSeabed(Bmi):
         ndarray of float
             The input numpy array that holds the grid's row y-coordinates.
         """
-        y[:] = self._dataset.y.values
+        # rows are stored from north to south
+        record = self._grid[grid]
+        rows = record.shape[0]
+        south, spacing = record.yx_of_lower_left[0], record.yx_spacing[0]
+        _fill_axis(y[:rows], south + (rows - 1) * spacing, -spacing)
         return y
 
+    def get_grid_node_coordinates(
+        self, grid: int
+    ) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """Get the x and y coordinates of every node of the grid.
+
+        This is not a BMI method. The coordinates are computed on the first
+        call, or at :func:`initialize` with ``node_coordinates: true`` in the
+        configuration file, and the same read-only arrays are returned by
+        later calls.
+
+        Parameters
+        ----------
+        grid : int
+            A grid identifier.
+
+        Returns
+        -------
+        tuple of ndarray of float
+            The x and y coordinates of the nodes, with the shape of the grid.
+        """
+        if grid not in self._node_coordinates:
+            rows, cols = self._grid[grid].shape
+            x = self.get_grid_x(grid, numpy.empty(cols))
+            y = self.get_grid_y(grid, numpy.empty(rows))
+            coordinates = numpy.meshgrid(x, y)
+            for array in coordinates:
+                array.flags.writeable = False
+            self._node_coordinates[grid] = tuple(coordinates)
+        return self._node_coordinates[grid]
+
     def get_grid_z(self, grid: int, z: numpy.ndarray) -> numpy.ndarray:
         """Get coordinates of grid nodes in the z direction.
         Parameters
@@ -371,7 +581,7 @@ class BmiDbSeabed(Bmi):
         float
             The model start time.
         """
-        return 0.0
+        return float(self._releases[0]) if self._releases else 0.0
 
     def get_time_step(self) -> float:
         """Current time step of the model.
@@ -381,6 +591,10 @@ class BmiDbSeabed(Bmi):
         float
             The time step used in model.
         """
+        # releases may be irregular, so this is the step to the next release
+        index = self._release_index
+        if index + 1 < len(self._releases):
+            return float(self._releases[index + 1]) - float(self._releases[index])
         return 0.0
 
     def get_time_units(self) -> str:
@@ -393,7 +607,7 @@ class BmiDbSeabed(Bmi):
         -----
         CSDMS uses the UDUNITS standard from Unidata.
         """
-        return "1"
+        return "year" if self._releases else "1"
 
     def get_value(self, name: str, dest: numpy.ndarray) -> numpy.ndarray:
         """Get a copy of values of the given variable.
@@ -412,8 +626,8 @@ class BmiDbSeabed(Bmi):
             The same numpy array that was passed as an input buffer.
         """
         # return all the value at current time step, for scalar it is just one value
-        dest[:] = self.get_value_ptr(name).reshape(-1).copy()
-        return dest
+        self._var[name]
+        return self._overlay.fill(dest)
 
     def get_value_at_indices(
         self, name: str, dest: numpy.ndarray, inds: numpy.ndarray
@@ -434,8 +648,8 @@ class BmiDbSeabed(Bmi):
         """
         # return the value at current time step with given index in 1D or
         # 2D grid. when it is scalar no need for ind
-        dest[:] = self.get_value_ptr(name).reshape(-1)[inds]
-        return dest
+        self._var[name]
+        return self._overlay.take(inds, dest)
 
     def get_value_ptr(self, name: str) -> numpy.ndarray:
         """Get a reference to values of the given variable.
@@ -450,13 +664,20 @@ class BmiDbSeabed(Bmi):
         -------
         array_like
             A reference to a model variable.
+
+        Notes
+        -----
+        The field read from dbSEABED is read-only and shared by the models
+        initialized with the same configuration, so the first call gives the
+        model a writable copy of its own, with the values set so far. Values
+        written to it are seen by the other getters of the model, and the
+        setters and release updates change it in place. Models that never
+        ask for a reference keep sharing the field.
         """
         # return a reference of all the value at current time step. mainly
         # for input data. not useful for scalar value
-        add_offset = self._dataset.add_offset
-        scale_factor = self._dataset.scale_factor
-
-        return self._dataset[0].values * scale_factor + add_offset
+        self._var[name]
+        return self._overlay.materialize()
 
     def get_var_grid(self, name: str) -> int:
         """Get grid identifier for the given variable.
@@ -583,10 +804,61 @@ class BmiDbSeabed(Bmi):
         how configuration files are formatted, although YAML is
         recommended. A template of a model's configuration file
         with placeholder values is used by the BMI.
+
+        Besides the ``DbSeabed.get_data`` parameters, the configuration may
+        set ``profile: true`` to profile the BMI calls, and ``profile_output``
+        to save the profile at :func:`finalize`, as JSON if the path ends with
+        ".json" or as a summary table otherwise.
+
+        With ``snapshot: true``, the decoded field, grid and variable records
+        are saved in a cache keyed by the configuration and data version, and
+        later runs with the same configuration restore them without network
+        access or GeoTIFF parsing (the output file is then not written). The
+        cache is kept in ``snapshot_dir`` if set, or in the user cache
+        directory.
+
+        To present several dbSEABED releases as a time series, set
+        ``releases`` to a list of release times from the "releases" item of
+        the variable in ``DbSeabed.DATA_SERVICES``, or to ``all``. The model
+        time is then the release year, starting from the first release.
+
+        To run a Monte Carlo ensemble, set ``realization`` to the realization
+        number of the model, with an optional ``seed`` and
+        ``correlation_length`` (in cells). The field is then the variable plus
+        noise scaled by its total standard uncertainty, the same as the band
+        of the realization saved by ``DbSeabed.get_realizations``.
+
+        Models initialized with the same configuration in a process share one
+        read-only field, and values set with :func:`set_value` are kept as
+        sparse edits of each model on top of it. With ``packed: true``, only
+        the valid cells of the field are kept in memory and in snapshots,
+        and :func:`get_value_ptr` returns an unpacked copy.
+
+        Set ``fill`` to "nearest" or "idw" to fill the no-data cells from the
+        valid cells within ``fill_distance`` cells (8 by default), with
+        inverse distance weights of power ``fill_power`` (2 by default) for
+        "idw". Cells farther from valid data stay no-data, so couplers that
+        need a field without no-data nodes must set ``fill_distance`` to the
+        widest gap and check that the "remaining" item of
+        :func:`get_fill_report` is 0.
+
+        With ``block_cache_mb`` set, the source tiles read by the models of a
+        process are kept compressed in a cache of that size, so models
+        initialized over overlapping regions read each tile once.
+
+        Grid coordinates and counts are computed from the grid record, so the
+        dataset is not kept in memory. Set ``node_coordinates: true`` to
+        precompute the 2D node coordinates returned by
+        :func:`get_grid_node_coordinates`.
         """
+        import yaml
+
         if config_file:
             with open(config_file) as fp:
                 conf = yaml.safe_load(fp).get("bmi-dbseabed", {})
+            if conf.pop("profile", False):
+                self._enable_profiling()
+            self._profile_output = conf.pop("profile_output", None)
         else:
             conf = {
                 "var_name": "carbonate",
@@ -596,14 +868,159 @@ class BmiDbSeabed(Bmi):
                 "north": 31.0,
                 "output": "download.tif",
             }
+        self._setup(conf)
+
+    def _setup(self, conf: dict, key: str = None) -> None:
+        # initialize from a configuration, checking that the data still has
+        # the version of the key if given
+        self._conf = dict(conf)
+        snapshot = conf.pop("snapshot", False)
+        snapshot_dir = conf.pop("snapshot_dir", None)
+        node_coordinates = conf.pop("node_coordinates", False)
+        block_cache_mb = conf.pop("block_cache_mb", None)
+
+        self._releases = self._select_releases(
+            conf["var_name"], conf.pop("releases", None)
+        )
+        self._release_index = 0
+        if self._releases:
+            if "realization" in conf:
+                raise ValueError("Please provide either releases or a realization.")
+            if conf.get("packed"):
+                raise ValueError("Please provide either releases or a packed field.")
+            if conf.get("fill"):
+                raise ValueError("Please provide either releases or a fill method.")
+            conf["release"] = self._releases[0]
 
-        dbseabed = DbSeabed()
-        self._dataset = dbseabed.get_data(**conf)
+        expected = snapshot_key(
+            conf,
+            [
+                data_version(link)
+                for link in DbSeabed.get_links(
+                    conf["var_name"],
+                    conf.get("west"),
+                    conf.get("south"),
+                    conf.get("east"),
+                    conf.get("north"),
+                    conf.get("release"),
+                )
+            ],
+        )
+        if key is not None and key != expected:
+            raise RuntimeError("The dbSEABED data changed since the model was pickled.")
+        self._key = key = expected
+        state = _shared_states.get(key)
+        if state is None:
+            arrays = None
+            if snapshot:
+                cache = SnapshotCache(snapshot_dir)
+                arrays = cache.load(key)
+
+            if arrays is None:
+                arrays = self._load_state(conf, block_cache_mb)
+                if snapshot:
+                    cache.save(key, **arrays)
 
-        self._output_var_names = (dbseabed.metadata["bmi_standard_name"],)
+            state = _shared_states[key] = _SharedState(**arrays)
 
-        array = self._dataset[0].values
+        self._state = state
+        self._values = state.values
+        if len(self._releases) > 1:
+            # later releases are copied into the field in place, so it is
+            # private to the model and get_value_ptr references stay valid
+            self._values = numpy.array(self._values)
+        self._overlay = SparseOverlay(self._values)
+        self._node_coordinates = {}
+        record = state.record
+        self._output_var_names = tuple(record["output_var_names"])
         self._grid = {
+            int(grid_id): BmiGridUniformRectilinear(
+                shape=list(grid["shape"]),
+                yx_spacing=tuple(grid["yx_spacing"]),
+                yx_of_lower_left=tuple(grid["yx_of_lower_left"]),
+            )
+            for grid_id, grid in record["grid"].items()
+        }
+        self._var = {name: BmiVar(**var) for name, var in record["var"].items()}
+        if node_coordinates:
+            for grid_id in self._grid:
+                self.get_grid_node_coordinates(grid_id)
+
+        if len(self._releases) > 1:
+            from bmi_dbseabed.releases import ReleasePrefetcher
+
+            self._prefetcher = ReleasePrefetcher(
+                [DbSeabed.get_link(conf["var_name"], key) for key in self._releases],
+                self._node_bounds(0),
+            )
+            self._prefetcher.prefetch(1, self._values)
+
+    def _node_bounds(self, grid: int) -> tuple:
+        # west, south, east and north of the centers of the corner cells
+        record = self._grid[grid]
+        rows, cols = record.shape
+        (south, west), (dy, dx) = record.yx_of_lower_left, record.yx_spacing
+        return (west, south, west + (cols - 1) * dx, south + (rows - 1) * dy)
+
+    @staticmethod
+    def _select_releases(var_name: str, releases) -> list:
+        if releases is None:
+            return []
+        if releases == "all":
+            releases = list(DbSeabed.DATA_SERVICES[var_name].get("releases", {}))
+        for release in releases:
+            # raise for unknown releases
+            DbSeabed.get_link(var_name, release)
+        return sorted(releases, key=float)
+
+    @staticmethod
+    def _load_state(conf: dict, block_cache_mb: float = None) -> dict:
+        conf = dict(conf)
+        realization = conf.pop("realization", None)
+        seed = conf.pop("seed", 0)
+        correlation_length = conf.pop("correlation_length", 0.0)
+        packed = conf.pop("packed", False)
+        fill = conf.pop("fill", None)
+        fill_distance = conf.pop("fill_distance", 8)
+        fill_power = conf.pop("fill_power", 2.0)
+
+        # get the data and build the record of the grid and variable from it
+        block_cache = None
+        if block_cache_mb:
+            from bmi_dbseabed.blockcache import CompressedBlockCache
+
+            max_bytes = int(block_cache_mb * 1024**2)
+            block_cache = _block_caches.get(max_bytes)
+            if block_cache is None:
+                block_cache = _block_caches[max_bytes] = CompressedBlockCache(max_bytes)
+        dbseabed = DbSeabed(block_cache=block_cache)
+        dataset = dbseabed.get_data(**conf)
+
+        output_var_names = (dbseabed.metadata["bmi_standard_name"],)
+
+        array = dataset[0].values
+        # decode the values once, so get_value_ptr returns a reference
+        values = array * dataset.attrs.get("scale_factor", 1.0) + dataset.attrs.get(
+            "add_offset", 0.0
+        )
+        if realization is not None:
+            values = BmiDbSeabed._realize(
+                conf["var_name"],
+                dataset,
+                values,
+                realization,
+                seed,
+                correlation_length,
+            )
+
+        fill_report = None
+        if fill:
+            from bmi_dbseabed.gapfill import GapFiller
+
+            filler = GapFiller(fill, max_distance=fill_distance, power=fill_power)
+            values, fill_report = filler.fill(values)
+
+        grid = {
             0: BmiGridUniformRectilinear(
                 shape=[int(dim) for dim in array.shape],
                 yx_spacing=(
@@ -611,22 +1028,66 @@ class BmiDbSeabed(Bmi):
                     dbseabed.metadata["grid_res"][0],
                 ),  # original grid_res is (x,y)
                 yx_of_lower_left=(
-                    self._dataset.coords["y"].values[-1],
-                    self._dataset.coords["x"].values[0],
+                    float(dataset.coords["y"].values[-1]),
+                    float(dataset.coords["x"].values[0]),
                 ),
             ),
         }
 
-        self._var[self._output_var_names[0]] = BmiVar(
-            dtype=str(array.dtype),
-            itemsize=array.itemsize,
-            nbytes=array.nbytes,  # nbytes for current time step value
-            units=dbseabed.metadata[
-                "variable_units"
-            ],  # TODO: translate var name into CSDMS standard name
-            location="node",  # scalar value has no location on a grid (node, face, edge)
-            grid=0,  # grid id number
+        var = {
+            output_var_names[0]: BmiVar(
+                dtype=str(values.dtype),
+                itemsize=values.itemsize,
+                nbytes=values.nbytes,  # nbytes for current time step value
+                units=dbseabed.metadata[
+                    "variable_units"
+                ],  # TODO: translate var name into CSDMS standard name
+                location="node",  # scalar value has no location on a grid (node, face, edge)
+                grid=0,  # grid id number
+            )
+        }
+
+        record = {
+            "output_var_names": output_var_names,
+            "grid": {grid_id: rec._asdict() for grid_id, rec in grid.items()},
+            "var": {name: rec._asdict() for name, rec in var.items()},
+        }
+        if fill_report is not None:
+            record["fill"] = fill_report._asdict()
+        if not packed:
+            return {"record": record, "values": values}
+
+        field = PackedField.pack(values)
+        return {
+            "record": {**record, "packed_shape": list(field.shape)},
+            "values": field.values,
+            "starts": field.starts,
+            "lengths": field.lengths,
+        }
+
+    @staticmethod
+    def _realize(var_name, dataset, values, realization, seed, correlation_length):
+        import rasterio
+        from bmi_dbseabed import blocks
+        from bmi_dbseabed.mosaic import mosaic_source
+        from bmi_dbseabed.realizations import RealizationGenerator
+
+        # the centers of the corner cells select the clipped grid
+        bounds = (
+            float(dataset.x.values[0]),
+            float(dataset.y.values[-1]),
+            float(dataset.x.values[-1]),
+            float(dataset.y.values[0]),
+        )
+        sigma_name = DbSeabed.uncertainty_name(var_name)
+        links = DbSeabed.get_links(sigma_name, *bounds)
+        with rasterio.open(mosaic_source(links)) as src:
+            window = blocks.bbox_window(src, *bounds)
+            sigma = blocks.read_block(src, window, dtype=values.dtype)
+        generator = RealizationGenerator(
+            seed=seed, correlation_length=correlation_length
         )
+        return generator.realize(values, sigma, window, realization)
 
     def set_value(self, name: str, values: numpy.ndarray) -> None:
         """Specify a new value for a model variable.
@@ -640,8 +1101,14 @@ class BmiDbSeabed(Bmi):
             An input or output variable name, a CSDMS Standard Name.
         src : array_like
             The new value for the specified variable.
+
+        Notes
+        -----
+        Only the cells that differ from the base field are stored, so the
+        memory used is proportional to the number of changed cells.
         """
-        raise NotImplementedError("set_value")
+        self._var[name]
+        self._overlay.set(values)
 
     def set_value_at_indices(
         self, name: str, inds: numpy.ndarray, src: numpy.ndarray
@@ -656,7 +1123,8 @@ class BmiDbSeabed(Bmi):
         src : array_like
             The new value for the specified variable.
         """
-        raise NotImplementedError("set_value_at_indices")
+        self._var[name]
+        self._overlay.set_at_indices(inds, src)
 
     def update(self) -> None:
         """Advance model state by one time step.
@@ -665,8 +1133,25 @@ class BmiDbSeabed(Bmi):
         state variables. If the model's state variables don't change in time,
         then they can be computed by the :func:`initialize` method and this
         method can return with no action.
+
+        With several dbSEABED releases configured, each update steps to the
+        next release. Every block of the next release is read, but only the
+        blocks that changed since the previous release are kept and copied
+        into the field, in place, so references from :func:`get_value_ptr`
+        stay valid. The following release is loaded in the background. At the
+        last release the update returns with no action.
         """
-        raise NotImplementedError("update")
+        index = self._release_index + 1
+        if index >= len(self._releases):
+            return
+
+        changes = self._prefetcher.changes(index, self._values)
+        for rows, cols, values in changes:
+            # values set by the model user stay on top of the new release
+            self._overlay.update_base(rows, cols, values)
+
+        self._release_index = index
+        self._prefetcher.prefetch(index + 1, self._values)
 
     def update_until(self, time: float) -> None:
         """Advance model state until the given time.
@@ -676,4 +1161,8 @@ class BmiDbSeabed(Bmi):
         time : float
             A model time later than the current model time.
         """
-        raise NotImplementedError("update_until")
+        while (
+            self._release_index + 1 < len(self._releases)
+            and float(self._releases[self._release_index + 1]) <= time
+        ):
+            self.update()
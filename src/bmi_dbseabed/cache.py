@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import abc
+import hashlib
+import os
+import shutil
+import tempfile
+import urllib.request
+from urllib.parse import urlsplit
+
+# object keys of the cached items, under the prefix of a backend
+SOURCES = "sources"
+CLIPS = "clips"
+
+
+class CacheBackend(abc.ABC):
+    """
+    Shared store of dbSEABED sources, clips and their metadata.
+
+    Items are objects addressed by keys such as "sources/<hash>/<file>".
+    Objects are published whole, so concurrent readers see either no
+    object or a complete one, and the first worker that fetches an item
+    warms the cache of the others.
+    """
+
+    @abc.abstractmethod
+    def exists(self, key):
+        """Check if an object is published."""
+
+    @abc.abstractmethod
+    def get_bytes(self, key):
+        """Read an object, or get None if it does not exist."""
+
+    @abc.abstractmethod
+    def get_file(self, key, path):
+        """Copy an object to a local file."""
+
+    @abc.abstractmethod
+    def put_bytes(self, key, data):
+        """Publish bytes as an object."""
+
+    @abc.abstractmethod
+    def put_file(self, key, path):
+        """Publish a local file as an object."""
+
+    @abc.abstractmethod
+    def gdal_path(self, key):
+        """Get the path GDAL opens an object with, reading it by ranges."""
+
+    def gdal_options(self):
+        """
+        Get the GDAL configuration options to open the paths of
+        ``gdal_path`` with, e.g. in a ``rasterio.Env``.
+
+        Returns:
+            dict: Option names and values.
+        """
+        return {}
+
+    def source_path(self, link):
+        """
+        Get the path of a cached copy of a data source.
+
+        The source is fetched and published on the first request of any
+        worker sharing the backend.
+
+        Args:
+            link: URL or path of the source.
+
+        Returns:
+            str: Path of the copy, for GDAL.
+        """
+        digest = hashlib.sha256(link.encode()).hexdigest()[:16]
+        key = f"{SOURCES}/{digest}/{os.path.basename(link)}"
+        if not self.exists(key):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, os.path.basename(link))
+                _fetch(link, path)
+                self.put_file(key, path)
+        return self.gdal_path(key)
+
+
+def _fetch(link, path):
+    if os.path.isfile(link):
+        shutil.copyfile(link, path)
+        return
+    with urllib.request.urlopen(link) as response, open(path, "wb") as fp:
+        shutil.copyfileobj(response, fp)
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    Cache in a directory, e.g. on a file system shared by a cluster.
+
+    Objects are written to a temporary file and renamed in place.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Directory of the cache.
+        """
+        self._directory = os.path.abspath(directory)
+
+    def _path(self, key):
+        return os.path.join(self._directory, *key.split("/"))
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def get_bytes(self, key):
+        try:
+            with open(self._path(key), "rb") as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
+
+    def get_file(self, key, path):
+        shutil.copyfile(self._path(key), path)
+
+    def _publish(self, key, write):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                write(fp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def put_bytes(self, key, data):
+        self._publish(key, lambda fp: fp.write(data))
+
+    def put_file(self, key, path):
+        def _copy(fp):
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, fp)
+
+        self._publish(key, _copy)
+
+    def gdal_path(self, key):
+        return self._path(key)
+
+
+class S3CacheBackend(CacheBackend):
+    """
+    Cache in a bucket of an S3-compatible object store.
+
+    S3 makes an object visible only once its upload is complete, so uploads
+    are atomic publishes. GDAL reads cached sources with range requests
+    through "/vsis3/", with the credentials of the usual AWS environment
+    variables, from the store of ``endpoint_url`` as set by
+    ``gdal_options``.
+    """
+
+    def __init__(self, bucket, prefix="bmi_dbseabed", client=None, endpoint_url=None):
+        """
+        Args:
+            bucket: Bucket name.
+            prefix: Prefix of the object keys.
+            client: Optional boto3 S3 client, or an object with the same
+                methods. Defaults to a client of ``endpoint_url``, created
+                on first use in each process.
+            endpoint_url: Optional URL of an S3-compatible store.
+        """
+        if client is None:
+            try:
+                import boto3  # noqa: F401
+            except ImportError as error:
+                raise ImportError(
+                    "Please install boto3 to use an S3 cache backend."
+                ) from error
+        self._client = client
+        self._endpoint_url = endpoint_url
+        self._bucket = bucket
+        self._prefix = prefix.strip("/")
+        self._own_client = None
+        self._pid = None
+
+    def __getstate__(self):
+        # an own client is not picklable, and is created again in the worker
+        return {**vars(self), "_own_client": None, "_pid": None}
+
+    @property
+    def _s3(self):
+        if self._client is not None:
+            return self._client
+        # boto3 clients are not fork-safe, so a forked process creates its own
+        if self._own_client is None or self._pid != os.getpid():
+            import boto3
+
+            self._own_client = boto3.client("s3", endpoint_url=self._endpoint_url)
+            self._pid = os.getpid()
+        return self._own_client
+
+    def _key(self, key):
+        return f"{self._prefix}/{key}" if self._prefix else key
+
+    @staticmethod
+    def _missing(error):
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def exists(self, key):
+        try:
+            self._s3.head_object(Bucket=self._bucket, Key=self._key(key))
+        except Exception as error:
+            if self._missing(error):
+                return False
+            raise
+        return True
+
+    def get_bytes(self, key):
+        try:
+            response = self._s3.get_object(Bucket=self._bucket, Key=self._key(key))
+        except Exception as error:
+            if self._missing(error):
+                return None
+            raise
+        return response["Body"].read()
+
+    def get_file(self, key, path):
+        self._s3.download_file(self._bucket, self._key(key), path)
+
+    def put_bytes(self, key, data):
+        self._s3.put_object(Bucket=self._bucket, Key=self._key(key), Body=data)
+
+    def put_file(self, key, path):
+        # large files are uploaded in parts, and published when all are done
+        self._s3.upload_file(path, self._bucket, self._key(key))
+
+    def gdal_path(self, key):
+        return f"/vsis3/{self._bucket}/{self._key(key)}"
+
+    def gdal_options(self):
+        if self._endpoint_url is None:
+            return {}
+        # S3-compatible stores are addressed by path rather than by host
+        url = urlsplit(self._endpoint_url)
+        return {
+            "AWS_S3_ENDPOINT": url.netloc,
+            "AWS_HTTPS": "YES" if url.scheme == "https" else "NO",
+            "AWS_VIRTUAL_HOSTING": "FALSE",
+        }
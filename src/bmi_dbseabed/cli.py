@@ -6,39 +6,265 @@ import click
 
 from ._version import __version__
 from .dbseabed import DbSeabed
+from .instrument import format_phases
 
 
-@click.command()
+class _DefaultGroup(click.Group):
+    # run the download command unless the first argument is a subcommand, so
+    # "bmi_dbseabed --var_name=... output.tif" keeps working
+    def parse_args(self, ctx, args):
+        if not args or args[0] not in self.commands:
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultGroup)
+def main():
+    pass
+
+
+@main.command(epilog="Run 'bmi_dbseabed serve --help' to start a local query service.")
 @click.version_option(version=__version__)
 @click.option(
     "--var_name",
-    required=True,
-    help="Variable name of the dataset.",
+    default=None,
+    help=(
+        "Variable name of the dataset. For a Parquet output (a file name ending"
+        " with .parquet), several comma separated names give one column each."
+    ),
+)
+@click.option(
+    "--expr",
+    default=None,
+    help=(
+        "Expression over variable names to evaluate instead of downloading a"
+        " single variable, e.g. 'sand - mud' or 'carbonate * (1 - rock / 100)'."
+    ),
 )
 @click.option(
     "--bbox",
-    required=True,
+    default=None,
     help=(
         "Bounding box for data download."
         " Values are based on the crs (EPSG 4326) in a sequence of west, south, east,"
         " north separated by comma."
     ),
 )
+@click.option(
+    "--geometry",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help=(
+        "GeoJSON file or shapefile with polygons to clip the data to, used"
+        " instead of --bbox."
+    ),
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Print the time and I/O of each phase of the data download.",
+)
+@click.option(
+    "--memory_budget",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help=(
+        "Memory budget of the download in MB. Larger clips are streamed block by"
+        " block, or saved as tiles with a .vrt mosaic next to the output."
+    ),
+)
+@click.option(
+    "--dry_run",
+    is_flag=True,
+    help=(
+        "Print the estimated transfer, memory and output size and the chosen"
+        " strategy of the download without downloading data."
+    ),
+)
+@click.option(
+    "--cog",
+    default=None,
+    type=click.Choice(["deflate", "zstd", "lzw"]),
+    help=(
+        "Save a cloud-optimized GeoTIFF compressed with this codec, and print its"
+        " size and write throughput."
+    ),
+)
+@click.option(
+    "--fill",
+    default=None,
+    type=click.Choice(["nearest", "idw"]),
+    help=(
+        "Fill no-data cells within --fill_distance cells of valid data by their"
+        " nearest valid cell or inverse-distance weighting, and print the filled"
+        " and remaining no-data cell counts."
+    ),
+)
+@click.option(
+    "--fill_distance",
+    default=8.0,
+    show_default=True,
+    help="Distance in cells beyond which --fill leaves no-data cells.",
+)
 @click.argument("output", type=click.Path(exists=False))
-def main(
+def download(
     var_name,
+    expr,
     bbox,
+    geometry,
+    timings,
+    memory_budget,
+    dry_run,
+    cog,
+    fill,
+    fill_distance,
     output,
 ):
-    west, south, east, north = list(map(float, bbox.split(",")))
-    DbSeabed().get_data(
-        var_name=var_name,
-        west=west,
-        south=south,
-        east=east,
-        north=north,
-        output=output,
-        local_file=False,
-    )
+    if (var_name is None) == (expr is None):
+        raise click.UsageError("Please provide either --var_name or --expr.")
+    if (bbox is None) == (geometry is None):
+        raise click.UsageError("Please provide either --bbox or --geometry.")
+    if expr is not None and geometry is not None:
+        raise click.UsageError("Please provide --bbox when using --expr.")
+    if output.endswith(".parquet") and (expr is not None or geometry is not None):
+        raise click.UsageError(
+            "Please provide --var_name and --bbox for a Parquet output."
+        )
+    if (dry_run or memory_budget is not None) and (
+        expr is not None or geometry is not None or output.endswith(".parquet")
+    ):
+        raise click.UsageError(
+            "Please provide --var_name, --bbox and a .tif output with --dry_run"
+            " or --memory_budget."
+        )
+    if cog is not None and (expr is not None or output.endswith(".parquet")):
+        raise click.UsageError(
+            "Please provide --var_name and a .tif output with --cog."
+        )
+    if fill is not None and (
+        expr is not None
+        or geometry is not None
+        or memory_budget is not None
+        or output.endswith(".parquet")
+    ):
+        raise click.UsageError(
+            "Please provide --var_name, --bbox and a .tif output with --fill."
+        )
+
+    if geometry is not None:
+        west = south = east = north = None
+    else:
+        west, south, east, north = list(map(float, bbox.split(",")))
+    if memory_budget is not None:
+        memory_budget = int(memory_budget * 1024**2)
+    if fill is not None:
+        from .gapfill import GapFiller
+
+        fill = GapFiller(fill, max_distance=fill_distance)
+
+    if dry_run:
+        from .planner import format_plan
+
+        print(
+            format_plan(
+                DbSeabed().plan(
+                    var_name=var_name,
+                    west=west,
+                    south=south,
+                    east=east,
+                    north=north,
+                    memory_budget=memory_budget,
+                )
+            )
+        )
+        return
+
+    if output.endswith(".parquet"):
+        DbSeabed().get_table(
+            var_name=var_name.split(","),
+            west=west,
+            south=south,
+            east=east,
+            north=north,
+            output=output,
+        )
+    elif expr is not None:
+        DbSeabed().evaluate(
+            expr=expr,
+            west=west,
+            south=south,
+            east=east,
+            north=north,
+            output=output,
+        )
+    else:
+        dbseabed = DbSeabed()
+        dbseabed.get_data(
+            var_name=var_name,
+            west=west,
+            south=south,
+            east=east,
+            north=north,
+            output=output,
+            local_file=False,
+            geometry=geometry,
+            memory_budget=memory_budget,
+            cog=cog,
+            fill=fill,
+        )
+        if timings:
+            print(format_phases(dbseabed.metadata["phases"]))
+        if cog is not None:
+            from .cog import format_report
+            from .cog import CogReport
+
+            print(format_report(CogReport(**dbseabed.metadata["cog"])))
+        if fill is not None:
+            from .gapfill import FillReport
+            from .gapfill import format_report
+
+            print(format_report(FillReport(**dbseabed.metadata["fill"])))
     if os.path.isfile(output):
         print("Done")
+
+
+main.default_command = "download"
+
+
+@main.command()
+@click.option("--host", default="127.0.0.1", help="Address to listen on.")
+@click.option("--port", default=8080, type=int, help="Port to listen on.")
+@click.option(
+    "--cache_mb",
+    default=256,
+    type=click.IntRange(min=0),
+    help="Size of the in-memory cache of decoded blocks, in MB.",
+)
+@click.option(
+    "--cache_compress",
+    is_flag=True,
+    help="Keep cached blocks compressed, so several times more of them fit.",
+)
+def serve(host, port, cache_mb, cache_compress):
+    """
+    Serve clip, point-sample and metadata queries over HTTP.
+
+    \b
+    GET /metadata/<var_name>
+    GET /sample/<var_name>?point=x,y[&point=x,y...]
+    GET /clip/<var_name>?bbox=west,south,east,north (GeoTIFF)
+    GET /metrics (cache hits and query latency)
+    """
+    from .service import make_server
+    from .service import QueryService
+
+    service = QueryService(cache_bytes=cache_mb * 1024**2, compress=cache_compress)
+    server = make_server(service, host, port)
+    print(f"Serving on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
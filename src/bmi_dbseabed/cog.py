@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import namedtuple
+
+import numpy
+import rasterio.shutil
+
+# codecs of cloud-optimized outputs, all with a predictor chosen by GDAL for
+# the data type (floating point or horizontal differencing)
+COG_CODECS = ("deflate", "zstd", "lzw")
+
+CogReport = namedtuple(
+    "CogReport",
+    ["compress", "seconds", "raw_bytes", "file_bytes", "ratio", "throughput"],
+)
+CogReport.__doc__ = """
+Size and speed of a cloud-optimized GeoTIFF write.
+
+Attributes:
+    compress: Codec of the output.
+    seconds: Wall time of the write.
+    raw_bytes: Size of the uncompressed values.
+    file_bytes: Size of the output files.
+    ratio: Ratio of the raw size to the file size.
+    throughput: Raw bytes encoded per second.
+"""
+
+
+def write_cog(
+    path,
+    output=None,
+    compress="deflate",
+    level=None,
+    num_threads="ALL_CPUS",
+    blocksize=512,
+    overview_resampling="average",
+):
+    """
+    Convert a GeoTIFF to a cloud-optimized GeoTIFF.
+
+    The output is tiled, has overviews down to the tile size, and is
+    compressed with a predictor on several threads.
+
+    Args:
+        path: Input file path.
+        output: Output file path. Defaults to the input, which is replaced.
+        compress: Codec, one of COG_CODECS.
+        level: Optional compression level of deflate or zstd.
+        num_threads: Number of threads compressing tiles, or "ALL_CPUS".
+        blocksize: Size of the square tiles.
+        overview_resampling: Resampling method of the overviews.
+
+    Returns:
+        CogReport: Size and speed of the write.
+    """
+    if compress not in COG_CODECS:
+        raise ValueError(f"Please provide a valid compress value: {COG_CODECS}.")
+
+    options = {
+        "COMPRESS": compress.upper(),
+        "PREDICTOR": "YES",
+        "NUM_THREADS": str(num_threads),
+        "BLOCKSIZE": blocksize,
+        "OVERVIEW_RESAMPLING": overview_resampling.upper(),
+    }
+    if level is not None and compress != "lzw":
+        options["LEVEL"] = level
+
+    with rasterio.open(path) as src:
+        raw_bytes = (
+            src.width * src.height * src.count * numpy.dtype(src.dtypes[0]).itemsize
+        )
+
+    target = output or f"{path}.cog"
+    start = time.perf_counter()
+    rasterio.shutil.copy(path, target, driver="COG", **options)
+    seconds = time.perf_counter() - start
+    if output is None:
+        os.replace(target, path)
+        target = path
+
+    return _report(compress, seconds, raw_bytes, os.path.getsize(target))
+
+
+def _report(compress, seconds, raw_bytes, file_bytes):
+    return CogReport(
+        compress=compress,
+        seconds=seconds,
+        raw_bytes=raw_bytes,
+        file_bytes=file_bytes,
+        ratio=raw_bytes / file_bytes,
+        throughput=raw_bytes / seconds if seconds else float("inf"),
+    )
+
+
+def merge_reports(reports):
+    """
+    Sum the reports of writes of several files.
+
+    Args:
+        reports: Reports of writes with the same codec.
+
+    Returns:
+        CogReport: Report of all the writes.
+    """
+    return _report(
+        reports[0].compress,
+        sum(report.seconds for report in reports),
+        sum(report.raw_bytes for report in reports),
+        sum(report.file_bytes for report in reports),
+    )
+
+
+def format_report(report):
+    """
+    Format a report as one line.
+
+    Args:
+        report: Report as returned by ``write_cog``.
+
+    Returns:
+        str: Codec, raw and file sizes, ratio and throughput.
+    """
+    return (
+        f"cog: {report.compress}, {report.raw_bytes / 1e6:.2f} MB ->"
+        f" {report.file_bytes / 1e6:.2f} MB ({report.ratio:.1f}x) in"
+        f" {report.seconds:.3f} s ({report.throughput / 1e6:.1f} MB/s)"
+    )
@@ -1,12 +1,33 @@
 from __future__ import annotations
 
+import functools
+import json
+import math
 import os
 
-import rioxarray
+from bmi_dbseabed.instrument import PhaseRecorder
+
+
+def _gdal_env(method):
+    # sources published in a shared cache are opened and read with the GDAL
+    # options of the cache, e.g. the endpoint of an S3-compatible store
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._gdal_env():
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class DbSeabed:
     # TODO update bmi names
+    # "link" is the current release of each dataset. Previous or alternative
+    # releases can be listed in an optional "releases" item that maps the
+    # release time (year) to its link.
+    # Variables backed by many regional or tiled files list them in a "tiles"
+    # item instead of "link", as {"link": ..., "bounds": [west, south, east,
+    # north]}. Only the tiles intersecting a request are opened, as a virtual
+    # mosaic. Tiles must share crs, resolution and grid alignment.
     DATA_SERVICES = {
         "carbonate": {
             "name": "surficial_seafloor_carbonate__fraction",
@@ -80,9 +101,67 @@ class DbSeabed:
         },
     }
 
-    def __init__(self):
+    def __init__(
+        self,
+        metrics_callback=None,
+        trace_memory=False,
+        cache_dir=None,
+        cache=None,
+        block_cache=None,
+    ):
+        """
+        Args:
+            metrics_callback: Optional function called with the wall time,
+                bytes read and written, and memory of each phase of get_data,
+                as an ``instrument.Phase``. Phases are also logged to the
+                "bmi_dbseabed" logger at debug level.
+            trace_memory: If True, measure the peak memory of each phase with
+                tracemalloc, in its "peak_memory" item, which is None
+                otherwise. This is slower. Every phase also has the
+                "process_peak_rss" item, the high-water mark of the process
+                resident memory since it started, which is not specific to
+                the phase.
+            cache_dir: Optional directory of the summary indexes built by
+                ``build_index``. Defaults to the user cache directory.
+            cache: Optional ``cache.CacheBackend`` shared by workers. Sources
+                are read from copies published in the cache, with its GDAL
+                options, and bounding box clips are published with their
+                metadata, so the first worker that fetches a source or a clip
+                warms the cache of the others.
+            block_cache: Optional in-process ``blockcache.BlockCache`` or
+                ``blockcache.CompressedBlockCache``. Bounding box clips read
+                in memory are assembled from the cached tiles of the source,
+                so overlapping clips read each tile once. It is not pickled.
+        """
         self._tif_file = None
         self._metadata = None
+        self._burn_masks = {}
+        self._metrics_callback = metrics_callback
+        self._trace_memory = trace_memory
+        self._cache_dir = cache_dir
+        self._cache = cache
+        self._block_cache = block_cache
+        self._indexes = {}
+
+    def __getstate__(self):
+        # the settings and the result of the last call only: burn masks and
+        # indexes are rebuilt or reloaded from the cache directory on demand
+        return {
+            "metrics_callback": self._metrics_callback,
+            "trace_memory": self._trace_memory,
+            "cache_dir": self._cache_dir,
+            "cache": self._cache,
+            "tif_file": self._tif_file,
+            "metadata": self._metadata,
+        }
+
+    def __setstate__(self, state):
+        state = dict(state)
+        tif_file = state.pop("tif_file")
+        metadata = state.pop("metadata")
+        self.__init__(**state)
+        self._tif_file = tif_file
+        self._metadata = metadata
 
     @property
     def tif_file(self):
@@ -102,20 +181,30 @@ class DbSeabed:
                     f"Variable name: {key}",
                     f"Variable units: {value['units']}",
                     f"BMI standard name: {value['name']}",
-                    f"Data link: {value['link']}\n",
+                    (
+                        f"Data link: {value['link']}\n"
+                        if "link" in value
+                        else f"Data tiles: {len(value['tiles'])}\n"
+                    ),
                 ]
             )
         print(os.linesep.join(string_list))
 
+    @_gdal_env
     def get_data(
         self,
         var_name,
-        west,
-        south,
-        east,
-        north,
-        output,
+        west=None,
+        south=None,
+        east=None,
+        north=None,
+        output=None,
         local_file=False,
+        geometry=None,
+        release=None,
+        memory_budget=None,
+        cog=None,
+        fill=None,
     ):
         """
         Get data from the remote server.
@@ -128,37 +217,232 @@ class DbSeabed:
             north: y coordinate of the upper right corner of the grid extent.
             output: Output file path.
             local_file: If True, load the local file without data download.
+            geometry: Optional GeoJSON polygon geometry, feature or feature
+                collection, or the path of a GeoJSON file or shapefile. If
+                provided, only the raster blocks intersecting the polygons are
+                read, cells outside the polygons are saved as no-data, and the
+                bounding box values are not used.
+            release: Optional release of the dataset, a key of the "releases"
+                item of the variable in DATA_SERVICES. Defaults to the current
+                release at "link".
+            memory_budget: Optional memory budget in bytes of a bounding box
+                clip. Clips that do not fit are streamed block by block, and
+                clips whose values would not fit are saved as tiles with a
+                virtual mosaic, which is then the tif_file. See ``plan``.
+            cog: Optional codec, one of ``cog.COG_CODECS``, to save the output
+                as a cloud-optimized GeoTIFF: tiled, with overviews, and
+                compressed with a predictor on all CPUs.
+            fill: Optional method, one of ``gapfill.METHODS``, or a
+                ``gapfill.GapFiller``, to fill the no-data cells of a
+                bounding box clip from the valid cells around them, within
+                the bounding box or not, before it is saved. Cells farther
+                than the maximum distance of the filler (8 cells by default)
+                from valid cells stay no-data, and are counted in the
+                "remaining" item of the report.
 
         Returns:
             rioxarray.Dataset: Dataset containing the dbSEABED dataset.
+            The time, I/O and memory of each phase are stored in the
+            "phases" item of the metadata, the plan of a clip with a
+            memory budget in its "plan" item, and the size and throughput
+            of the cloud-optimized output in its "cog" item, and the cost and
+            number of filled and remaining no-data cells of a gap fill in its
+            "fill" item. Clips from a shared cache have a "cached" item set
+            to True.
         """
+        # heavy dependencies are imported on first use to keep startup fast
+        import rioxarray
 
         # check var_name
         if var_name not in DbSeabed.DATA_SERVICES.keys():
             raise ValueError("Please provide a valid var_name value.")
 
-        # check bounding box
-        if west > east or south > north:
-            raise ValueError(
-                "Please provide valid bounding box values for west, east, south and"
-                " north."
-            )
+        if geometry is None:
+            self._check_bbox(west, south, east, north)
+        self._check_output(output)
+        if cog is not None:
+            from bmi_dbseabed.cog import COG_CODECS
 
-        # check output
-        if not output.endswith(".tif"):
-            raise ValueError(
-                "Please provide a valid output file name with .tif extension."
-            )
+            if cog not in COG_CODECS:
+                raise ValueError(f"Please provide a valid cog value: {COG_CODECS}.")
+        if fill is not None:
+            from bmi_dbseabed.gapfill import GapFiller
+
+            if geometry is not None:
+                raise ValueError("Please provide either a geometry or a fill method.")
+            if memory_budget is not None:
+                raise ValueError(
+                    "Please provide either a memory budget or a fill method."
+                )
+            if isinstance(fill, str):
+                fill = GapFiller(fill)
 
-        if local_file and os.path.isfile(output):
+        recorder = PhaseRecorder(
+            callback=self._metrics_callback, trace_memory=self._trace_memory
+        )
+
+        local = local_file and os.path.isfile(output)
+        plan = tiles = report = fill_report = clip_key = stored = None
+        if local:
             # load local data
-            dataset = rioxarray.open_rasterio(output, masked=True)
+            with recorder.phase("open"):
+                dataset = rioxarray.open_rasterio(output, masked=True)
+            links = self.get_links(var_name, release=release)
+
+        elif geometry is not None:
+            dataset, links = self._clip_geometry(
+                var_name, release, geometry, output, recorder
+            )
 
         else:
             # access and subset data from server
-            ori_data = rioxarray.open_rasterio(
-                DbSeabed.DATA_SERVICES[var_name]["link"], masked=True
-            )
+            bbox = (west, south, east, north)
+            links = self.get_links(var_name, *bbox, release)
+            if self._cache is not None:
+                clip_key = self._clip_key(var_name, bbox, release, cog, fill, links)
+                stored = self._cached_clip(clip_key, output, recorder)
+
+            if stored is not None:
+                dataset = rioxarray.open_rasterio(output, masked=True)
+            else:
+                source = self._source(links)
+                if memory_budget is not None:
+                    plan = self._plan_source(source, bbox, memory_budget)
+
+                if plan is None or plan.strategy == "memory":
+                    dataset, fill_report = self._clip_memory(
+                        source, bbox, output, recorder, self._block_cache, fill
+                    )
+                else:
+                    dataset, output, tiles = self._clip_streamed(
+                        source, bbox, output, plan, recorder
+                    )
+
+        if cog is not None and not local and stored is None:
+            from bmi_dbseabed.cog import merge_reports
+            from bmi_dbseabed.cog import write_cog
+
+            # GDAL writes cloud-optimized files by copying a finished raster
+            with recorder.phase("cog"):
+                dataset.close()
+                report = merge_reports(
+                    [write_cog(path, compress=cog) for path in tiles or [output]]
+                )
+                dataset = rioxarray.open_rasterio(output, masked=True)
+
+        self._store_metadata(
+            dataset,
+            output,
+            variable_name=var_name,
+            bmi_standard_name=DbSeabed.DATA_SERVICES[var_name]["name"],
+            variable_units=DbSeabed.DATA_SERVICES[var_name]["units"],
+            service_url=links[0] if len(links) == 1 else links,
+        )
+        self._metadata["phases"] = recorder.as_dict()
+        if plan is not None:
+            self._metadata["plan"] = plan._asdict()
+        if tiles is not None:
+            self._metadata["tiles"] = tiles
+        if report is not None:
+            self._metadata["cog"] = report._asdict()
+        if fill_report is not None:
+            self._metadata["fill"] = fill_report._asdict()
+
+        if stored is not None:
+            self._metadata.update(stored, cached=True)
+        elif clip_key is not None and tiles is None:
+            self._publish_clip(clip_key, output)
+
+        return dataset
+
+    @staticmethod
+    def _clip_key(var_name, bbox, release, cog, fill, links):
+        from bmi_dbseabed.snapshot import data_version
+        from bmi_dbseabed.snapshot import snapshot_key
+
+        conf = {"clip": var_name, "bbox": bbox, "release": release, "cog": cog}
+        if fill is not None:
+            conf["fill"] = repr(fill)
+        return snapshot_key(
+            conf,
+            [data_version(link) for link in links],
+        )
+
+    def _cached_clip(self, clip_key, output, recorder):
+        from bmi_dbseabed.cache import CLIPS
+
+        # the metadata is published after the clip, so a clip is complete
+        # once its metadata exists
+        stored = self._cache.get_bytes(f"{CLIPS}/{clip_key}.json")
+        if stored is None:
+            return None
+        with recorder.phase("read"):
+            self._cache.get_file(f"{CLIPS}/{clip_key}.tif", output)
+        return json.loads(stored)
+
+    def _publish_clip(self, clip_key, output):
+        from bmi_dbseabed.cache import CLIPS
+
+        stored = {
+            name: value
+            for name, value in self._metadata.items()
+            if name in ("plan", "cog", "fill")
+        }
+        self._cache.put_file(f"{CLIPS}/{clip_key}.tif", output)
+        self._cache.put_bytes(f"{CLIPS}/{clip_key}.json", json.dumps(stored).encode())
+
+    @_gdal_env
+    def plan(
+        self, var_name, west, south, east, north, memory_budget=None, release=None
+    ):
+        """
+        Plan the download of a bounding box without reading any data.
+
+        Only the headers of the source files are read, to estimate the bytes
+        to transfer, the memory to decode the clip and the output size, and
+        to choose how ``get_data`` clips it within a memory budget: "memory"
+        to read it at once, "blocks" to stream it block by block to the
+        output file, or "tiles" to stream it to several files, each small
+        enough to load within the budget.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            memory_budget: Optional memory budget in bytes.
+            release: Optional release of the dataset.
+
+        Returns:
+            planner.Plan: The plan of the download.
+        """
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        self._check_bbox(west, south, east, north)
+
+        links = self.get_links(var_name, west, south, east, north, release)
+        return self._plan_source(
+            self._source(links), (west, south, east, north), memory_budget
+        )
+
+    @staticmethod
+    def _plan_source(source, bbox, memory_budget):
+        import rasterio
+        from bmi_dbseabed.blocks import bbox_window
+        from bmi_dbseabed.planner import plan_clip
+
+        with rasterio.open(source) as src:
+            return plan_clip(src, bbox_window(src, *bbox), memory_budget)
+
+    @staticmethod
+    def _clip_memory(source, bbox, output, recorder, block_cache=None, fill=None):
+        import rioxarray
+
+        west, south, east, north = bbox
+        with recorder.phase("open"):
+            ori_data = rioxarray.open_rasterio(source, masked=True)
+        with recorder.phase("clip"):
             dataset = ori_data.rio.clip_box(
                 minx=west,
                 miny=south,
@@ -166,13 +450,782 @@ class DbSeabed:
                 maxy=north,
             )
 
-            # save the data as geotiff
+        # clip_box is lazy, so the transfer happens when the values are loaded
+        report = None
+        if fill is not None:
+            # cells near the edges are filled from the valid cells around the
+            # bounding box too, so they do not depend on its size
+            with recorder.phase("read"):
+                values = DbSeabed._read_halo(
+                    source, bbox, fill.halo, block_cache, dataset.dtype
+                )
+            with recorder.phase("fill"):
+                values, report = fill.fill(values, halo=fill.halo)
+                dataset = dataset.copy(data=values[None])
+        else:
+            with recorder.phase("read"):
+                if block_cache is None:
+                    dataset.load()
+                else:
+                    dataset = dataset.copy(
+                        data=DbSeabed._read_cached(
+                            source, bbox, block_cache, dataset.dtype
+                        )
+                    )
+
+        # save the data as geotiff
+        with recorder.phase("write"):
             dataset.rio.to_raster(
                 raster_path=output,
                 driver="GTiff",
                 recalc_transform=False,
             )
+        return dataset, report
+
+    @staticmethod
+    def _read_halo(source, bbox, halo, block_cache, dtype):
+        import numpy
+        import rasterio
+        from bmi_dbseabed.blockcache import read_cached
+        from bmi_dbseabed.blocks import bbox_window
+        from bmi_dbseabed.blocks import read_halo
+        from bmi_dbseabed.snapshot import data_version
+
+        with rasterio.open(source) as src:
+            if block_cache is None:
+
+                def read(window):
+                    masked = src.read(1, window=window, masked=True)
+                    return masked.filled(numpy.nan).astype(dtype, copy=False)
+
+            else:
+                key = (source, tuple(sorted(data_version(source).items())))
 
+                def read(window):
+                    return read_cached(block_cache, key, src, window, dtype)
+
+            # the stored values, as read by rioxarray.open_rasterio(masked=True)
+            return read_halo(src, bbox_window(src, *bbox), halo, dtype, read)
+
+    @staticmethod
+    def _read_cached(source, bbox, block_cache, dtype):
+        import rasterio
+        from bmi_dbseabed.blockcache import read_cached
+        from bmi_dbseabed.blocks import bbox_window
+        from bmi_dbseabed.snapshot import data_version
+
+        # the version in the key makes rewritten local files miss the cache
+        key = (source, tuple(sorted(data_version(source).items())))
+        with rasterio.open(source) as src:
+            values = read_cached(block_cache, key, src, bbox_window(src, *bbox), dtype)
+        # band dimension of the dataset
+        return values[None]
+
+    @staticmethod
+    def _clip_streamed(source, bbox, output, plan, recorder):
+        import rasterio
+        import rioxarray
+        from bmi_dbseabed.blocks import bbox_window
+        from bmi_dbseabed.planner import write_blocks
+        from bmi_dbseabed.planner import write_tiles
+
+        with recorder.phase("open"):
+            src = rasterio.open(source)
+
+        # blocks are read and written together, so both are in one phase
+        tiles = None
+        with src, recorder.phase("write"):
+            window = bbox_window(src, *bbox)
+            if plan.strategy == "tiles":
+                output, tiles = write_tiles(src, window, output, plan.tile_shape)
+            else:
+                write_blocks(src, window, output)
+
+        return rioxarray.open_rasterio(output, masked=True), output, tiles
+
+    @_gdal_env
+    def evaluate(
+        self,
+        expr,
+        west,
+        south,
+        east,
+        north,
+        output,
+        release=None,
+    ):
+        """
+        Evaluate an expression over dbSEABED variables and save the result.
+
+        Only the layers referenced in the expression are read, block by block
+        within the bounding box, so no full-size intermediate grids are held
+        in memory.
+
+        Args:
+            expr: Expression over variable names, e.g. "sand - mud" or
+                "carbonate * (1 - rock / 100)".
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            output: Output file path.
+            release: Optional release of the variables of the expression, a
+                key of the "releases" item of each of them in DATA_SERVICES.
+                Defaults to the current release.
+
+        Returns:
+            rioxarray.Dataset: Dataset containing the expression result.
+        """
+        import rasterio
+        import rioxarray
+        from bmi_dbseabed import blocks
+        from bmi_dbseabed.expression import Expression
+        from rasterio.windows import Window
+
+        expression = Expression(expr, DbSeabed.DATA_SERVICES.keys())
+        if not expression.variables:
+            raise ValueError(
+                "Please provide an expression with at least one variable name."
+            )
+
+        self._check_bbox(west, south, east, north)
+        self._check_output(output)
+
+        links = {
+            name: self.get_links(name, west, south, east, north, release)
+            for name in expression.variables
+        }
+        sources = {
+            name: rasterio.open(self._source(links[name]))
+            for name in expression.variables
+        }
+        try:
+            blocks.check_aligned(sources)
+            src = sources[expression.variables[0]]
+            window = blocks.bbox_window(src, west, south, east, north)
+
+            with blocks.GTiffBlockWriter(
+                output, blocks.window_profile(src, window)
+            ) as writer:
+                for block in blocks.iter_blocks(src, window):
+                    values = expression.evaluate(
+                        {
+                            name: blocks.read_block(source, block)
+                            for name, source in sources.items()
+                        }
+                    )
+                    writer.write(
+                        values.astype("float32", copy=False),
+                        Window(
+                            block.col_off - window.col_off,
+                            block.row_off - window.row_off,
+                            block.width,
+                            block.height,
+                        ),
+                    )
+        finally:
+            for source in sources.values():
+                source.close()
+
+        dataset = rioxarray.open_rasterio(output, masked=True)
+
+        self._store_metadata(
+            dataset,
+            output,
+            variable_name=expression.text,
+            bmi_standard_name=None,
+            variable_units=None,
+            service_url=[link for name in expression.variables for link in links[name]],
+        )
+
+        return dataset
+
+    @_gdal_env
+    def get_stencil(
+        self,
+        var_name,
+        stencil,
+        west,
+        south,
+        east,
+        north,
+        output,
+        radius=1,
+        release=None,
+        workers=1,
+    ):
+        """
+        Compute a spatial derivative of a variable and save it.
+
+        The stencil is applied block by block, each block read with a halo of
+        the cells around it, including cells outside the bounding box, so the
+        result is the same as applying the stencil to the whole grid and
+        clipping it.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            stencil: Name of a stencil of ``stencils.STENCILS``: "gradient"
+                (magnitude per metre), "variability" (local standard
+                deviation) or "roughness" (local range), or a
+                ``stencils.Stencil``.
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            output: Output file path.
+            radius: Half width in cells of the neighbourhood of the stencil.
+            release: Optional release of the dataset.
+            workers: Number of threads computing blocks.
+
+        Returns:
+            rioxarray.Dataset: Dataset read lazily from the output file.
+        """
+        import rasterio
+        import rioxarray
+        from bmi_dbseabed import blocks
+        from bmi_dbseabed.stencils import STENCILS
+        from bmi_dbseabed.stencils import StencilProcessor
+
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        if isinstance(stencil, str):
+            if stencil not in STENCILS:
+                raise ValueError(
+                    f"Please provide a valid stencil name: {tuple(STENCILS)}."
+                )
+            stencil = STENCILS[stencil](radius)
+        self._check_bbox(west, south, east, north)
+        self._check_output(output)
+
+        links = self.get_links(var_name, west, south, east, north, release)
+        if len(links) < len(self.get_links(var_name, release=release)):
+            # the halo of the cells at the edges may be in the next tiles
+            with rasterio.open(links[0]) as src:
+                x_res, y_res = src.res
+            links = self.get_links(
+                var_name,
+                west - stencil.halo * x_res,
+                south - stencil.halo * y_res,
+                east + stencil.halo * x_res,
+                north + stencil.halo * y_res,
+                release,
+            )
+        with rasterio.open(self._source(links)) as src:
+            window = blocks.bbox_window(src, west, south, east, north)
+            StencilProcessor(stencil, workers=workers).write(src, window, output)
+            per = "metre" if src.crs.is_geographic else src.crs.linear_units
+
+        dataset = rioxarray.open_rasterio(output, masked=True)
+
+        units = DbSeabed.DATA_SERVICES[var_name]["units"]
+        self._store_metadata(
+            dataset,
+            output,
+            variable_name=var_name,
+            bmi_standard_name=None,
+            variable_units=f"{units} per {per}"
+            if stencil.name == "gradient"
+            else units,
+            service_url=links[0] if len(links) == 1 else links,
+            stencil=stencil.name,
+            halo=stencil.halo,
+        )
+
+        return dataset
+
+    @_gdal_env
+    def get_realizations(
+        self,
+        var_name,
+        west,
+        south,
+        east,
+        north,
+        output,
+        count,
+        seed=0,
+        correlation_length=0.0,
+        workers=1,
+    ):
+        """
+        Generate Monte Carlo realizations of a variable and save them.
+
+        Each realization is the variable plus standard normal noise scaled by
+        its total standard uncertainty (the "_totlsu" layer). Realizations are
+        computed block by block and saved as the bands of a tiled GeoTIFF, so
+        no full grid is held in memory.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            output: Output file path.
+            count: Number of realizations.
+            seed: Seed of the realizations.
+            correlation_length: Standard deviation of the Gaussian kernel
+                correlating the noise, in cells. Zero gives uncorrelated noise.
+            workers: Number of threads computing blocks.
+
+        Returns:
+            rioxarray.Dataset: Dataset with one band per realization, read
+            lazily from the output file.
+        """
+        import rasterio
+        import rioxarray
+        from bmi_dbseabed import blocks
+        from bmi_dbseabed.realizations import RealizationGenerator
+
+        sigma_name = self.uncertainty_name(var_name)
+        self._check_bbox(west, south, east, north)
+        self._check_output(output)
+        if count < 1:
+            raise ValueError("Please provide a positive number of realizations.")
+
+        generator = RealizationGenerator(
+            seed=seed, correlation_length=correlation_length, workers=workers
+        )
+        links = self.get_links(var_name, west, south, east, north)
+        sigma_links = self.get_links(sigma_name, west, south, east, north)
+        with rasterio.open(self._source(links)) as src, rasterio.open(
+            self._source(sigma_links)
+        ) as sigma:
+            window = blocks.bbox_window(src, west, south, east, north)
+            generator.write(src, sigma, window, output, count)
+
+        dataset = rioxarray.open_rasterio(output, masked=True)
+
+        self._store_metadata(
+            dataset,
+            output,
+            variable_name=var_name,
+            bmi_standard_name=DbSeabed.DATA_SERVICES[var_name]["name"],
+            variable_units=DbSeabed.DATA_SERVICES[var_name]["units"],
+            service_url=links + sigma_links,
+            realizations=count,
+            seed=seed,
+            correlation_length=correlation_length,
+        )
+
+        return dataset
+
+    @staticmethod
+    def uncertainty_name(var_name):
+        """
+        Get the name of the total standard uncertainty layer of a variable.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+
+        Returns:
+            str: Variable name of the uncertainty layer.
+        """
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        sigma_name = f"{var_name}_totlsu"
+        if sigma_name not in DbSeabed.DATA_SERVICES:
+            raise ValueError(
+                f"Please provide a var_name with an uncertainty layer, not {var_name}."
+            )
+        return sigma_name
+
+    def get_table(
+        self,
+        var_name,
+        west,
+        south,
+        east,
+        north,
+        output=None,
+        row_group_size=1_000_000,
+    ):
+        """
+        Get the valid cells within a bounding box as an Arrow table.
+
+        The cells are read strip by strip and converted to record batches
+        with "x" and "y" cell center coordinates and one column per variable,
+        so large regions are never held in memory at once. This requires the
+        pyarrow package.
+
+        Args:
+            var_name: Variable name, or list of variable names sharing a grid.
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            output: Optional Parquet file path to write the table to.
+            row_group_size: Maximum number of rows per Parquet row group.
+
+        Returns:
+            pyarrow.RecordBatchReader: Stream of the record batches, or
+            pyarrow.parquet.ParquetFile: The Parquet file if output is given.
+        """
+        import rasterio
+        from bmi_dbseabed import blocks
+        from bmi_dbseabed import tabular
+
+        var_names = [var_name] if isinstance(var_name, str) else list(var_name)
+        for name in var_names:
+            if name not in DbSeabed.DATA_SERVICES.keys():
+                raise ValueError("Please provide a valid var_name value.")
+        self._check_bbox(west, south, east, north)
+        if output is not None and not str(output).endswith(".parquet"):
+            raise ValueError(
+                "Please provide a valid output file name with .parquet extension."
+            )
+        schema = tabular.table_schema(var_names)
+
+        def _batches():
+            with self._gdal_env():
+                sources = {
+                    name: rasterio.open(
+                        self._source(self.get_links(name, west, south, east, north))
+                    )
+                    for name in var_names
+                }
+                try:
+                    src = sources[var_names[0]]
+                    window = blocks.bbox_window(src, west, south, east, north)
+                    yield from tabular.iter_batches(sources, window)
+                finally:
+                    for source in sources.values():
+                        source.close()
+
+        if output is None:
+            import pyarrow
+
+            return pyarrow.RecordBatchReader.from_batches(schema, _batches())
+
+        import pyarrow.parquet
+
+        tabular.write_parquet(output, _batches(), schema, row_group_size)
+        return pyarrow.parquet.ParquetFile(output)
+
+    @_gdal_env
+    def sample(self, var_name, points):
+        """
+        Sample variables at points as an Arrow record batch.
+
+        This requires the pyarrow package.
+
+        Args:
+            var_name: Variable name, or list of variable names sharing a grid.
+            points: Sequence of (x, y) coordinates.
+
+        Returns:
+            pyarrow.RecordBatch: One row per point with "x", "y" and a column
+            per variable, NaN outside the grid or at no-data cells.
+        """
+        import rasterio
+        from bmi_dbseabed import tabular
+        from bmi_dbseabed.geometry import points_bounds
+
+        var_names = [var_name] if isinstance(var_name, str) else list(var_name)
+        for name in var_names:
+            if name not in DbSeabed.DATA_SERVICES.keys():
+                raise ValueError("Please provide a valid var_name value.")
+
+        bounds = points_bounds(points)
+        sources = {
+            name: rasterio.open(self._source(self._links_near(name, bounds)))
+            for name in var_names
+        }
+        try:
+            return tabular.sample_batch(sources, points)
+        finally:
+            for source in sources.values():
+                source.close()
+
+    @_gdal_env
+    def zonal_stats(self, var_name, zones, percentiles=(25, 50, 75)):
+        """
+        Compute statistics of a variable within many zones.
+
+        Each raster block that intersects a zone is read once for all zones,
+        instead of downloading a clip per zone.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            zones: Mapping of zone ids to zones, or a sequence of zones
+                identified by their position. A zone is a GeoJSON geometry or
+                feature, or a (west, south, east, north) bounding box.
+            percentiles: Percentiles to estimate for each zone.
+
+        Returns:
+            dict: Statistics for each zone id with the valid cell count, mean,
+            std, min, max and approximate percentiles ("p50" etc.).
+        """
+        import rasterio
+        from bmi_dbseabed.zonal import zonal_statistics
+        from bmi_dbseabed.zonal import zones_bounds
+
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+
+        links = self._links_near(var_name, zones_bounds(zones))
+        with rasterio.open(self._source(links)) as src:
+            return zonal_statistics(src, zones, percentiles=percentiles)
+
+    @_gdal_env
+    def build_index(self, var_name, release=None, bins=32):
+        """
+        Build or load the per-block summary index of a variable.
+
+        The index holds the min, max, mean, valid count and histogram of each
+        block of the variable. It is saved in the cache directory, keyed by
+        the variable, release, bins and data version, and kept in memory for
+        later queries.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            release: Optional release of the dataset.
+            bins: Number of histogram bins. Percent variables are binned over
+                0 to 100, others over their range.
+
+        Returns:
+            summary.SummaryIndex: The index.
+        """
+        import rasterio
+        from bmi_dbseabed.snapshot import data_version
+        from bmi_dbseabed.snapshot import default_cache_dir
+        from bmi_dbseabed.snapshot import snapshot_key
+        from bmi_dbseabed.summary import SummaryIndex
+
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+
+        links = self.get_links(var_name, release=release)
+        key = snapshot_key(
+            {"index": var_name, "release": release, "bins": bins},
+            [data_version(link) for link in links],
+        )
+        if key in self._indexes:
+            return self._indexes[key]
+
+        path = os.path.join(
+            self._cache_dir or default_cache_dir(), "index", f"{key}.npz"
+        )
+        index = SummaryIndex.load(path)
+        if index is None:
+            percent = DbSeabed.DATA_SERVICES[var_name]["units"] == "percent"
+            with rasterio.open(self._source(links)) as src:
+                index = SummaryIndex.build(
+                    src, bins=bins, value_range=(0.0, 100.0) if percent else None
+                )
+            index.save(path)
+        self._indexes[key] = index
+        return index
+
+    def summary(self, var_name, release=None):
+        """
+        Get the summary of a whole variable from its index.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            release: Optional release of the dataset.
+
+        Returns:
+            dict: Valid cell count, min, max, mean, and the histogram counts
+            and bin edges.
+        """
+        return self.build_index(var_name, release).summary()
+
+    @_gdal_env
+    def count(self, var_name, low=None, high=None, release=None):
+        """
+        Count the cells of a variable with values within a range.
+
+        Blocks entirely within the range are counted from the summary index,
+        and blocks that cannot match are skipped, so only the blocks that
+        straddle a bound are read.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            low: Optional lower bound, inclusive.
+            high: Optional upper bound, inclusive.
+            release: Optional release of the dataset.
+
+        Returns:
+            int: Number of cells.
+        """
+        import rasterio
+
+        index = self.build_index(var_name, release)
+        links = self.get_links(var_name, release=release)
+        with rasterio.open(self._source(links)) as src:
+            return index.count_range(src, low, high)
+
+    @_gdal_env
+    def select(self, var_name, low=None, high=None, release=None):
+        """
+        Find the cells of a variable with values within a range.
+
+        Blocks whose range in the summary index cannot match are skipped, so
+        only the tiles around matching cells are read.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            low: Optional lower bound, inclusive.
+            high: Optional upper bound, inclusive.
+            release: Optional release of the dataset.
+
+        Returns:
+            tuple: x and y coordinates of the cell centers and values of the
+            matching cells, as 1D arrays.
+        """
+        import rasterio
+
+        index = self.build_index(var_name, release)
+        links = self.get_links(var_name, release=release)
+        with rasterio.open(self._source(links)) as src:
+            return index.select(src, low, high)
+
+    def _clip_geometry(self, var_name, release, geometry, output, recorder):
+        import rasterio
+        import rioxarray
+        from bmi_dbseabed.geometry import clip_geometry
+        from bmi_dbseabed.geometry import geometry_bounds
+        from bmi_dbseabed.geometry import load_geometry
+
+        with recorder.phase("open"):
+            geometries = load_geometry(geometry)
+            links = self.get_links(var_name, *geometry_bounds(geometries), release)
+            src = rasterio.open(self._source(links))
+
+        with src, recorder.phase("clip"):
+            # variables share a grid, so the burn mask of the last polygons is
+            # kept to clip other variables without rasterizing again
+            key = (
+                json.dumps(geometries, sort_keys=True),
+                tuple(src.transform),
+                src.width,
+                src.height,
+            )
+            mask = clip_geometry(src, geometries, output, self._burn_masks.get(key))
+            self._burn_masks = {key: mask}
+
+        return rioxarray.open_rasterio(output, masked=True), links
+
+    def _gdal_env(self):
+        import rasterio
+
+        return rasterio.Env(
+            **(self._cache.gdal_options() if self._cache is not None else {})
+        )
+
+    def _source(self, links):
+        from bmi_dbseabed.mosaic import mosaic_source
+
+        if self._cache is not None:
+            links = [self._cache.source_path(link) for link in links]
+        return mosaic_source(links)
+
+    @staticmethod
+    def get_links(var_name, west=None, south=None, east=None, north=None, release=None):
+        """
+        Get the data links of a variable needed for a bounding box.
+
+        For a variable backed by tiles, these are the tiles whose footprints
+        in DATA_SERVICES intersect the bounding box, or all of them without a
+        bounding box. No file is opened.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            release: Optional release, a key of the "releases" item of the
+                variable in DATA_SERVICES. Defaults to the current release.
+
+        Returns:
+            list: Data links.
+        """
+        service = DbSeabed.DATA_SERVICES[var_name]
+        if release is not None or "tiles" not in service:
+            return [DbSeabed.get_link(var_name, release)]
+
+        if None in (west, south, east, north):
+            return [tile["link"] for tile in service["tiles"]]
+
+        links = [
+            tile["link"]
+            for tile in service["tiles"]
+            if tile["bounds"][0] < east
+            and tile["bounds"][2] > west
+            and tile["bounds"][1] < north
+            and tile["bounds"][3] > south
+        ]
+        if not links:
+            raise ValueError("No data found in the bounding box.")
+        return links
+
+    @staticmethod
+    def _links_near(var_name, bounds):
+        # links of the tiles holding the cells of points or zones within the
+        # bounds. The cell of a point on the west or north edge of a tile is
+        # in that tile, so the bounds are widened by the least amount to the
+        # east and south to keep the tiles starting there.
+        if bounds is None:
+            return DbSeabed.get_links(var_name)
+        west, south, east, north = bounds
+        try:
+            return DbSeabed.get_links(
+                var_name,
+                west,
+                math.nextafter(south, -math.inf),
+                math.nextafter(east, math.inf),
+                north,
+            )
+        except ValueError:
+            # all the cells are outside the data, which any tile tells
+            return DbSeabed.get_links(var_name)[:1]
+
+    @staticmethod
+    def get_link(var_name, release=None):
+        """
+        Get the data link of a variable.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            release: Optional release, a key of the "releases" item of the
+                variable in DATA_SERVICES. Defaults to the current release.
+
+        Returns:
+            str: Data link.
+        """
+        service = DbSeabed.DATA_SERVICES[var_name]
+        if release is None:
+            return service["link"]
+        try:
+            return service.get("releases", {})[release]
+        except KeyError:
+            raise ValueError(
+                f"Please provide a valid release of {var_name}:"
+                f" {sorted(service.get('releases', {}))}."
+            ) from None
+
+    @staticmethod
+    def _check_bbox(west, south, east, north):
+        if None in (west, south, east, north) or west > east or south > north:
+            raise ValueError(
+                "Please provide valid bounding box values for west, east, south and"
+                " north."
+            )
+
+    @staticmethod
+    def _check_output(output):
+        if not str(output).endswith(".tif"):
+            raise ValueError(
+                "Please provide a valid output file name with .tif extension."
+            )
+
+    def _store_metadata(self, dataset, output, **info):
+        self._tif_file, self._metadata = self._build_metadata(dataset, output, **info)
+
+    @staticmethod
+    def _build_metadata(dataset, output, **info):
         # get resolution
         geotrans = [
             float(value)
@@ -183,17 +1236,14 @@ class DbSeabed:
         # get crs
         crs_wkt = dataset["spatial_ref"].attrs["spatial_ref"]
 
-        # store metadata
-        self._tif_file = (
+        # build metadata
+        tif_file = (
             output
             if os.path.dirname(output) != ""
             else os.path.join(os.getcwd(), output)
         )
-        self._metadata = {
-            "variable_name": var_name,
-            "bmi_standard_name": DbSeabed.DATA_SERVICES[var_name]["name"],
-            "variable_units": DbSeabed.DATA_SERVICES[var_name]["units"],
-            "service_url": DbSeabed.DATA_SERVICES[var_name]["link"],
+        metadata = {
+            **info,
             "crs_wkt": crs_wkt,
             "node_bounding_box": [
                 round(dataset.x.values[0], 8),
@@ -204,5 +1254,4 @@ class DbSeabed:
             "grid_bounding_box": [round(value, 8) for value in dataset.rio.bounds()],
             "grid_res": grid_res,
         }
-
-        return dataset
+        return tif_file, metadata
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import namedtuple
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import rasterio
+import rioxarray
+from bmi_dbseabed import blocks
+from bmi_dbseabed.dbseabed import DbSeabed
+from bmi_dbseabed.mosaic import mosaic_source
+
+DataResult = namedtuple("DataResult", ["dataset", "tif_file", "metadata"])
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run a function once for concurrent calls with the same key.
+
+    Callers arriving while a call with their key is in flight wait for it and
+    share its result or exception. Results are not kept once the call ends.
+
+    >>> flight = SingleFlight()
+    >>> flight.do("key", lambda: 42)
+    (42, False)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        Call func, or wait for the call in flight with the same key.
+
+        Returns:
+            tuple: The result and whether it was shared from another call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            shared = call is not None
+            if not shared:
+                call = self._calls[key] = _Call()
+
+        if not shared:
+            try:
+                call.result = func()
+            except BaseException as error:
+                call.error = error
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result, False
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+
+class DatasetPool:
+    """
+    Pool of open rasterio datasets, one per thread at a time.
+
+    Dataset handles are not thread-safe, so each is lent to one caller at a
+    time. Returned handles are kept open, up to ``max_idle`` per link, so
+    later calls skip opening the file and reading its header.
+    """
+
+    def __init__(self, max_idle=4):
+        self._max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+        self.opened = 0
+        self.reused = 0
+
+    def _check_fork(self):
+        # handles and the lock inherited from a parent process are not safe to
+        # use, as GDAL would share file offsets and the lock may be held by a
+        # thread that does not exist here, so a forked pool starts empty
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._idle = {}
+            self._pid = os.getpid()
+
+    @contextmanager
+    def acquire(self, link):
+        """Borrow an open dataset of a link for the duration of the context."""
+        self._check_fork()
+        with self._lock:
+            idle = self._idle.get(link)
+            src = idle.pop() if idle else None
+            if src is None:
+                self.opened += 1
+            else:
+                self.reused += 1
+        if src is None:
+            src = rasterio.open(link)
+
+        try:
+            yield src
+        except BaseException:
+            # the handle may be left in an unknown state
+            src.close()
+            raise
+
+        with self._lock:
+            idle = self._idle.setdefault(link, [])
+            if len(idle) < self._max_idle:
+                idle.append(src)
+                src = None
+        if src is not None:
+            src.close()
+
+    def close(self):
+        self._check_fork()
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sources in idle.values():
+            for src in sources:
+                src.close()
+
+
+class MosaicCache:
+    """
+    Thread-safe LRU of the sources of mosaics, keyed by their links.
+
+    The VRT of a mosaic is built once from the headers of its files, and
+    concurrent requests for a missing mosaic build it once.
+
+    >>> mosaics = MosaicCache(max_size=2)
+    >>> mosaics.get(["a.tif"])
+    'a.tif'
+    """
+
+    def __init__(self, max_size=64):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._sources = OrderedDict()
+        self._builds = SingleFlight()
+
+    def get(self, links):
+        """Get the source of the mosaic of links, building it on a miss."""
+        key = tuple(links)
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                self._sources.move_to_end(key)
+                return source
+        source, _ = self._builds.do(key, lambda: mosaic_source(list(key)))
+        with self._lock:
+            self._sources[key] = source
+            self._sources.move_to_end(key)
+            while len(self._sources) > self._max_size:
+                self._sources.popitem(last=False)
+        return source
+
+    def __len__(self):
+        return len(self._sources)
+
+
+class DbSeabedEngine:
+    """
+    Thread-safe engine to get dbSEABED data from many threads.
+
+    Unlike ``DbSeabed``, the engine keeps no per-call state: each call returns
+    its dataset, file path and metadata. Identical concurrent requests are
+    coalesced so the source is read once, requests for the same clip with
+    different outputs share the read, and open dataset handles are pooled.
+    """
+
+    def __init__(self, max_idle_handles=4, max_mosaics=64):
+        """
+        Args:
+            max_idle_handles: Number of open dataset handles kept per source.
+            max_mosaics: Number of mosaic sources kept, least recently used
+                first out.
+        """
+        self._pool = DatasetPool(max_idle=max_idle_handles)
+        self._clips = SingleFlight()
+        self._writes = SingleFlight()
+        self._lock = threading.Lock()
+        self._mosaics = MosaicCache(max_mosaics)
+        self._stats = {"requests": 0, "clips": 0, "coalesced": 0}
+
+    @property
+    def stats(self):
+        """
+        Counts of requests, source clips read, requests coalesced with one in
+        flight, and dataset handles opened and reused.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["handles_opened"] = self._pool.opened
+        stats["handles_reused"] = self._pool.reused
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _source(self, links):
+        return self._mosaics.get(links)
+
+    def _clip(self, source, bbox):
+        self._count("clips")
+        with self._pool.acquire(source) as src:
+            window = blocks.bbox_window(src, *bbox)
+            values = src.read(window=window)
+            profile = {
+                **blocks.window_profile(
+                    src, window, dtype=src.dtypes[0], count=src.count
+                ),
+                "nodata": src.nodata,
+            }
+            return values, profile, src.scales, src.offsets
+
+    def _write(self, clip_key, output):
+        (values, profile, scales, offsets), shared = self._clips.do(
+            clip_key, lambda: self._clip(*clip_key)
+        )
+        with rasterio.open(output, "w", **profile) as dst:
+            dst.scales = scales
+            dst.offsets = offsets
+            dst.write(values)
+        return shared
+
+    def get_data(self, var_name, west, south, east, north, output, release=None):
+        """
+        Get data from the remote server.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            west: x coordinate of the lower left corner of the grid extent.
+            south: y coordinate of the lower left corner of the grid extent.
+            east: x coordinate of the upper right corner of the grid extent.
+            north: y coordinate of the upper right corner of the grid extent.
+            output: Output file path.
+            release: Optional release of the dataset.
+
+        Returns:
+            DataResult: The dataset, the absolute path of the output file and
+            the metadata of this call, as in ``DbSeabed.metadata``, with a
+            "coalesced" item that is True if the data was read by a
+            concurrent call.
+        """
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        DbSeabed._check_bbox(west, south, east, north)
+        DbSeabed._check_output(output)
+        self._count("requests")
+
+        links = DbSeabed.get_links(var_name, west, south, east, north, release)
+        clip_key = (self._source(links), (west, south, east, north))
+        # the read is shared with a request for the same clip, and the write
+        # with an identical request
+        clip_shared, write_shared = self._writes.do(
+            (clip_key, os.path.abspath(output)),
+            lambda: self._write(clip_key, output),
+        )
+        coalesced = clip_shared or write_shared
+        if coalesced:
+            self._count("coalesced")
+
+        dataset = rioxarray.open_rasterio(output, masked=True)
+        tif_file, metadata = DbSeabed._build_metadata(
+            dataset,
+            output,
+            variable_name=var_name,
+            bmi_standard_name=DbSeabed.DATA_SERVICES[var_name]["name"],
+            variable_units=DbSeabed.DATA_SERVICES[var_name]["units"],
+            service_url=links[0] if len(links) == 1 else links,
+            coalesced=coalesced,
+        )
+        return DataResult(dataset, tif_file, metadata)
+
+    def close(self):
+        """Close the pooled dataset handles."""
+        self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import ast
+
+import numpy
+
+_BINARY_OPS = {
+    ast.Add: numpy.add,
+    ast.Sub: numpy.subtract,
+    ast.Mult: numpy.multiply,
+    ast.Div: numpy.true_divide,
+    ast.Pow: numpy.power,
+}
+
+_UNARY_OPS = {
+    ast.USub: numpy.negative,
+    ast.UAdd: numpy.positive,
+}
+
+_FUNCTIONS = {
+    "abs": numpy.absolute,
+    "sqrt": numpy.sqrt,
+    "exp": numpy.exp,
+    "log": numpy.log,
+    "log10": numpy.log10,
+    "minimum": numpy.minimum,
+    "maximum": numpy.maximum,
+}
+
+
+class Expression:
+    """
+    Arithmetic expression over dbSEABED variable names.
+
+    Expressions use Python syntax with ``+ - * / **``, numbers, parentheses
+    and the functions ``abs``, ``sqrt``, ``exp``, ``log``, ``log10``,
+    ``minimum`` and ``maximum``, e.g. ``"carbonate * (1 - rock / 100)"``.
+
+    >>> expr = Expression("sand - mud", ["sand", "mud"])
+    >>> expr.variables
+    ('mud', 'sand')
+    >>> expr.evaluate({"sand": numpy.array([60.0]), "mud": numpy.array([25.0])})
+    array([35.])
+    """
+
+    def __init__(self, text, var_names):
+        """
+        Args:
+            text: Expression string.
+            var_names: Variable names allowed in the expression.
+        """
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as error:
+            raise ValueError(
+                f"Please provide a valid expression: {error.msg}."
+            ) from None
+
+        self._text = text
+        self._var_names = set(var_names)
+        self._variables = set()
+        self._check(tree.body)
+        self._tree = tree.body
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def variables(self):
+        return tuple(sorted(self._variables))
+
+    def _check(self, node):
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            self._check(node.operand)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+                raise ValueError(
+                    f"Please provide a valid expression: unsupported function in"
+                    f" {ast.unparse(node)!r}."
+                )
+            if node.keywords or len(node.args) != _FUNCTIONS[node.func.id].nin:
+                raise ValueError(
+                    f"Please provide a valid expression: wrong arguments in"
+                    f" {ast.unparse(node)!r}."
+                )
+            for arg in node.args:
+                self._check(arg)
+        elif isinstance(node, ast.Name):
+            if node.id not in self._var_names:
+                raise ValueError(
+                    f"Please provide a valid expression: unknown variable {node.id!r}."
+                )
+            self._variables.add(node.id)
+        elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            pass
+        else:
+            raise ValueError(
+                f"Please provide a valid expression: unsupported syntax"
+                f" {ast.unparse(node)!r}."
+            )
+
+    def evaluate(self, arrays):
+        """
+        Evaluate the expression.
+
+        Intermediate results are computed in place, so evaluating a block
+        allocates at most one temporary per level of nesting.
+
+        Args:
+            arrays: Mapping of the expression variables to arrays of the same
+                shape.
+
+        Returns:
+            numpy.ndarray: Result of the expression.
+        """
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            value, _ = self._evaluate(self._tree, arrays)
+        return value
+
+    def _evaluate(self, node, arrays):
+        # returns the value and whether it is a temporary that may be overwritten
+        if isinstance(node, ast.Name):
+            return arrays[node.id], False
+        if isinstance(node, ast.Constant):
+            # floats, so integer powers of constants may be negative
+            return float(node.value), False
+
+        if isinstance(node, ast.BinOp):
+            ufunc = _BINARY_OPS[type(node.op)]
+            operands = [
+                self._evaluate(node.left, arrays),
+                self._evaluate(node.right, arrays),
+            ]
+        elif isinstance(node, ast.UnaryOp):
+            ufunc = _UNARY_OPS[type(node.op)]
+            operands = [self._evaluate(node.operand, arrays)]
+        else:
+            ufunc = _FUNCTIONS[node.func.id]
+            operands = [self._evaluate(arg, arrays) for arg in node.args]
+
+        values = [value for value, _ in operands]
+        out = next(
+            (
+                value
+                for value, temporary in operands
+                if temporary and isinstance(value, numpy.ndarray)
+            ),
+            None,
+        )
+        result = ufunc(*values, out=out)
+        if not isinstance(result, numpy.ndarray):
+            # results of constants only stay Python floats, so they do not
+            # promote float32 arrays to float64
+            return float(result), False
+        return result, True
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+METHODS = ("nearest", "idw")
+
+FillReport = namedtuple(
+    "FillReport",
+    ["method", "seconds", "blocks", "missing", "filled", "remaining"],
+    defaults=(None,),
+)
+FillReport.__doc__ = """
+Cost and result of a gap fill.
+
+Attributes:
+    method: Fill method.
+    seconds: Wall time of the fill.
+    blocks: Number of blocks processed.
+    missing: Number of no-data cells before the fill.
+    filled: Number of cells filled.
+    remaining: Number of no-data cells left, farther than the maximum
+        distance from any valid cell.
+"""
+
+
+def _offsets(max_distance):
+    # neighbour offsets within the distance, nearest first, with ties in
+    # row-major order so results do not depend on the blocks
+    radius = int(max_distance)
+    rows, cols = numpy.mgrid[-radius : radius + 1, -radius : radius + 1]
+    squared = rows**2 + cols**2
+    keep = (squared > 0) & (squared <= max_distance**2)
+    rows, cols, squared = rows[keep], cols[keep], squared[keep]
+    order = numpy.lexsort((cols, rows, squared))
+    return rows[order], cols[order], numpy.sqrt(squared[order])
+
+
+class GapFiller:
+    """
+    Fill no-data cells from the valid cells around them.
+
+    Each no-data cell takes the value of its nearest valid cell ("nearest"),
+    or the inverse-distance weighted mean of the valid cells within the
+    maximum distance ("idw"). Neighbours are visited as a vectorized sweep
+    over the offsets within the distance, for the no-data cells only, so the
+    cost grows with the number of gaps rather than with the grid.
+
+    Cells farther than the maximum distance from any valid cell stay
+    no-data, and are counted in the "remaining" item of the report, so the
+    distance must cover the widest gap for a field without no-data.
+
+    Blocks are filled with a halo of the maximum distance, so the result
+    does not depend on the block size or the number of workers. A window of
+    a larger grid is filled the same way as the grid when it is given with
+    a halo of ``halo`` cells around it.
+
+    >>> values = numpy.array([[1.0, numpy.nan, numpy.nan, 4.0]])
+    >>> filled, report = GapFiller("nearest", max_distance=1).fill(values)
+    >>> filled, report.filled, report.remaining
+    (array([[1., 1., 4., 4.]]), 2, 0)
+    """
+
+    def __init__(
+        self, method="nearest", max_distance=8, power=2.0, block_size=256, workers=1
+    ):
+        """
+        Args:
+            method: Fill method, one of METHODS.
+            max_distance: Distance in cells beyond which valid cells are not
+                used. Cells without valid cells within it stay no-data.
+            power: Power of the inverse distance weights of "idw".
+            block_size: Size of the square blocks filled at a time.
+            workers: Number of threads filling blocks.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Please provide a valid fill method: {METHODS}.")
+        if max_distance < 1:
+            raise ValueError("Please provide a max distance of at least 1 cell.")
+        self._method = method
+        self._max_distance = max_distance
+        self._halo = int(max_distance)
+        self._offsets = _offsets(max_distance)
+        self._power = power
+        self._block_size = block_size
+        self._workers = workers
+
+    @property
+    def halo(self):
+        """Width in cells of the neighbourhood a cell is filled from."""
+        return self._halo
+
+    def __repr__(self):
+        return (
+            f"GapFiller(method={self._method!r}, max_distance={self._max_distance},"
+            f" power={self._power})"
+        )
+
+    def _fill_block(self, padded, height, width):
+        # fill the no-data cells of the block at the center of a padded array
+        halo = self._halo
+        missing = numpy.isnan(padded)
+        # cells without a valid cell in the square around them cannot be
+        # filled, so they are left out of the sweep, e.g. inland cells
+        valid = numpy.pad((~missing).cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        size = 2 * halo + 1
+        near = (
+            valid[size:, size:]
+            - valid[:-size, size:]
+            - valid[size:, :-size]
+            + valid[:-size, :-size]
+        )
+        rows, cols = numpy.nonzero(
+            missing[halo : halo + height, halo : halo + width]
+            & (near[:height, :width] > 0)
+        )
+        # flat indices in the padded array, to gather neighbours with take
+        stride = padded.shape[1]
+        flat = (rows + halo) * stride + cols + halo
+        padded = padded.reshape(-1)
+
+        if self._method == "nearest":
+            values = numpy.full(rows.size, numpy.nan, dtype=padded.dtype)
+            pending = numpy.arange(rows.size)
+            for row, col, _ in zip(*self._offsets):
+                if not pending.size:
+                    break
+                neighbours = padded.take(flat[pending] + row * stride + col)
+                found = ~numpy.isnan(neighbours)
+                values[pending[found]] = neighbours[found]
+                pending = pending[~found]
+            return rows + halo, cols + halo, values
+
+        total = numpy.zeros(rows.size, dtype="float64")
+        weights = numpy.zeros(rows.size, dtype="float64")
+        for row, col, distance in zip(*self._offsets):
+            neighbours = padded.take(flat + row * stride + col)
+            found = ~numpy.isnan(neighbours)
+            weight = distance**-self._power
+            total += numpy.where(found, neighbours, 0.0) * weight
+            weights += found * weight
+        # cells in the corners of the square may still have no neighbours
+        with numpy.errstate(invalid="ignore"):
+            values = (total / weights).astype(padded.dtype)
+        return rows + halo, cols + halo, values
+
+    def fill(self, values, halo=0):
+        """
+        Fill the no-data cells of a 2D array.
+
+        Args:
+            values: Float array with NaN for no-data.
+            halo: Width in cells of the margin of the values around the cells
+                to fill, whose valid cells are used as neighbours only.
+
+        Returns:
+            tuple: The filled copy of the values within the margin and a
+            FillReport of these cells.
+        """
+        start = time.perf_counter()
+        values = numpy.asarray(values)
+        if values.dtype.kind != "f" or values.ndim != 2:
+            raise ValueError("Please provide a 2D float array to fill.")
+        height, width = values.shape[0] - 2 * halo, values.shape[1] - 2 * halo
+        if height < 1 or width < 1:
+            raise ValueError("Please provide a halo smaller than the values.")
+        padded = values
+        extra = self._halo - halo
+        if extra > 0:
+            # NaN outside the values, so blocks at the edges see no neighbours
+            padded = numpy.pad(values, extra, constant_values=numpy.nan)
+        elif extra < 0:
+            padded = values[-extra:extra, -extra:extra]
+        values = values[halo : halo + height, halo : halo + width]
+        filled = values.copy()
+        # the padded values now have the halo of the blocks
+        halo = self._halo
+        size = self._block_size
+        starts = [
+            (row, col)
+            for row in range(0, height, size)
+            for col in range(0, width, size)
+        ]
+
+        def _fill(start):
+            row, col = start
+            rows = min(size, height - row)
+            cols = min(size, width - col)
+            block = padded[row : row + rows + 2 * halo, col : col + cols + 2 * halo]
+            cells_row, cells_col, cells = self._fill_block(block, rows, cols)
+            # each block writes only its own cells
+            filled[cells_row - halo + row, cells_col - halo + col] = cells
+
+        if self._workers > 1:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                list(executor.map(_fill, starts))
+        else:
+            for item in starts:
+                _fill(item)
+
+        missing = int(numpy.count_nonzero(numpy.isnan(values)))
+        remaining = int(numpy.count_nonzero(numpy.isnan(filled)))
+        report = FillReport(
+            method=self._method,
+            seconds=time.perf_counter() - start,
+            blocks=len(starts),
+            missing=missing,
+            filled=missing - remaining,
+            remaining=remaining,
+        )
+        return filled, report
+
+
+def format_report(report):
+    """
+    Format a fill report as one line.
+
+    Args:
+        report: Report as returned by ``GapFiller.fill``.
+
+    Returns:
+        str: Method, filled and missing cells, time, and the cells left
+        no-data.
+    """
+    line = (
+        f"fill: {report.method}, {report.filled} of {report.missing} no-data cells"
+        f" filled in {report.seconds:.3f} s ({report.blocks} blocks)"
+    )
+    if report.remaining:
+        line += f", {report.remaining} left beyond the fill distance"
+    return line
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import os
+
+import numpy
+import rasterio.crs
+import rasterio.features
+import rasterio.warp
+import rasterio.windows
+from bmi_dbseabed import blocks
+
+
+def load_geometry(geometry, crs="EPSG:4326"):
+    """
+    Load polygons from GeoJSON or a vector file.
+
+    Args:
+        geometry: GeoJSON geometry, feature or feature collection as a dict, or
+            the path of a GeoJSON file or a shapefile. Shapefiles require the
+            fiona package.
+        crs: Coordinate reference system to return the polygons in. Polygons
+            from files with a different crs are reprojected.
+
+    Returns:
+        list: GeoJSON geometries.
+    """
+    if isinstance(geometry, dict):
+        return _geometries(geometry)
+
+    path = os.fspath(geometry)
+    if not os.path.isfile(path):
+        raise ValueError("Please provide a valid geometry file path.")
+
+    if path.lower().endswith((".json", ".geojson")):
+        with open(path) as fp:
+            return _geometries(json.load(fp))
+
+    try:
+        import fiona
+    except ImportError as error:
+        raise ImportError(
+            "Please install fiona to read geometries from a shapefile."
+        ) from error
+
+    with fiona.open(path) as src:
+        src_crs = src.crs
+        geometries = [feature["geometry"].__geo_interface__ for feature in src]
+
+    if src_crs and rasterio.crs.CRS.from_user_input(src_crs) != crs:
+        geometries = [
+            rasterio.warp.transform_geom(src_crs, crs, geom) for geom in geometries
+        ]
+    return geometries
+
+
+def _geometries(geojson):
+    kind = geojson.get("type")
+    if kind == "FeatureCollection":
+        return [feature["geometry"] for feature in geojson["features"]]
+    if kind == "Feature":
+        return [geojson["geometry"]]
+    if kind in ("Polygon", "MultiPolygon", "GeometryCollection"):
+        return [geojson]
+    raise ValueError("Please provide a valid GeoJSON polygon geometry.")
+
+
+def geometry_bounds(geometries):
+    """
+    Get the bounding box of a list of geometries.
+
+    Returns:
+        tuple: west, south, east, north.
+    """
+    bounds = numpy.array([rasterio.features.bounds(geom) for geom in geometries])
+    return (
+        bounds[:, 0].min(),
+        bounds[:, 1].min(),
+        bounds[:, 2].max(),
+        bounds[:, 3].max(),
+    )
+
+
+def points_bounds(points):
+    """
+    Get the bounding box of (x, y) points.
+
+    Returns:
+        tuple: west, south, east, north, or None without points.
+    """
+    points = numpy.asarray(points, dtype="float64").reshape(-1, 2)
+    if not len(points):
+        return None
+    west, south = points.min(axis=0).tolist()
+    east, north = points.max(axis=0).tolist()
+    return west, south, east, north
+
+
+def burn_mask(geometries, transform, shape):
+    """
+    Rasterize geometries into a mask of the cells whose centers are inside.
+
+    Args:
+        geometries: GeoJSON geometries.
+        transform: Affine transform of the grid.
+        shape: (rows, cols) of the grid.
+
+    Returns:
+        numpy.ndarray: Boolean mask.
+    """
+    return rasterio.features.rasterize(
+        [(geom, 1) for geom in geometries],
+        out_shape=shape,
+        transform=transform,
+        dtype="uint8",
+    ).view(bool)
+
+
+def clip_geometry(src, geometries, output, mask=None):
+    """
+    Clip a raster to polygons and save it as a GeoTIFF file.
+
+    Only the raster blocks that intersect the polygons are read. Cells outside
+    the polygons are saved as no-data.
+
+    Args:
+        src: Open rasterio dataset.
+        geometries: GeoJSON geometries in the crs of the raster.
+        output: Output GeoTIFF file path.
+        mask: Optional burn mask of the polygons over the clip window, as
+            returned by a previous call on a raster with the same grid.
+
+    Returns:
+        numpy.ndarray: Burn mask over the clip window.
+    """
+    window = blocks.bbox_window(src, *geometry_bounds(geometries))
+    shape = (int(window.height), int(window.width))
+    if mask is None:
+        mask = burn_mask(
+            geometries, rasterio.windows.transform(window, src.transform), shape
+        )
+
+    with blocks.GTiffBlockWriter(output, blocks.window_profile(src, window)) as dst:
+        for block in blocks.iter_blocks(src, window):
+            # block window relative to the clip window
+            out_window = rasterio.windows.Window(
+                block.col_off - window.col_off,
+                block.row_off - window.row_off,
+                block.width,
+                block.height,
+            )
+            block_mask = mask[out_window.toslices()]
+
+            if block_mask.any():
+                values = blocks.read_block(src, block)
+                values[~block_mask] = numpy.nan
+            else:
+                values = numpy.full(block_mask.shape, numpy.nan, dtype="float32")
+
+            dst.write(values, out_window)
+
+    return mask
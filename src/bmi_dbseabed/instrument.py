@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import logging
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger("bmi_dbseabed")
+
+Phase = namedtuple(
+    "Phase",
+    [
+        "name",
+        "seconds",
+        "bytes_read",
+        "bytes_written",
+        "peak_memory",
+        "process_peak_rss",
+    ],
+)
+
+
+def _io_counters():
+    # bytes read and written by the process, including sockets, on Linux
+    try:
+        with open("/proc/self/io") as fp:
+            counters = dict(line.split(": ") for line in fp.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class PhaseRecorder:
+    """
+    Record wall time, I/O and memory of the phases of an operation.
+
+    Bytes read and written are the process I/O counters, which include the
+    network transfers of GDAL, and are None where they are not available.
+    Peak memory is the peak of memory traced by ``tracemalloc`` within the
+    phase if ``trace_memory`` is True, and None otherwise. The process peak
+    RSS is the high-water mark of the resident memory of the process since
+    it started, at the end of the phase, so it includes earlier phases and
+    operations.
+
+    >>> recorder = PhaseRecorder()
+    >>> with recorder.phase("open"):
+    ...     pass
+    >>> list(recorder.as_dict())
+    ['open']
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        """
+        Args:
+            callback: Optional function called with each finished ``Phase``.
+            trace_memory: If True, trace Python and NumPy allocations to
+                measure the peak memory of each phase.
+        """
+        self._callback = callback
+        self._trace_memory = trace_memory
+        self._phases = []
+
+    @property
+    def phases(self):
+        return list(self._phases)
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the code run within the context as the phase ``name``."""
+        started_tracing = False
+        if self._trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        read_start, written_start = _io_counters()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            read_end, written_end = _io_counters()
+            peak_memory = None
+            if self._trace_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+
+            self._record(
+                Phase(
+                    name=name,
+                    seconds=seconds,
+                    bytes_read=None if read_start is None else read_end - read_start,
+                    bytes_written=(
+                        None if written_start is None else written_end - written_start
+                    ),
+                    peak_memory=peak_memory,
+                    process_peak_rss=_max_rss(),
+                )
+            )
+
+    def _record(self, phase):
+        self._phases.append(phase)
+        logger.debug(
+            "phase %s: %.3f s, %s bytes read, %s bytes written, %s bytes peak"
+            " memory, %s bytes process peak RSS",
+            *phase,
+        )
+        if self._callback is not None:
+            self._callback(phase)
+
+    def as_dict(self):
+        """Get the phases as a dict of dicts, keyed by phase name."""
+        return {phase.name: phase._asdict() for phase in self._phases}
+
+
+def format_phases(phases):
+    """
+    Format phases as a table.
+
+    Args:
+        phases: Dict of phases as returned by ``PhaseRecorder.as_dict``.
+
+    Returns:
+        str: Table with one line per phase and a total line.
+    """
+
+    def _size(value):
+        return "-" if value is None else f"{value / 1e6:.2f}"
+
+    lines = [f"{'phase':<10}{'time (s)':>10}{'read (MB)':>12}{'written (MB)':>14}"]
+    for phase in phases.values():
+        lines.append(
+            f"{phase['name']:<10}{phase['seconds']:>10.3f}"
+            f"{_size(phase['bytes_read']):>12}{_size(phase['bytes_written']):>14}"
+        )
+    total = sum(phase["seconds"] for phase in phases.values())
+    lines.append(f"{'total':<10}{total:>10.3f}")
+
+    peaks = [phase["peak_memory"] for phase in phases.values()]
+    rss = [phase.get("process_peak_rss") for phase in phases.values()]
+    if peaks and None not in peaks:
+        lines.append(f"peak memory: {max(peaks) / 1e6:.1f} MB")
+    elif rss and None not in rss:
+        lines.append(f"process peak RSS: {max(rss) / 1e6:.1f} MB")
+    return "\n".join(lines)
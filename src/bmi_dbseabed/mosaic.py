@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+
+import rasterio
+
+# GDAL virtual file systems of remote links, so sources of a mosaic are read
+# with range requests rather than downloaded
+_VSI_PREFIXES = {
+    "http://": "/vsicurl/http://",
+    "https://": "/vsicurl/https://",
+    "ftp://": "/vsicurl/ftp://",
+    "s3://": "/vsis3/",
+    "gs://": "/vsigs/",
+}
+
+
+def _vsi_path(link):
+    for scheme, prefix in _VSI_PREFIXES.items():
+        if link.startswith(scheme):
+            return prefix + link[len(scheme) :]
+    return link
+
+
+def build_vrt(links):
+    """
+    Build a virtual mosaic of rasters on a common grid.
+
+    Only the headers of the rasters are read. The mosaic covers the union of
+    their extents and, when read, GDAL reads the windows it needs from each
+    raster.
+
+    Args:
+        links: Paths or URLs of rasters sharing crs, resolution, grid
+            alignment, data type and band count.
+
+    Returns:
+        str: VRT XML, which can be opened with rasterio or rioxarray.
+    """
+    headers = []
+    for link in links:
+        with rasterio.open(link) as src:
+            headers.append(
+                {
+                    "path": _vsi_path(link),
+                    "grid": (str(src.crs), src.res, src.dtypes, src.count),
+                    "transform": src.transform,
+                    "width": src.width,
+                    "height": src.height,
+                    "nodata": src.nodata,
+                    "scales": src.scales,
+                    "offsets": src.offsets,
+                    "block_shape": src.block_shapes[0],
+                    "crs": src.crs,
+                }
+            )
+
+    if len({header["grid"] for header in headers}) > 1:
+        raise ValueError(
+            "The files of the mosaic differ in crs, resolution, data type or bands."
+        )
+
+    first = headers[0]
+    res_x, res_y = first["transform"].a, first["transform"].e
+    left = min(header["transform"].c for header in headers)
+    top = max(header["transform"].f for header in headers)
+    offsets = []
+    for header in headers:
+        col = (header["transform"].c - left) / res_x
+        row = (header["transform"].f - top) / res_y
+        if abs(col - round(col)) > 1e-6 or abs(row - round(row)) > 1e-6:
+            raise ValueError("The files of the mosaic are not aligned on one grid.")
+        offsets.append((round(col), round(row)))
+    width = max(col + header["width"] for (col, _), header in zip(offsets, headers))
+    height = max(row + header["height"] for (_, row), header in zip(offsets, headers))
+
+    vrt = ET.Element("VRTDataset", rasterXSize=str(width), rasterYSize=str(height))
+    ET.SubElement(vrt, "SRS").text = first["crs"].to_wkt()
+    ET.SubElement(vrt, "GeoTransform").text = ", ".join(
+        repr(value) for value in (left, res_x, 0.0, top, 0.0, res_y)
+    )
+    block_rows, block_cols = first["block_shape"]
+    for band, dtype in enumerate(first["grid"][2], start=1):
+        element = ET.SubElement(
+            vrt,
+            "VRTRasterBand",
+            dataType=rasterio.dtypes.typename_fwd[rasterio.dtypes.dtype_rev[dtype]],
+            band=str(band),
+            blockXSize=str(block_cols),
+            blockYSize=str(block_rows),
+        )
+        if first["nodata"] is not None:
+            ET.SubElement(element, "NoDataValue").text = repr(first["nodata"])
+        ET.SubElement(element, "Offset").text = repr(first["offsets"][band - 1])
+        ET.SubElement(element, "Scale").text = repr(first["scales"][band - 1])
+        for (col, row), header in zip(offsets, headers):
+            source = ET.SubElement(element, "SimpleSource")
+            ET.SubElement(source, "SourceFilename", relativeToVRT="0").text = header[
+                "path"
+            ]
+            ET.SubElement(source, "SourceBand").text = str(band)
+            size = {"xSize": str(header["width"]), "ySize": str(header["height"])}
+            ET.SubElement(source, "SrcRect", xOff="0", yOff="0", **size)
+            ET.SubElement(source, "DstRect", xOff=str(col), yOff=str(row), **size)
+    return ET.tostring(vrt, encoding="unicode")
+
+
+def mosaic_source(links):
+    """
+    Get a path to open a variable backed by one or more files.
+
+    Args:
+        links: Paths or URLs of the files.
+
+    Returns:
+        str: The link of a single file, or the VRT XML of a mosaic.
+    """
+    return links[0] if len(links) == 1 else build_vrt(links)
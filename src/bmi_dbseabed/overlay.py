@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import numpy
+
+
+class SparseOverlay:
+    """
+    Sparse copy-on-write edits on top of a read-only base field.
+
+    Edited cells are kept as sorted flat indices and their values, so the
+    memory of an overlay is proportional to the number of edited cells and
+    the base field can be shared by many overlays. The base is an array or a
+    ``packed.PackedField``.
+
+    An overlay can also be materialized as a writable merged field of its
+    own, e.g. for callers that change the field in place. The field then
+    holds the edits, which are the cells that differ from the base.
+
+    >>> overlay = SparseOverlay(numpy.zeros((2, 3)))
+    >>> overlay.set_at_indices([4, 1], [7.0, 5.0])
+    >>> overlay.fill(numpy.empty(6))
+    array([0., 5., 0., 0., 7., 0.])
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.clear()
+
+    @property
+    def base(self):
+        return self._base
+
+    @base.setter
+    def base(self, base):
+        self._base = base
+        self._merged = None
+        self._field = None
+
+    @property
+    def size(self):
+        """Number of edited cells."""
+        self._sync()
+        return len(self._index)
+
+    @property
+    def nbytes(self):
+        """Memory used by the edits, in bytes."""
+        self._sync()
+        nbytes = self._index.nbytes + self._values.nbytes
+        return nbytes if self._field is None else nbytes + self._field.nbytes
+
+    def update_base(self, rows, cols, values):
+        """
+        Change cells of the base array in place, keeping the edits on top.
+
+        Args:
+            rows: Row indices of the cells.
+            cols: Column indices of the cells.
+            values: New base values of the cells.
+        """
+        self._sync()
+        self._base[rows, cols] = values
+        for merged in (self._merged, self._field):
+            if merged is not None:
+                merged[rows, cols] = values
+                merged.reshape(-1)[self._index] = self._values
+
+    def clear(self):
+        """Remove all the edits."""
+        self._index = numpy.empty(0, dtype=numpy.int64)
+        self._values = numpy.empty(0, dtype=self._base.dtype)
+        self._merged = None
+        self._field = None
+
+    def _sync(self):
+        # the edits of a materialized field are the cells that differ from
+        # the base
+        if self._field is not None:
+            self._set_index(self._field.reshape(-1))
+
+    def edits(self):
+        """
+        Get the edits.
+
+        Returns:
+            tuple: Sorted flat indices of the edited cells and their values.
+        """
+        self._sync()
+        return self._index, self._values
+
+    def materialize(self):
+        """
+        Get a writable merged field owned by the overlay.
+
+        The field is created on the first call and then holds the edits:
+        values written to it are edits, and the other methods of the overlay
+        read and change it in place, so references to it stay valid.
+
+        Returns:
+            numpy.ndarray: The merged field, with the shape of the base.
+        """
+        if self._field is None:
+            field = numpy.empty(self._base.size, dtype=self._base.dtype)
+            self._field = self.fill(field).reshape(self._base.shape)
+            self._merged = None
+        return self._field
+
+    def set(self, values):
+        """
+        Replace the field, keeping only the cells that differ from the base.
+
+        Args:
+            values: Array with the size of the base field.
+        """
+        values = numpy.asarray(values, dtype=self._base.dtype).reshape(-1)
+        if values.size != self._base.size:
+            raise ValueError(
+                f"Size of the values ({values.size}) does not match the size of"
+                f" the grid ({self._base.size})."
+            )
+        if self._field is not None:
+            self._field.reshape(-1)[:] = values
+            return
+        self._set_index(values)
+        self._merged = None
+
+    def _set_index(self, values):
+        base = self._dense_base().reshape(-1)
+        same = (values == base) | (numpy.isnan(values) & numpy.isnan(base))
+        self._index = numpy.flatnonzero(~same)
+        self._values = values[self._index]
+
+    def set_at_indices(self, inds, values):
+        """
+        Set the values of cells given by flat indices.
+
+        Args:
+            inds: Flat indices of the cells.
+            values: New values, one per index or a scalar. With repeated
+                indices, the last value is kept.
+        """
+        inds = numpy.asarray(inds, dtype=numpy.int64).reshape(-1)
+        values = numpy.broadcast_to(
+            numpy.asarray(values, dtype=self._base.dtype).reshape(-1), inds.shape
+        )
+        if inds.size and (inds.min() < 0 or inds.max() >= self._base.size):
+            raise IndexError("Indices are out of the grid.")
+        if self._field is not None:
+            self._field.reshape(-1)[inds] = values
+            return
+
+        # new edits come last, so keeping the last occurrence of each index
+        # lets them override repeated and previous edits
+        index = numpy.concatenate([self._index, inds])[::-1]
+        values = numpy.concatenate([self._values, values])[::-1]
+        self._index, first = numpy.unique(index, return_index=True)
+        self._values = values[first]
+        self._merged = None
+
+    def _dense_base(self):
+        if isinstance(self._base, numpy.ndarray):
+            return self._base
+        return self._base.to_dense()
+
+    def fill(self, dest):
+        """
+        Copy the merged field into a flat array.
+
+        Args:
+            dest: Flat array with the size of the base field.
+
+        Returns:
+            numpy.ndarray: The dest array.
+        """
+        if self._field is not None:
+            dest[:] = self._field.reshape(-1)
+        elif isinstance(self._base, numpy.ndarray):
+            dest[:] = self._base.reshape(-1)
+            dest[self._index] = self._values
+        else:
+            self._base.fill(dest)
+            dest[self._index] = self._values
+        return dest
+
+    def take(self, inds, dest):
+        """
+        Copy the merged values of cells given by flat indices.
+
+        Args:
+            inds: Flat indices of the cells.
+            dest: Array to hold one value per index.
+
+        Returns:
+            numpy.ndarray: The dest array.
+        """
+        inds = numpy.asarray(inds).reshape(-1)
+        if self._field is not None:
+            dest[:] = self._field.reshape(-1)[inds]
+            return dest
+        if isinstance(self._base, numpy.ndarray):
+            dest[:] = self._base.reshape(-1)[inds]
+        else:
+            self._base.take(inds, dest)
+        if self._index.size:
+            pos = numpy.minimum(numpy.searchsorted(self._index, inds), self.size - 1)
+            edited = self._index[pos] == inds
+            dest[edited] = self._values[pos[edited]]
+        return dest
+
+    def merged(self):
+        """
+        Get the merged field.
+
+        Returns:
+            numpy.ndarray: The materialized field if any, otherwise the base
+            array if there are no edits, or a merged copy that is kept until
+            the next edit.
+        """
+        if self._field is not None:
+            return self._field
+        if not self.size and isinstance(self._base, numpy.ndarray):
+            return self._base
+        if self._merged is None:
+            merged = numpy.empty(self._base.size, dtype=self._base.dtype)
+            self._merged = self.fill(merged).reshape(self._base.shape)
+        return self._merged
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import numpy
+
+
+class PackedField:
+    """
+    Field of which only the valid cells are stored.
+
+    Valid (non-NaN) values are packed into a 1D array in row-major order,
+    and their cells are kept as runs of consecutive flat indices, so the
+    memory and serialized size of a field are proportional to its valid
+    cells plus two integers per run.
+
+    >>> field = PackedField.pack(numpy.array([[numpy.nan, 1.0], [2.0, 3.0]]))
+    >>> field.values, field.starts, field.lengths
+    (array([1., 2., 3.]), array([1], dtype=int32), array([3], dtype=int32))
+    >>> field.take([0, 2], numpy.empty(2))
+    array([nan,  2.])
+    """
+
+    def __init__(self, shape, values, starts, lengths):
+        """
+        Args:
+            shape: Shape of the field.
+            values: 1D array of the valid values.
+            starts: Flat index of the first cell of each run of valid cells.
+            lengths: Number of cells of each run.
+        """
+        self.shape = tuple(int(dim) for dim in shape)
+        self.values = values
+        self.starts = starts
+        self.lengths = lengths
+        # position in values of the first cell of each run
+        self._offsets = numpy.cumsum(lengths) - lengths
+
+    @classmethod
+    def pack(cls, values):
+        """
+        Pack the valid cells of a float array.
+
+        Args:
+            values: Array with NaN for no-data.
+
+        Returns:
+            PackedField: The packed field.
+        """
+        values = numpy.asarray(values)
+        if values.dtype.kind != "f":
+            raise ValueError("Please provide a float array to pack.")
+        flat = values.reshape(-1)
+        valid = ~numpy.isnan(flat)
+        # runs start where the mask steps up and end where it steps down
+        steps = numpy.flatnonzero(
+            numpy.diff(valid.view(numpy.int8), prepend=0, append=0)
+        )
+        index_type = numpy.int32 if flat.size < 2**31 else numpy.int64
+        starts = steps[0::2].astype(index_type)
+        lengths = (steps[1::2] - steps[0::2]).astype(index_type)
+        return cls(values.shape, flat[valid], starts, lengths)
+
+    @property
+    def size(self):
+        """Number of cells of the field."""
+        return int(numpy.prod(self.shape))
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        """Memory of the packed arrays, in bytes."""
+        return self.values.nbytes + self.starts.nbytes + self.lengths.nbytes
+
+    def _mask(self):
+        # rebuild the mask of valid cells from the runs, one byte per cell
+        mask = numpy.zeros(self.size + 1, dtype=numpy.int8)
+        mask[self.starts] = 1
+        mask[self.starts + self.lengths] -= 1
+        numpy.cumsum(mask, dtype=numpy.int8, out=mask)
+        return mask[:-1].view(bool)
+
+    def fill(self, dest):
+        """
+        Unpack the field into a flat array.
+
+        Args:
+            dest: Flat float array with the size of the field.
+
+        Returns:
+            numpy.ndarray: The dest array, with NaN at invalid cells.
+        """
+        dest.fill(numpy.nan)
+        dest[self._mask()] = self.values
+        return dest
+
+    def take(self, inds, dest):
+        """
+        Copy the values of cells given by flat indices.
+
+        Args:
+            inds: Flat indices of the cells.
+            dest: Float array to hold one value per index.
+
+        Returns:
+            numpy.ndarray: The dest array, with NaN at invalid cells.
+        """
+        inds = numpy.asarray(inds, dtype=numpy.int64).reshape(-1)
+        if inds.size and (inds.min() < 0 or inds.max() >= self.size):
+            raise IndexError("Indices are out of the grid.")
+
+        dest[:] = numpy.nan
+        if not self.starts.size:
+            return dest
+        run = numpy.maximum(numpy.searchsorted(self.starts, inds, side="right") - 1, 0)
+        offset = inds - self.starts[run]
+        valid = (offset >= 0) & (offset < self.lengths[run])
+        dest[valid] = self.values[self._offsets[run[valid]] + offset[valid]]
+        return dest
+
+    def to_dense(self):
+        """
+        Unpack the field.
+
+        Returns:
+            numpy.ndarray: Array with the shape of the field.
+        """
+        return self.fill(numpy.empty(self.size, dtype=self.dtype)).reshape(self.shape)
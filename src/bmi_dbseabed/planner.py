@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import os
+from collections import namedtuple
+
+import numpy
+import rasterio
+from bmi_dbseabed import blocks
+from bmi_dbseabed.mosaic import build_vrt
+from rasterio.windows import Window
+
+# clip strategies, from the fastest to the most frugal
+STRATEGIES = ("memory", "blocks", "tiles")
+
+# outputs of streamed clips are tiled so that each block is written once
+OUTPUT_BLOCK = 256
+
+Plan = namedtuple(
+    "Plan",
+    [
+        "strategy",
+        "shape",
+        "dtype",
+        "transfer_bytes",
+        "decoded_bytes",
+        "memory_bytes",
+        "output_bytes",
+        "memory_budget",
+        "tile_shape",
+        "tiles",
+    ],
+)
+Plan.__doc__ = """
+Plan of a clip.
+
+Attributes:
+    strategy: "memory" to read the clip at once, "blocks" to stream it block
+        by block to one file, or "tiles" to stream it to several files, each
+        small enough to be loaded within the memory budget.
+    shape: (rows, cols) of the clip.
+    dtype: Data type of the source.
+    transfer_bytes: Bytes of the source blocks to read, compressed.
+    decoded_bytes: Memory to load the clip as a masked float array.
+    memory_bytes: Estimated peak memory of the strategy.
+    output_bytes: Size of the uncompressed output files.
+    memory_budget: Memory budget in bytes, or None.
+    tile_shape: (rows, cols) of the output tiles of the "tiles" strategy.
+    tiles: Number of output files.
+"""
+
+
+def transfer_bytes(src, window):
+    """
+    Get the bytes of the source blocks overlapping a window.
+
+    The sizes of compressed blocks are read from the GeoTIFF tile index. For
+    other formats, blocks count as uncompressed.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+
+    Returns:
+        int: Bytes to transfer to read the window.
+    """
+    block_rows, block_cols = src.block_shapes[0]
+    itemsize = numpy.dtype(src.dtypes[0]).itemsize
+    total = 0
+    for block in blocks.iter_blocks(src, window):
+        row, col = block.row_off // block_rows, block.col_off // block_cols
+        for band in range(1, src.count + 1):
+            size = src.get_tag_item(f"BLOCK_SIZE_{col}_{row}", "TIFF", bidx=band)
+            total += int(size) if size else block_rows * block_cols * itemsize
+    return total
+
+
+def _tile_shape(window, block_shape, cell_bytes, memory_budget):
+    # tiles of whole source blocks, as large as the budget allows
+    cells = memory_budget // cell_bytes
+    block_rows, block_cols = block_shape
+    if cells >= window.width * block_rows:
+        rows = cells // window.width // block_rows * block_rows
+        return min(rows, window.height), window.width
+    cols = max(cells // block_rows // block_cols, 1) * block_cols
+    return block_rows, min(cols, window.width)
+
+
+def plan_clip(src, window, memory_budget=None):
+    """
+    Plan the clip of a window of a source raster within a memory budget.
+
+    Only the header of the source is read. The in-memory clip holds the raw
+    values, the masked float array and the copy encoded for writing, while a
+    streamed clip holds one source block at a time. Streamed clips are
+    written to several files if one file could not be loaded within the
+    budget.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+        memory_budget: Optional memory budget in bytes. Without a budget,
+            the clip is read in memory.
+
+    Returns:
+        Plan: The plan of the clip.
+
+    Raises:
+        ValueError: If a single block of the source exceeds the budget.
+    """
+    dtype = numpy.dtype(src.dtypes[0])
+    # rioxarray decodes masked values as floats
+    float_size = numpy.result_type(dtype, numpy.float32).itemsize
+    cells = int(window.height) * int(window.width) * src.count
+    block_rows, block_cols = src.block_shapes[0]
+
+    decoded = cells * float_size
+    estimates = {
+        "memory": cells * (dtype.itemsize + 2 * float_size),
+        "blocks": block_rows * block_cols * src.count * dtype.itemsize,
+    }
+    estimates["tiles"] = estimates["blocks"]
+
+    if memory_budget is None or estimates["memory"] <= memory_budget:
+        strategy = "memory"
+    elif decoded <= memory_budget:
+        strategy = "blocks"
+    elif estimates["tiles"] <= memory_budget:
+        strategy = "tiles"
+    else:
+        raise ValueError(
+            f"Please provide a memory budget of at least {estimates['tiles']}"
+            " bytes to read a block of the source."
+        )
+
+    tile_shape, tiles = None, 1
+    if strategy == "tiles":
+        tile_shape = _tile_shape(
+            window,
+            (block_rows, block_cols),
+            src.count * float_size,
+            memory_budget,
+        )
+        tiles = sum(1 for _ in blocks.iter_blocks(src, window, tile_shape))
+
+    return Plan(
+        strategy=strategy,
+        shape=(int(window.height), int(window.width)),
+        dtype=dtype.name,
+        transfer_bytes=transfer_bytes(src, window),
+        decoded_bytes=decoded,
+        memory_bytes=estimates[strategy],
+        output_bytes=cells * dtype.itemsize,
+        memory_budget=memory_budget,
+        tile_shape=tile_shape,
+        tiles=tiles,
+    )
+
+
+def write_blocks(src, window, output):
+    """
+    Save a window of a source raster block by block.
+
+    Values are copied with their data type, no-data value, scales and
+    offsets, so the file matches an in-memory clip.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+        output: Output file path.
+    """
+    profile = {
+        **blocks.window_profile(src, window, dtype=src.dtypes[0], count=src.count),
+        "nodata": src.nodata,
+    }
+    if window.width >= OUTPUT_BLOCK and window.height >= OUTPUT_BLOCK:
+        profile.update(tiled=True, blockxsize=OUTPUT_BLOCK, blockysize=OUTPUT_BLOCK)
+
+    with rasterio.open(output, "w", **profile) as dst:
+        dst.scales = src.scales
+        dst.offsets = src.offsets
+        for block in blocks.iter_blocks(src, window):
+            target = Window(
+                block.col_off - window.col_off,
+                block.row_off - window.row_off,
+                block.width,
+                block.height,
+            )
+            dst.write(src.read(window=block), window=target)
+
+
+def write_tiles(src, window, output, tile_shape):
+    """
+    Save a window of a source raster as tiles and a virtual mosaic of them.
+
+    Args:
+        src: Open rasterio dataset.
+        window: Window in source pixel coordinates.
+        output: Output file path. Tiles are saved next to it with a numbered
+            suffix, and the mosaic with a .vrt extension.
+        tile_shape: (rows, cols) of the tiles.
+
+    Returns:
+        tuple: The path of the mosaic and the paths of the tiles.
+    """
+    root = os.path.splitext(os.path.abspath(output))[0]
+    tiles = []
+    for index, tile in enumerate(blocks.iter_blocks(src, window, tile_shape)):
+        tiles.append(f"{root}_{index:04d}.tif")
+        write_blocks(src, tile, tiles[-1])
+
+    mosaic = f"{root}.vrt"
+    with open(mosaic, "w") as vrt:
+        vrt.write(build_vrt(tiles))
+    return mosaic, tiles
+
+
+def format_plan(plan):
+    """
+    Format a plan as text.
+
+    Args:
+        plan: Plan as returned by ``plan_clip``.
+
+    Returns:
+        str: One line per item of the plan.
+    """
+
+    def _size(value):
+        return "-" if value is None else f"{value / 1e6:.2f} MB"
+
+    lines = [
+        f"strategy: {plan.strategy}",
+        f"shape: {plan.shape[0]} x {plan.shape[1]} ({plan.dtype})",
+        f"transfer: {_size(plan.transfer_bytes)}",
+        f"decoded: {_size(plan.decoded_bytes)}",
+        f"peak memory: {_size(plan.memory_bytes)}",
+        f"output: {_size(plan.output_bytes)}",
+        f"memory budget: {_size(plan.memory_budget)}",
+    ]
+    if plan.tile_shape is not None:
+        lines.append(
+            f"tiles: {plan.tiles} of {plan.tile_shape[0]} x {plan.tile_shape[1]}"
+        )
+    return os.linesep.join(lines)
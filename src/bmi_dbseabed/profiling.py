@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+import numpy
+
+
+class _CallStats:
+    def __init__(self, max_samples):
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes_copied = 0
+        self.latencies = deque(maxlen=max_samples)
+
+
+class CallProfiler:
+    """
+    Profile calls of methods, per method and per variable or grid.
+
+    Latency percentiles are computed over the most recent ``max_samples``
+    calls of each method and variable. Bytes copied are the sizes of the
+    arrays filled by the call, plus the size of arrays returned by
+    ``get_value_ptr`` that are new copies rather than references. Calls made
+    by a profiled call, e.g. ``update_until`` calling ``update``, are counted
+    in the outer call only. Calls may be recorded from several threads.
+
+    >>> profiler = CallProfiler()
+    >>> get_value = profiler.wrap("get_value", lambda name, dest: dest)
+    >>> _ = get_value("sand", numpy.zeros(4))
+    >>> profiler.as_dict()["get_value[sand]"]["bytes_copied"]
+    32
+    """
+
+    def __init__(self, max_samples=10000):
+        self._max_samples = max_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+        # profiled calls in progress in each thread
+        self._local = threading.local()
+
+    def wrap(self, name, method):
+        """
+        Wrap a method to record its calls.
+
+        Args:
+            name: Method name.
+            method: Bound method to wrap.
+
+        Returns:
+            function: Wrapped method.
+        """
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if getattr(self._local, "active", False):
+                return method(*args, **kwargs)
+            self._local.active = True
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self._local.active = False
+            seconds = time.perf_counter() - start
+
+            # the variable name or grid id the call applies to
+            target = args[0] if args and isinstance(args[0], (str, int)) else None
+            key = (name, target)
+            copied = isinstance(result, numpy.ndarray) and (
+                name != "get_value_ptr" or result.flags.owndata
+            )
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = _CallStats(self._max_samples)
+                stats.calls += 1
+                stats.seconds += seconds
+                stats.latencies.append(seconds)
+                if copied:
+                    stats.bytes_copied += result.nbytes
+            return result
+
+        return wrapper
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def as_dict(self):
+        """
+        Get the profile.
+
+        Returns:
+            dict: For each "method[target]" key, the method name, the variable
+            or grid it applies to, number of calls, cumulative and mean
+            seconds, p50, p90 and p99 latency in seconds, and bytes copied.
+        """
+        # copy the stats, so calls recorded meanwhile do not change them
+        with self._lock:
+            snapshot = [
+                (
+                    key,
+                    stats.calls,
+                    stats.seconds,
+                    list(stats.latencies),
+                    stats.bytes_copied,
+                )
+                for key, stats in self._stats.items()
+            ]
+        profile = {}
+        for (name, target), calls, seconds, latencies, bytes_copied in sorted(
+            snapshot, key=lambda item: -item[2]
+        ):
+            p50, p90, p99 = numpy.percentile(numpy.array(latencies), [50, 90, 99])
+            key = name if target is None else f"{name}[{target}]"
+            profile[key] = {
+                "method": name,
+                "target": target,
+                "calls": calls,
+                "total_seconds": seconds,
+                "mean_seconds": seconds / calls,
+                "p50_seconds": float(p50),
+                "p90_seconds": float(p90),
+                "p99_seconds": float(p99),
+                "bytes_copied": bytes_copied,
+            }
+        return profile
+
+    def summary(self):
+        """
+        Get the profile as a table, sorted by cumulative time.
+
+        Returns:
+            str: Summary table.
+        """
+        lines = [
+            f"{'call':<60}{'calls':>8}{'total (s)':>11}{'p50 (us)':>10}"
+            f"{'p99 (us)':>10}{'copied (MB)':>13}"
+        ]
+        for key, stats in self.as_dict().items():
+            lines.append(
+                f"{key:<60}{stats['calls']:>8}{stats['total_seconds']:>11.4f}"
+                f"{stats['p50_seconds'] * 1e6:>10.1f}"
+                f"{stats['p99_seconds'] * 1e6:>10.1f}"
+                f"{stats['bytes_copied'] / 1e6:>13.2f}"
+            )
+        return "\n".join(lines)
+
+    def export(self, path):
+        """
+        Save the profile as JSON if the path ends with ".json", otherwise as a
+        summary table.
+        """
+        with open(path, "w") as fp:
+            if str(path).endswith(".json"):
+                json.dump(self.as_dict(), fp, indent=2)
+            else:
+                fp.write(self.summary() + "\n")
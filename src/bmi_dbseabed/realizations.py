@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import math
+
+import numpy
+from bmi_dbseabed import blocks
+from bmi_dbseabed.blockcache import BlockCache
+from rasterio.windows import Window
+
+# white noise is drawn per tile of the source grid, so the noise of a cell
+# does not depend on the window, block size or worker that computes it
+NOISE_TILE = 256
+
+
+def _gaussian_kernel(correlation_length):
+    radius = math.ceil(3 * correlation_length)
+    offsets = numpy.arange(-radius, radius + 1, dtype="float64")
+    kernel = numpy.exp(-0.5 * (offsets / correlation_length) ** 2)
+    # normalized so the smoothed 2D noise keeps a unit variance
+    return (kernel / math.sqrt((kernel**2).sum())).astype("float32")
+
+
+class RealizationGenerator:
+    """
+    Generate realizations of a variable from its total standard uncertainty.
+
+    A realization is ``value + sigma * noise``, where the noise is standard
+    normal and, optionally, spatially correlated by a Gaussian kernel. Noise
+    is seeded by the seed, the realization number and its position in the
+    source grid, so realizations are reproducible and seamless whatever
+    window, block size or number of workers is used to generate them. The
+    noise tiles are kept in a bounded cache, so blocks and halos that share
+    a tile draw it once.
+
+    >>> generator = RealizationGenerator(seed=1)
+    >>> a = generator.noise(Window(0, 0, 8, 8), realization=0)
+    >>> b = generator.noise(Window(4, 4, 4, 4), realization=0)
+    >>> bool((a[4:, 4:] == b).all())
+    True
+    """
+
+    def __init__(
+        self, seed=0, correlation_length=0.0, workers=1, tile_cache_bytes=64 * 1024**2
+    ):
+        """
+        Args:
+            seed: Seed of the realizations.
+            correlation_length: Standard deviation of the Gaussian correlation
+                kernel in cells. Zero gives uncorrelated noise.
+            workers: Number of threads computing blocks.
+            tile_cache_bytes: Maximum size of the noise tiles kept in memory,
+                256 KiB each.
+        """
+        if correlation_length < 0:
+            raise ValueError("Please provide a non-negative correlation length.")
+        self._seed = seed
+        self._kernel = (
+            _gaussian_kernel(correlation_length) if correlation_length > 0 else None
+        )
+        self._workers = workers
+        self._tiles = BlockCache(tile_cache_bytes)
+
+    def _tile(self, realization, tile_row, tile_col):
+        key = (realization, tile_row, tile_col)
+        tile = self._tiles.get(key)
+        if tile is None:
+            # offsets keep the entropy non-negative for tiles in halos
+            rng = numpy.random.default_rng(
+                [self._seed, realization, tile_row + 2**31, tile_col + 2**31]
+            )
+            tile = rng.standard_normal((NOISE_TILE, NOISE_TILE), dtype="float32")
+            tile.flags.writeable = False
+            self._tiles.put(key, tile)
+        return tile
+
+    def _white_noise(self, window, realization):
+        # assemble the noise of the window from the tiles it overlaps
+        noise = numpy.empty((window.height, window.width), dtype="float32")
+        row_stop = window.row_off + window.height
+        col_stop = window.col_off + window.width
+        for tile_row in range(window.row_off // NOISE_TILE, -(-row_stop // NOISE_TILE)):
+            for tile_col in range(
+                window.col_off // NOISE_TILE, -(-col_stop // NOISE_TILE)
+            ):
+                tile = self._tile(realization, tile_row, tile_col)
+                row0 = tile_row * NOISE_TILE
+                col0 = tile_col * NOISE_TILE
+                rows = slice(
+                    max(row0, window.row_off), min(row0 + NOISE_TILE, row_stop)
+                )
+                cols = slice(
+                    max(col0, window.col_off), min(col0 + NOISE_TILE, col_stop)
+                )
+                noise[
+                    rows.start - window.row_off : rows.stop - window.row_off,
+                    cols.start - window.col_off : cols.stop - window.col_off,
+                ] = tile[
+                    rows.start - row0 : rows.stop - row0,
+                    cols.start - col0 : cols.stop - col0,
+                ]
+        return noise
+
+    def noise(self, window, realization):
+        """
+        Get the standard normal noise of a realization within a window.
+
+        Args:
+            window: Window in source pixel coordinates.
+            realization: Realization number.
+
+        Returns:
+            numpy.ndarray: float32 noise with the shape of the window.
+        """
+        if self._kernel is None:
+            return self._white_noise(window, realization)
+
+        # smooth white noise with a halo, one axis at a time
+        radius = len(self._kernel) // 2
+        padded = self._white_noise(
+            Window(
+                window.col_off - radius,
+                window.row_off - radius,
+                window.width + 2 * radius,
+                window.height + 2 * radius,
+            ),
+            realization,
+        )
+        rows = numpy.zeros((window.height, padded.shape[1]), dtype="float32")
+        for k, weight in enumerate(self._kernel):
+            rows += weight * padded[k : k + window.height]
+        noise = numpy.zeros((window.height, window.width), dtype="float32")
+        for k, weight in enumerate(self._kernel):
+            noise += weight * rows[:, k : k + window.width]
+        return noise
+
+    def realize(self, values, sigma, window, realization):
+        """
+        Perturb the values of a window.
+
+        Args:
+            values: Values of the variable within the window.
+            sigma: Total standard uncertainty within the window.
+            window: Window in source pixel coordinates.
+            realization: Realization number.
+
+        Returns:
+            numpy.ndarray: Realization within the window, NaN where the value
+            or its uncertainty is no-data.
+        """
+        noise = self.noise(window, realization)
+        numpy.multiply(noise, sigma, out=noise)
+        numpy.add(noise, values, out=noise)
+        return noise
+
+    def read(self, src, sigma_src, window, realization):
+        """
+        Compute one realization within a window.
+
+        Args:
+            src: Open rasterio dataset of the variable.
+            sigma_src: Open rasterio dataset of its uncertainty.
+            window: Window in source pixel coordinates.
+            realization: Realization number.
+
+        Returns:
+            numpy.ndarray: float32 realization with the shape of the window.
+        """
+        blocks.check_aligned({"value": src, "uncertainty": sigma_src})
+        field = numpy.empty((window.height, window.width), dtype="float32")
+
+        def _realize(item):
+            block, values, sigma = item
+            return block, self.realize(values, sigma, block, realization)
+
+        items = (
+            (block, blocks.read_block(src, block), blocks.read_block(sigma_src, block))
+            for block in blocks.iter_blocks(src, window)
+        )
+        for block, values in blocks.map_blocks(_realize, items, self._workers):
+            row = block.row_off - window.row_off
+            col = block.col_off - window.col_off
+            field[row : row + block.height, col : col + block.width] = values
+        return field
+
+    def write(self, src, sigma_src, window, output, count):
+        """
+        Save realizations as the bands of a tiled GeoTIFF.
+
+        Each block of the variable and its uncertainty is read once for all
+        realizations, and only the blocks in progress are held in memory.
+
+        Args:
+            src: Open rasterio dataset of the variable.
+            sigma_src: Open rasterio dataset of its uncertainty.
+            window: Window in source pixel coordinates.
+            output: Output file path.
+            count: Number of realizations.
+        """
+        blocks.check_aligned({"value": src, "uncertainty": sigma_src})
+        profile = {
+            **blocks.window_profile(src, window, count=count),
+            # each realization is stored in its own tiles
+            "interleave": "band",
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+        }
+
+        def _realize(item):
+            block, values, sigma = item
+            return block, [
+                self.realize(values, sigma, block, realization)
+                for realization in range(count)
+            ]
+
+        items = (
+            (block, blocks.read_block(src, block), blocks.read_block(sigma_src, block))
+            for block in blocks.iter_blocks(src, window)
+        )
+        with blocks.GTiffBlockWriter(output, profile) as writer:
+            for block, fields in blocks.map_blocks(_realize, items, self._workers):
+                target = Window(
+                    block.col_off - window.col_off,
+                    block.row_off - window.row_off,
+                    block.width,
+                    block.height,
+                )
+                for band, values in enumerate(fields, start=1):
+                    writer.write(values, target, band=band)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import rasterio
+from bmi_dbseabed import blocks
+
+
+def release_changes(link, bounds, current, previous_link=None):
+    """
+    Read the blocks of a release that differ from the current field.
+
+    Every block of the release within the bounds is read and decoded, since
+    GeoTIFF tiles carry no checksum to compare releases by, so this saves
+    memory but not I/O: only the changed blocks are kept.
+
+    Args:
+        link: Data link of the release.
+        bounds: (west, south, east, north) of the centers of the corner cells
+            of the current field.
+        current: Current 2D field, in the same grid as the release.
+        previous_link: Data link of the current field. If it is the same as
+            ``link`` nothing is read.
+
+    Returns:
+        list: (rows, cols, values) of each changed block, where rows and cols
+        are slices into the field.
+    """
+    if link == previous_link:
+        return []
+
+    changes = []
+    with rasterio.open(link) as src:
+        window = blocks.bbox_window(src, *bounds)
+        if (window.height, window.width) != current.shape:
+            raise ValueError(f"The release at {link} is not on the same grid.")
+
+        for block in blocks.iter_blocks(src, window):
+            rows = slice(
+                block.row_off - window.row_off,
+                block.row_off - window.row_off + block.height,
+            )
+            cols = slice(
+                block.col_off - window.col_off,
+                block.col_off - window.col_off + block.width,
+            )
+            values = blocks.read_block(src, block, dtype=current.dtype)
+            if not numpy.array_equal(values, current[rows, cols], equal_nan=True):
+                changes.append((rows, cols, values))
+    return changes
+
+
+class ReleasePrefetcher:
+    """
+    Load the changes between consecutive releases in a background thread.
+
+    Every block of each release is read, but only the blocks that changed
+    since the previous release are kept, so the memory held for a pending
+    release is proportional to what changed.
+    """
+
+    def __init__(self, links, bounds):
+        """
+        Args:
+            links: Data links of the releases in time order.
+            bounds: (west, south, east, north) of the centers of the corner
+                cells of the field.
+        """
+        self._links = list(links)
+        self._bounds = bounds
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = {}
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # the thread of the executor does not exist in a forked process, so
+        # prefetches pending at the fork are started again
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._futures = {}
+            self._pid = os.getpid()
+
+    def prefetch(self, index, current):
+        """
+        Start loading the changes of a release relative to the previous one.
+
+        Args:
+            index: Index of the release to load.
+            current: Field of the previous release.
+        """
+        self._check_fork()
+        if index < len(self._links) and index not in self._futures:
+            self._futures[index] = self._executor.submit(
+                release_changes,
+                self._links[index],
+                self._bounds,
+                current,
+                self._links[index - 1],
+            )
+
+    def changes(self, index, current):
+        """
+        Get the changes of a release, waiting for its prefetch if needed.
+
+        Returns:
+            list: Changed blocks, as returned by ``release_changes``.
+        """
+        self.prefetch(index, current)
+        return self._futures.pop(index).result()
+
+    def close(self):
+        self._check_fork()
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+        self._executor.shutdown(wait=True)
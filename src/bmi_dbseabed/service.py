@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import json
+import math
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+import numpy
+from bmi_dbseabed import blocks
+from bmi_dbseabed.blockcache import BlockCache
+from bmi_dbseabed.blockcache import CompressedBlockCache
+from bmi_dbseabed.blockcache import read_cached
+from bmi_dbseabed.blockcache import read_tile
+from bmi_dbseabed.dbseabed import DbSeabed
+from bmi_dbseabed.engine import DatasetPool
+from bmi_dbseabed.engine import MosaicCache
+from bmi_dbseabed.engine import SingleFlight
+from bmi_dbseabed.geometry import points_bounds
+from bmi_dbseabed.profiling import CallProfiler
+from rasterio.windows import Window
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+class QueryService:
+    """
+    Answer clip, point-sample and metadata queries from open datasets.
+
+    Datasets stay open between queries and decoded blocks of the source
+    tiling are kept in a bounded cache, so repeated queries over the same
+    area are served from memory. Clips are read as they are sent, so their
+    latencies in the metrics exclude the reads. The service is thread-safe.
+    """
+
+    def __init__(
+        self,
+        cache_bytes=256 * 1024**2,
+        max_idle_handles=4,
+        compress=False,
+        max_mosaics=64,
+    ):
+        """
+        Args:
+            cache_bytes: Maximum size of the decoded blocks kept in memory.
+            max_idle_handles: Number of open dataset handles kept per source.
+            compress: If True, keep the cached blocks compressed, so more of
+                them fit in ``cache_bytes``. See ``CompressedBlockCache``.
+            max_mosaics: Number of mosaic sources kept, least recently used
+                first out.
+        """
+        self._pool = DatasetPool(max_idle=max_idle_handles)
+        if compress:
+            self._cache = CompressedBlockCache(cache_bytes)
+        else:
+            self._cache = BlockCache(cache_bytes)
+        self._loads = SingleFlight()
+        self._mosaics = MosaicCache(max_mosaics)
+        self.profiler = CallProfiler()
+        for name in ("metadata", "sample", "clip", "sample_table", "clip_table"):
+            setattr(self, name, self.profiler.wrap(name, getattr(self, name)))
+
+    def _source(self, var_name, west=None, south=None, east=None, north=None):
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        return self._mosaics.get(DbSeabed.get_links(var_name, west, south, east, north))
+
+    def metadata(self, var_name):
+        """
+        Get the metadata of a variable.
+
+        Only the first file of a tiled variable is opened, for its crs and
+        resolution; the bounds are the union of the tile footprints in
+        ``DbSeabed.DATA_SERVICES``.
+
+        Returns:
+            dict: Names, units, links, crs, bounds, resolution and shape.
+        """
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        service = DbSeabed.DATA_SERVICES[var_name]
+        links = DbSeabed.get_links(var_name)
+        with self._pool.acquire(self._mosaics.get(links[:1])) as src:
+            crs, res, bounds = src.crs, src.res, list(src.bounds)
+        if "tiles" in service:
+            footprints = numpy.array([tile["bounds"] for tile in service["tiles"]])
+            bounds = [
+                *footprints[:, :2].min(axis=0).tolist(),
+                *footprints[:, 2:].max(axis=0).tolist(),
+            ]
+        return {
+            "variable_name": var_name,
+            "bmi_standard_name": service["name"],
+            "variable_units": service["units"],
+            "service_url": links,
+            "crs_wkt": crs.to_wkt(),
+            "grid_bounding_box": bounds,
+            "grid_res": list(res),
+            "shape": [
+                round((bounds[3] - bounds[1]) / res[1]),
+                round((bounds[2] - bounds[0]) / res[0]),
+            ],
+        }
+
+    def sample(self, var_name, points):
+        """
+        Sample a variable at points.
+
+        Args:
+            var_name: Variable name for dbSEABED datasets.
+            points: Sequence of (x, y) coordinates.
+
+        Returns:
+            list: Value of the cell of each point, or None outside the grid or
+            at no-data cells.
+        """
+        if var_name not in DbSeabed.DATA_SERVICES.keys():
+            raise ValueError("Please provide a valid var_name value.")
+        source = self._mosaics.get(
+            DbSeabed._links_near(var_name, points_bounds(points))
+        )
+        values = []
+        with self._pool.acquire(source) as src:
+            block_rows, block_cols = src.block_shapes[0]
+            for x, y in points:
+                row, col = src.index(x, y, op=math.floor)
+                if not (0 <= row < src.height and 0 <= col < src.width):
+                    values.append(None)
+                    continue
+                block = read_tile(
+                    self._cache,
+                    source,
+                    src,
+                    row // block_rows,
+                    col // block_cols,
+                    decode=True,
+                    loads=self._loads,
+                )
+                value = float(block[row % block_rows, col % block_cols])
+                values.append(None if math.isnan(value) else value)
+        return values
+
+    def _strips(self, source, window, rows):
+        # read a window one strip of rows at a time, as the strips are used
+        with self._pool.acquire(source) as src:
+            for start in range(0, window.height, rows):
+                strip = Window(
+                    window.col_off,
+                    window.row_off + start,
+                    window.width,
+                    min(rows, window.height - start),
+                )
+                yield start, read_cached(
+                    self._cache,
+                    source,
+                    src,
+                    strip,
+                    "float32",
+                    decode=True,
+                    loads=self._loads,
+                )
+
+    def clip(self, var_name, west, south, east, north, rows=256):
+        """
+        Clip a variable to a bounding box as a GeoTIFF.
+
+        The cells are those selected by ``DbSeabed.get_data``, decoded to
+        float32 with NaN for no-data. The GeoTIFF is uncompressed, and sent
+        one strip of ``rows`` rows at a time as the strips are read, so the
+        memory of a query does not grow with the size of the clip.
+
+        Returns:
+            iterator: Pieces of the GeoTIFF file, as bytes.
+        """
+        DbSeabed._check_bbox(west, south, east, north)
+        source = self._source(var_name, west, south, east, north)
+        with self._pool.acquire(source) as src:
+            window = blocks.bbox_window(src, west, south, east, north)
+            profile = blocks.window_profile(src, window)
+        strips = (values for _, values in self._strips(source, window, rows))
+        return blocks.iter_geotiff(profile, strips, rows)
+
+    def sample_table(self, var_name, points):
+        """
+        Sample a variable at points as an Arrow IPC stream.
+
+        Returns:
+            iterator: Pieces of the stream of one record batch with "x", "y"
+            and the variable, NaN outside the grid or at no-data cells.
+        """
+        from bmi_dbseabed import tabular
+
+        points = [(float(x), float(y)) for x, y in points]
+        values = [
+            numpy.nan if value is None else value
+            for value in self.sample(var_name, points)
+        ]
+        x, y = numpy.array(points, dtype="float64").reshape(-1, 2).T
+        schema = tabular.table_schema([var_name])
+        batch = tabular._pyarrow().RecordBatch.from_arrays(
+            [x, y, numpy.array(values, dtype="float32")], schema=schema
+        )
+        return tabular.ipc_stream(schema, [batch])
+
+    def clip_table(self, var_name, west, south, east, north, rows=256):
+        """
+        Get the valid cells within a bounding box as an Arrow IPC stream.
+
+        Strips are read as they are sent, so the memory of a query does not
+        grow with the size of the bounding box.
+
+        Returns:
+            iterator: Pieces of the stream, one record batch per strip of
+            ``rows`` rows, with "x", "y" and the variable.
+        """
+        from bmi_dbseabed import tabular
+
+        DbSeabed._check_bbox(west, south, east, north)
+        source = self._source(var_name, west, south, east, north)
+        with self._pool.acquire(source) as src:
+            window = blocks.bbox_window(src, west, south, east, north)
+            transform = src.transform
+
+        def _batches():
+            for start, values in self._strips(source, window, rows):
+                batch = tabular.grid_batch(
+                    {var_name: values},
+                    transform,
+                    window.row_off + start,
+                    window.col_off,
+                )
+                if batch is not None:
+                    yield batch
+
+        return tabular.ipc_stream(tabular.table_schema([var_name]), _batches())
+
+    def metrics(self):
+        """Get the cache statistics and the latency of each query type."""
+        return {"cache": self._cache.stats(), "queries": self.profiler.as_dict()}
+
+    def close(self):
+        self._pool.close()
+
+
+def _parse_floats(text, count):
+    try:
+        values = [float(value) for value in text.split(",")]
+    except ValueError:
+        values = []
+    if len(values) != count:
+        raise ValueError(f"Please provide {count} comma separated numbers: {text}.")
+    return values
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler of a ``QueryService``.
+
+    Routes:
+        GET /metadata/<var_name>
+        GET /sample/<var_name>?point=x,y[&point=x,y...][&format=arrow]
+        GET /clip/<var_name>?bbox=west,south,east,north[&format=arrow]
+        GET /metrics
+
+    With format=arrow, samples and clips are sent as Arrow IPC streams.
+    Invalid queries get a JSON error with status 400, and other failures a
+    JSON error with status 500, or the connection is closed if the response
+    was already started.
+    """
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+        arrow = query.get("format", [""])[0] == "arrow"
+        self._started = False
+        try:
+            if parts == ["metrics"]:
+                self._send_json(self.service.metrics())
+            elif len(parts) == 2 and parts[0] == "metadata":
+                self._send_json(self.service.metadata(parts[1]))
+            elif len(parts) == 2 and parts[0] == "sample":
+                points = [_parse_floats(point, 2) for point in query.get("point", [])]
+                if arrow:
+                    self._send_stream(
+                        self.service.sample_table(parts[1], points), ARROW_STREAM
+                    )
+                else:
+                    self._send_json({"values": self.service.sample(parts[1], points)})
+            elif len(parts) == 2 and parts[0] == "clip":
+                bbox = _parse_floats(query.get("bbox", [""])[0], 4)
+                if arrow:
+                    self._send_stream(
+                        self.service.clip_table(parts[1], *bbox), ARROW_STREAM
+                    )
+                else:
+                    self._send_stream(self.service.clip(parts[1], *bbox), "image/tiff")
+            else:
+                self._send_json({"error": "Not found."}, status=404)
+        except Exception as error:
+            if self._started:
+                # the status is already sent, so the client can only tell
+                # from the incomplete response
+                self.close_connection = True
+            else:
+                status = 400 if isinstance(error, ValueError) else 500
+                self._send_json({"error": str(error)}, status=status)
+
+    def _send_json(self, content, status=200):
+        body = json.dumps(content, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self._started = True
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._started = True
+        for chunk in chunks:
+            self.wfile.write(b"%x\r\n" % len(chunk))
+            self.wfile.write(chunk)
+            self.wfile.write(b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        # requests are counted in the metrics rather than logged to stderr
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=8080):
+    """
+    Create an HTTP server for a query service, handling each client in a
+    thread.
+
+    Args:
+        service: ``QueryService`` answering the queries.
+        host: Host name or address to listen on.
+        port: Port to listen on, 0 for any free port.
+
+    Returns:
+        http.server.ThreadingHTTPServer: Server, to run with ``serve_forever``.
+    """
+    handler = type("Handler", (QueryHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy
+
+# bump when the layout of the stored state changes
+SNAPSHOT_FORMAT = 2
+
+
+def default_cache_dir():
+    """Get the default cache directory of bmi_dbseabed."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "bmi_dbseabed")
+
+
+def data_version(link):
+    """
+    Get a version stamp of a data source without network access.
+
+    Remote links are assumed to be versioned by their URL, as a new dbSEABED
+    release is published under a new file name. Local files are versioned by
+    their size and modification time.
+    """
+    if os.path.isfile(link):
+        stat = os.stat(link)
+        return {"link": link, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return {"link": link}
+
+
+def snapshot_key(conf, version):
+    """
+    Hash a configuration and data version into a snapshot key.
+
+    >>> snapshot_key({"var_name": "mud"}, {"link": "mud.tif"})[:12]
+    '301fbdadd2e7'
+    """
+    text = json.dumps(
+        {"format": SNAPSHOT_FORMAT, "conf": conf, "version": version},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SnapshotCache:
+    """
+    Store BMI model states as uncompressed NumPy arrays and a JSON record.
+
+    Arrays are saved in ``.npy`` files and memory-mapped when loaded, so
+    restoring a state costs a few file opens regardless of the grid size.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = os.path.join(directory or default_cache_dir(), "snapshots")
+
+    def path(self, key):
+        return os.path.join(self._directory, key)
+
+    def load(self, key):
+        """
+        Load a state.
+
+        Returns:
+            dict: The "record" saved with the state and its arrays, or None if
+            there is no snapshot for the key.
+        """
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, "record.json")) as fp:
+                state = {"record": json.load(fp)}
+            for name in state["record"]["arrays"]:
+                state[name] = numpy.load(
+                    os.path.join(path, f"{name}.npy"), mmap_mode="r"
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+        return state
+
+    def save(self, key, record, **arrays):
+        """
+        Save a state.
+
+        The snapshot is written to a temporary directory and moved in place,
+        so concurrent runs never see a partial snapshot.
+
+        Args:
+            key: Snapshot key.
+            record: JSON serializable information of the state.
+            **arrays: Arrays of the state.
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self._directory, prefix=".tmp-")
+        try:
+            for name, array in arrays.items():
+                numpy.save(os.path.join(tmp, f"{name}.npy"), array)
+            with open(os.path.join(tmp, "record.json"), "w") as fp:
+                json.dump({**record, "arrays": sorted(arrays)}, fp)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            # another process published the same snapshot first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(self.path(key)):
+                raise
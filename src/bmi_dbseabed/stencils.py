@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from collections import namedtuple
+from functools import partial
+
+import numpy
+from bmi_dbseabed import blocks
+from rasterio.windows import Window
+
+Stencil = namedtuple("Stencil", ["name", "func", "halo"])
+Stencil.__doc__ = """
+Kernel computing a cell from the cells around it.
+
+Attributes:
+    name: Name of the stencil.
+    func: Function of a 2D float array padded by the halo on each side, the
+        (x, y) cell size and the latitudes of the rows of the result, None
+        for projected grids, returning the values of the cells within the
+        halo. It must compute each cell from its neighbourhood only, in the
+        same order for every cell, so results do not depend on the blocks.
+    halo: Width in cells of the neighbourhood.
+"""
+
+# length of a degree of latitude on the sphere of the authalic radius
+METRES_PER_DEGREE = 6371007.2 * numpy.pi / 180
+
+
+def _neighbours(padded, halo, radius):
+    # views of the neighbours of the inner cells, one per offset, row-major
+    height = padded.shape[0] - 2 * halo
+    width = padded.shape[1] - 2 * halo
+    for row in range(halo - radius, halo + radius + 1):
+        for col in range(halo - radius, halo + radius + 1):
+            yield padded[row : row + height, col : col + width]
+
+
+def _gradient(padded, res, lat, radius):
+    values = padded.astype("float64")
+    x_res, y_res = res
+    if lat is not None:
+        # degrees to metres, with meridians converging to the poles
+        x_res = x_res * METRES_PER_DEGREE * numpy.cos(numpy.radians(lat))[:, None]
+        y_res = y_res * METRES_PER_DEGREE
+    # central differences, with y increasing to the north (up the rows)
+    r = radius
+    inner = slice(r, -r)
+    dx = (values[inner, 2 * r :] - values[inner, : -2 * r]) / (2 * r * x_res)
+    dy = (values[: -2 * r, inner] - values[2 * r :, inner]) / (2 * r * y_res)
+    return numpy.hypot(dx, dy).astype("float32")
+
+
+def _variability(padded, res, lat, radius):
+    center = padded[radius:-radius, radius:-radius]
+    count = numpy.zeros(center.shape, dtype="float64")
+    total = numpy.zeros(center.shape, dtype="float64")
+    for values in _neighbours(padded, radius, radius):
+        valid = ~numpy.isnan(values)
+        count += valid
+        total += numpy.where(valid, values, 0.0)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        # deviations from the mean, which is exact for small variations
+        squares = numpy.zeros(center.shape, dtype="float64")
+        for values in _neighbours(padded, radius, radius):
+            squares += numpy.where(numpy.isnan(values), 0.0, (values - mean) ** 2)
+        std = numpy.sqrt(squares / count)
+    std[numpy.isnan(center)] = numpy.nan
+    return std.astype("float32")
+
+
+def _roughness(padded, res, lat, radius):
+    center = padded[radius:-radius, radius:-radius]
+    low = numpy.full(center.shape, numpy.nan, dtype=padded.dtype)
+    high = numpy.full(center.shape, numpy.nan, dtype=padded.dtype)
+    for values in _neighbours(padded, radius, radius):
+        # fmin and fmax ignore NaN neighbours
+        numpy.fmin(low, values, out=low)
+        numpy.fmax(high, values, out=high)
+    roughness = (high - low).astype("float32")
+    roughness[numpy.isnan(center)] = numpy.nan
+    return roughness
+
+
+def gradient(radius=1):
+    """
+    Magnitude of the gradient, from central differences.
+
+    The gradient is per metre on grids in geographic coordinates, such as
+    dbSEABED, with the east component scaled by the cosine of the latitude,
+    and per unit of the coordinates on projected grids. It is NaN where a
+    neighbour is no-data.
+
+    Args:
+        radius: Distance in cells of the neighbours of the differences.
+    """
+    if radius < 1:
+        raise ValueError("Please provide a radius of at least 1 cell.")
+    return Stencil("gradient", partial(_gradient, radius=radius), radius)
+
+
+def variability(radius=1):
+    """
+    Standard deviation of the valid cells within a square of cells.
+
+    Args:
+        radius: Half width of the square, without the center cell.
+    """
+    if radius < 1:
+        raise ValueError("Please provide a radius of at least 1 cell.")
+    return Stencil("variability", partial(_variability, radius=radius), radius)
+
+
+def roughness(radius=1):
+    """
+    Difference of the largest and smallest valid cells within a square of
+    cells, as the roughness of terrain analysis.
+
+    Args:
+        radius: Half width of the square, without the center cell.
+    """
+    if radius < 1:
+        raise ValueError("Please provide a radius of at least 1 cell.")
+    return Stencil("roughness", partial(_roughness, radius=radius), radius)
+
+
+STENCILS = {"gradient": gradient, "variability": variability, "roughness": roughness}
+
+
+def apply(stencil, values, res, lat=None):
+    """
+    Apply a stencil to a whole array, with no-data outside.
+
+    Args:
+        stencil: Stencil to apply.
+        values: 2D float array with NaN for no-data.
+        res: (x, y) cell size.
+        lat: Optional latitudes of the rows, for grids in geographic
+            coordinates.
+
+    Returns:
+        numpy.ndarray: float32 result with the shape of the values.
+    """
+    padded = numpy.pad(
+        numpy.asarray(values, dtype="float32"),
+        stencil.halo,
+        constant_values=numpy.nan,
+    )
+    return stencil.func(padded, res, lat)
+
+
+class StencilProcessor:
+    """
+    Apply a stencil to a raster block by block.
+
+    Each block is read with a halo of the width of the stencil, from the
+    raster around the window when available, so blocks give exactly the
+    values of the stencil applied to the whole raster. Blocks are read in
+    the calling thread and computed in a pool of threads.
+
+    >>> processor = StencilProcessor(roughness(radius=2), workers=4)
+    >>> processor.stencil.halo
+    2
+    """
+
+    def __init__(self, stencil, workers=1, block_shape=None):
+        """
+        Args:
+            stencil: Stencil to apply.
+            workers: Number of threads computing blocks.
+            block_shape: Optional (rows, cols) size of the blocks. Defaults
+                to the internal tiling of the raster.
+        """
+        self.stencil = stencil
+        self._workers = workers
+        self._block_shape = block_shape
+
+    def _blocks(self, src, window):
+        res = (abs(src.transform.a), abs(src.transform.e))
+        geographic = src.crs is not None and src.crs.is_geographic
+
+        def _apply(item):
+            block, padded = item
+            lat = None
+            if geographic:
+                rows = block.row_off + numpy.arange(block.height) + 0.5
+                lat = src.transform.f + rows * src.transform.e
+            return block, self.stencil.func(padded, res, lat)
+
+        items = (
+            (block, blocks.read_halo(src, block, self.stencil.halo))
+            for block in blocks.iter_blocks(src, window, self._block_shape)
+        )
+        return blocks.map_blocks(_apply, items, self._workers)
+
+    def read(self, src, window):
+        """
+        Apply the stencil within a window.
+
+        Args:
+            src: Open rasterio dataset.
+            window: Window in source pixel coordinates.
+
+        Returns:
+            numpy.ndarray: float32 result with the shape of the window.
+        """
+        result = numpy.empty((window.height, window.width), dtype="float32")
+        for block, values in self._blocks(src, window):
+            row = block.row_off - window.row_off
+            col = block.col_off - window.col_off
+            result[row : row + block.height, col : col + block.width] = values
+        return result
+
+    def write(self, src, window, output):
+        """
+        Apply the stencil within a window and save the result as a GeoTIFF.
+
+        Only the blocks in progress are held in memory.
+
+        Args:
+            src: Open rasterio dataset.
+            window: Window in source pixel coordinates.
+            output: Output file path.
+        """
+        profile = {
+            **blocks.window_profile(src, window),
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+        }
+        with blocks.GTiffBlockWriter(output, profile) as writer:
+            for block, values in self._blocks(src, window):
+                writer.write(
+                    values,
+                    Window(
+                        block.col_off - window.col_off,
+                        block.row_off - window.row_off,
+                        block.width,
+                        block.height,
+                    ),
+                )
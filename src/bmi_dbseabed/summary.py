@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+import numpy
+from bmi_dbseabed import blocks
+from rasterio.windows import Window
+
+
+class SummaryIndex:
+    """
+    Per-block summary of a raster: min, max, sum, valid count and histogram.
+
+    Blocks follow the internal tiling of the raster, so a query reads only
+    the tiles of the blocks whose range can match it, and global summaries
+    are computed from the index without reading the raster.
+    """
+
+    def __init__(self, windows, minimum, maximum, total, count, histogram, edges):
+        """
+        Args:
+            windows: (n, 4) array of the col_off, row_off, width and height
+                of the blocks.
+            minimum: Minimum of each block, NaN for blocks without data.
+            maximum: Maximum of each block, NaN for blocks without data.
+            total: Sum of the valid values of each block.
+            count: Number of valid cells of each block.
+            histogram: (n, bins) array of the counts of each block.
+            edges: Edges of the histogram bins.
+        """
+        self.windows = windows
+        self.minimum = minimum
+        self.maximum = maximum
+        self.total = total
+        self.count = count
+        self.histogram = histogram
+        self.edges = edges
+
+    @classmethod
+    def build(cls, src, bins=32, value_range=None):
+        """
+        Build the index of a raster.
+
+        Args:
+            src: Open rasterio dataset.
+            bins: Number of histogram bins.
+            value_range: Optional (low, high) range of the histogram. Values
+                outside are counted in the first or last bin. Defaults to
+                the range of the raster, which takes a second read.
+
+        Returns:
+            SummaryIndex: The index.
+        """
+        window = Window(0, 0, src.width, src.height)
+        windows, minimum, maximum, total, count = [], [], [], [], []
+        histograms = []
+        edges = None
+        if value_range is not None:
+            edges = numpy.linspace(*value_range, bins + 1)
+
+        for block in blocks.iter_blocks(src, window):
+            values = blocks.read_block(src, block)
+            valid = values[~numpy.isnan(values)]
+            windows.append((block.col_off, block.row_off, block.width, block.height))
+            count.append(valid.size)
+            total.append(valid.sum(dtype="float64"))
+            minimum.append(valid.min() if valid.size else numpy.nan)
+            maximum.append(valid.max() if valid.size else numpy.nan)
+            if edges is not None:
+                histograms.append(_histogram(valid, edges))
+
+        minimum = numpy.array(minimum, dtype="float64")
+        maximum = numpy.array(maximum, dtype="float64")
+        if edges is None:
+            valid = ~numpy.isnan(minimum)
+            low = minimum[valid].min() if valid.any() else 0.0
+            high = maximum[valid].max() if valid.any() else 1.0
+            edges = numpy.linspace(low, high if high > low else low + 1, bins + 1)
+            for block in windows:
+                values = blocks.read_block(src, Window(*block))
+                histograms.append(_histogram(values[~numpy.isnan(values)], edges))
+
+        return cls(
+            windows=numpy.array(windows, dtype="int64").reshape(-1, 4),
+            minimum=minimum,
+            maximum=maximum,
+            total=numpy.array(total, dtype="float64"),
+            count=numpy.array(count, dtype="int64"),
+            histogram=numpy.array(histograms, dtype="int64").reshape(-1, bins),
+            edges=edges,
+        )
+
+    def save(self, path):
+        """Save the index as a NumPy .npz file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # a temporary file of each writer, published in one step, so readers
+        # and other writers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                numpy.savez(fp, **vars(self))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with ``save``.
+
+        Returns:
+            SummaryIndex: The index, or None if the file cannot be read.
+        """
+        try:
+            with numpy.load(path) as arrays:
+                return cls(**{name: arrays[name] for name in arrays.files})
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def summary(self):
+        """
+        Get the summary of the whole raster.
+
+        Returns:
+            dict: Valid cell count, min, max, mean, and the histogram counts
+            and bin edges.
+        """
+        count = int(self.count.sum())
+        return {
+            "count": count,
+            "min": float(numpy.nanmin(self.minimum)) if count else None,
+            "max": float(numpy.nanmax(self.maximum)) if count else None,
+            "mean": float(self.total.sum() / count) if count else None,
+            "histogram": self.histogram.sum(axis=0).tolist(),
+            "edges": self.edges.tolist(),
+        }
+
+    def candidates(self, low=None, high=None):
+        """
+        Get the blocks that can have values within a range.
+
+        Args:
+            low: Optional lower bound, inclusive.
+            high: Optional upper bound, inclusive.
+
+        Returns:
+            numpy.ndarray: Boolean mask of the blocks.
+        """
+        # comparisons with the NaN bounds of empty blocks are False
+        match = self.count > 0
+        if low is not None:
+            match &= self.maximum >= low
+        if high is not None:
+            match &= self.minimum <= high
+        return match
+
+    def count_range(self, src, low=None, high=None):
+        """
+        Count the cells with values within a range.
+
+        Blocks entirely within the range are counted from the index, so only
+        the blocks that straddle a bound are read.
+
+        Args:
+            src: Open rasterio dataset the index was built from.
+            low: Optional lower bound, inclusive.
+            high: Optional upper bound, inclusive.
+
+        Returns:
+            int: Number of cells.
+        """
+        candidates = self.candidates(low, high)
+        inside = candidates.copy()
+        if low is not None:
+            inside &= self.minimum >= low
+        if high is not None:
+            inside &= self.maximum <= high
+
+        count = int(self.count[inside].sum())
+        for col_off, row_off, width, height in self.windows[candidates & ~inside]:
+            values = blocks.read_block(src, Window(col_off, row_off, width, height))
+            count += int(numpy.count_nonzero(_within(values, low, high)))
+        return count
+
+    def select(self, src, low=None, high=None):
+        """
+        Find the cells with values within a range.
+
+        Only the candidate blocks are read.
+
+        Args:
+            src: Open rasterio dataset the index was built from.
+            low: Optional lower bound, inclusive.
+            high: Optional upper bound, inclusive.
+
+        Returns:
+            tuple: x and y coordinates of the cell centers and values of the
+            cells, as 1D arrays in block order.
+        """
+        transform = src.transform
+        xs, ys, selected = [], [], []
+        for col_off, row_off, width, height in self.windows[self.candidates(low, high)]:
+            values = blocks.read_block(src, Window(col_off, row_off, width, height))
+            match = _within(values, low, high)
+            rows, cols = numpy.nonzero(match)
+            xs.append(transform.c + (col_off + cols + 0.5) * transform.a)
+            ys.append(transform.f + (row_off + rows + 0.5) * transform.e)
+            selected.append(values[match])
+
+        if not selected:
+            return numpy.empty(0), numpy.empty(0), numpy.empty(0, dtype="float32")
+        return numpy.concatenate(xs), numpy.concatenate(ys), numpy.concatenate(selected)
+
+
+def _within(values, low, high):
+    # NaN compares False, so no-data cells never match
+    match = ~numpy.isnan(values)
+    if low is not None:
+        match &= values >= low
+    if high is not None:
+        match &= values <= high
+    return match
+
+
+def _histogram(values, edges):
+    # values out of the range are counted in the outer bins
+    counts, _ = numpy.histogram(numpy.clip(values, edges[0], edges[-1]), bins=edges)
+    return counts
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import io
+
+import numpy
+from bmi_dbseabed import blocks
+from rasterio.windows import Window
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError("Please install pyarrow to export tables.") from error
+    return pyarrow
+
+
+def table_schema(var_names):
+    """
+    Get the Arrow schema of tables of variables.
+
+    Args:
+        var_names: Variable names.
+
+    Returns:
+        pyarrow.Schema: float64 "x" and "y" columns and a float32 column per
+        variable.
+    """
+    pa = _pyarrow()
+    return pa.schema(
+        [("x", pa.float64()), ("y", pa.float64())]
+        + [(name, pa.float32()) for name in var_names]
+    )
+
+
+def grid_batch(columns, transform, row_off=0, col_off=0):
+    """
+    Build a record batch of the valid cells of a block of a grid.
+
+    A cell is valid if any of the variables has a value. Columns of blocks
+    without no-data cells wrap the NumPy buffers without copying them.
+
+    Args:
+        columns: Mapping of variable names to 2D float arrays of the block,
+            with NaN for no-data.
+        transform: Affine transform of the grid.
+        row_off: Row of the block in the grid.
+        col_off: Column of the block in the grid.
+
+    Returns:
+        pyarrow.RecordBatch: Cell center coordinates and values, or None if
+        the block has no valid cells.
+    """
+    pa = _pyarrow()
+    arrays = list(columns.values())
+    valid = numpy.zeros(arrays[0].shape, dtype=bool)
+    for values in arrays:
+        valid |= ~numpy.isnan(values)
+
+    if valid.all():
+        rows, cols = numpy.indices(valid.shape).reshape(2, -1)
+        arrays = [numpy.ascontiguousarray(values).reshape(-1) for values in arrays]
+    else:
+        rows, cols = numpy.nonzero(valid)
+        if not rows.size:
+            return None
+        arrays = [values[valid] for values in arrays]
+
+    x = transform.c + (col_off + cols + 0.5) * transform.a
+    y = transform.f + (row_off + rows + 0.5) * transform.e
+    return pa.RecordBatch.from_arrays(
+        [pa.array(x), pa.array(y)] + [pa.array(values) for values in arrays],
+        schema=table_schema(columns),
+    )
+
+
+def iter_batches(sources, window, rows=None):
+    """
+    Read the valid cells of a window of aligned rasters as record batches.
+
+    The window is read in strips of whole rows, so only one strip of each
+    raster is held in memory.
+
+    Args:
+        sources: Mapping of variable names to open rasterio datasets.
+        window: Window in source pixel coordinates.
+        rows: Rows per strip. Defaults to the block height of the first
+            source, so each strip reads whole tiles.
+
+    Yields:
+        pyarrow.RecordBatch: Batches with "x", "y" and a column per variable.
+    """
+    blocks.check_aligned(sources)
+    src = next(iter(sources.values()))
+    rows = rows or src.block_shapes[0][0]
+    for strip in blocks.iter_blocks(src, window, (rows, src.width)):
+        batch = grid_batch(
+            {
+                name: blocks.read_block(source, strip)
+                for name, source in sources.items()
+            },
+            src.transform,
+            strip.row_off,
+            strip.col_off,
+        )
+        if batch is not None:
+            yield batch
+
+
+def write_parquet(output, batches, schema, row_group_size=1_000_000):
+    """
+    Write record batches to a Parquet file, in row groups.
+
+    Batches are buffered until a row group is full, so memory is bounded by
+    the row group size.
+
+    Args:
+        output: Output file path.
+        batches: Iterable of record batches.
+        schema: Schema of the batches.
+        row_group_size: Maximum number of rows per row group.
+    """
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(output, schema) as writer:
+        pending, pending_rows = [], 0
+        for batch in batches:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= row_group_size:
+                writer.write_table(
+                    pa.Table.from_batches(pending, schema=schema),
+                    row_group_size=row_group_size,
+                )
+                pending, pending_rows = [], 0
+        if pending:
+            writer.write_table(
+                pa.Table.from_batches(pending, schema=schema),
+                row_group_size=row_group_size,
+            )
+
+
+def sample_batch(sources, points):
+    """
+    Sample aligned rasters at points.
+
+    Each block containing points is read once.
+
+    Args:
+        sources: Mapping of variable names to open rasterio datasets.
+        points: Sequence of (x, y) coordinates.
+
+    Returns:
+        pyarrow.RecordBatch: One row per point with "x", "y" and a column per
+        variable, NaN outside the grid or at no-data cells.
+    """
+    pa = _pyarrow()
+    blocks.check_aligned(sources)
+    src = next(iter(sources.values()))
+    points = numpy.asarray(points, dtype="float64").reshape(-1, 2)
+    x, y = points[:, 0], points[:, 1]
+
+    # cell of each point, as in rasterio's index with a floor
+    inverse = ~src.transform
+    cols = numpy.floor(inverse.a * x + inverse.b * y + inverse.c).astype(int)
+    rows = numpy.floor(inverse.d * x + inverse.e * y + inverse.f).astype(int)
+    inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+
+    block_rows, block_cols = src.block_shapes[0]
+    tiles = (rows // block_rows) * (-(-src.width // block_cols)) + cols // block_cols
+    columns = {name: numpy.full(len(points), numpy.nan, "float32") for name in sources}
+    for tile in numpy.unique(tiles[inside]):
+        selected = inside & (tiles == tile)
+        row0 = rows[selected][0] // block_rows * block_rows
+        col0 = cols[selected][0] // block_cols * block_cols
+        window = Window(
+            col0,
+            row0,
+            min(block_cols, src.width - col0),
+            min(block_rows, src.height - row0),
+        )
+        for name, source in sources.items():
+            block = blocks.read_block(source, window)
+            columns[name][selected] = block[
+                rows[selected] - row0, cols[selected] - col0
+            ]
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array(x), pa.array(y)] + [pa.array(values) for values in columns.values()],
+        schema=table_schema(sources),
+    )
+
+
+def ipc_stream(schema, batches):
+    """
+    Serialize record batches in the Arrow IPC streaming format.
+
+    Args:
+        schema: Schema of the batches.
+        batches: Iterable of record batches.
+
+    Yields:
+        bytes: The stream, one piece per batch.
+    """
+    pa = _pyarrow()
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import math
+
+import numpy
+import rasterio.features
+import rasterio.windows
+from bmi_dbseabed import blocks
+from rasterio.windows import Window
+
+
+class QuantileSketch:
+    """
+    Approximate quantile sketch with bounded memory.
+
+    Values are kept in levels of compactors, where an item on level ``h``
+    stands for ``2**h`` input values. When a level holds more than ``capacity``
+    items it is sorted and every other item is promoted to the next level, so
+    memory grows with the logarithm of the number of values.
+
+    >>> sketch = QuantileSketch(capacity=64, seed=0)
+    >>> sketch.update(numpy.arange(10000, dtype="float64"))
+    >>> bool(abs(sketch.quantile(50) - 5000) < 500)
+    True
+    """
+
+    def __init__(self, capacity=1024, seed=None):
+        self._capacity = capacity
+        self._levels = [numpy.empty(0)]
+        self._rng = numpy.random.default_rng(seed)
+
+    def update(self, values):
+        """Add a 1D array of values."""
+        self._levels[0] = numpy.concatenate([self._levels[0], values])
+        level = 0
+        while len(self._levels[level]) > self._capacity:
+            items = numpy.sort(self._levels[level])
+            # an odd item out stays on its level so no weight is lost
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            pairs = items[: len(items) - len(keep)]
+            promoted = pairs[self._rng.integers(2) :: 2]
+
+            if level + 1 == len(self._levels):
+                self._levels.append(numpy.empty(0))
+            self._levels[level] = keep
+            self._levels[level + 1] = numpy.concatenate(
+                [self._levels[level + 1], promoted]
+            )
+            level += 1
+
+    def quantile(self, q):
+        """
+        Get an approximate percentile.
+
+        Args:
+            q: Percentile between 0 and 100.
+
+        Returns:
+            float: Approximate value at the percentile, NaN if empty.
+        """
+        items = numpy.concatenate(self._levels)
+        if not len(items):
+            return math.nan
+        weights = numpy.concatenate(
+            [numpy.full(len(level), 2.0**h) for h, level in enumerate(self._levels)]
+        )
+        order = numpy.argsort(items)
+        cumulative = numpy.cumsum(weights[order])
+        rank = q / 100 * cumulative[-1]
+        index = min(int(numpy.searchsorted(cumulative, rank)), len(items) - 1)
+        return float(items[order][index])
+
+
+class ZoneStatistics:
+    """Streaming statistics of the valid cells in a zone."""
+
+    def __init__(self, capacity=1024, seed=None):
+        self.count = 0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._sketch = QuantileSketch(capacity=capacity, seed=seed)
+
+    def update(self, values):
+        """Add a 1D array of valid values."""
+        if not len(values):
+            return
+        values = values.astype("float64", copy=False)
+        self.count += len(values)
+        self._sum += float(values.sum())
+        self._sum_squares += float(numpy.dot(values, values))
+        self._min = min(self._min, float(values.min()))
+        self._max = max(self._max, float(values.max()))
+        self._sketch.update(values)
+
+    def summary(self, percentiles=()):
+        """
+        Get the statistics of the zone.
+
+        Args:
+            percentiles: Percentiles to estimate.
+
+        Returns:
+            dict: count, mean, std, min, max and one "p<percentile>" entry per
+            percentile. Values are NaN when the zone has no valid cells.
+        """
+        if self.count:
+            mean = self._sum / self.count
+            variance = max(self._sum_squares / self.count - mean**2, 0.0)
+            stats = {
+                "count": self.count,
+                "mean": mean,
+                "std": math.sqrt(variance),
+                "min": self._min,
+                "max": self._max,
+            }
+        else:
+            stats = dict.fromkeys(["mean", "std", "min", "max"], math.nan)
+            stats = {"count": 0, **stats}
+
+        for q in percentiles:
+            stats[f"p{q:g}"] = self._sketch.quantile(q)
+        return stats
+
+
+def _as_zone(zone):
+    # returns (geometry, bounds), where geometry is None for a bounding box
+    if isinstance(zone, dict) and zone.get("type") == "Feature":
+        zone = zone["geometry"]
+    if isinstance(zone, dict):
+        return zone, rasterio.features.bounds(zone)
+
+    west, south, east, north = (float(value) for value in zone)
+    if west > east or south > north:
+        raise ValueError(
+            "Please provide valid bounding box values for west, east, south and"
+            " north."
+        )
+    return None, (west, south, east, north)
+
+
+def zones_bounds(zones):
+    """
+    Get the bounding box of zones.
+
+    Args:
+        zones: Mapping of zone ids to zones, or a sequence of zones.
+
+    Returns:
+        tuple: west, south, east, north, or None without zones.
+    """
+    zones = zones.values() if isinstance(zones, dict) else zones
+    bounds = numpy.array([_as_zone(zone)[1] for zone in zones]).reshape(-1, 4)
+    if not len(bounds):
+        return None
+    return (
+        float(bounds[:, 0].min()),
+        float(bounds[:, 1].min()),
+        float(bounds[:, 2].max()),
+        float(bounds[:, 3].max()),
+    )
+
+
+def _zone_mask(geometry, bounds, transform, shape):
+    # cells whose centers fall inside the zone
+    if geometry is not None:
+        return rasterio.features.rasterize(
+            [(geometry, 1)], out_shape=shape, transform=transform, dtype="uint8"
+        ).view(bool)
+
+    west, south, east, north = bounds
+    cols = transform.c + (numpy.arange(shape[1]) + 0.5) * transform.a
+    rows = transform.f + (numpy.arange(shape[0]) + 0.5) * transform.e
+    return numpy.logical_and.outer(
+        (rows >= south) & (rows <= north), (cols >= west) & (cols <= east)
+    )
+
+
+def zonal_statistics(src, zones, percentiles=(25, 50, 75), capacity=1024, seed=0):
+    """
+    Compute statistics of a raster within many zones in one pass.
+
+    Every raster block that intersects at least one zone is read once, and the
+    mask of each intersecting zone is rasterized once for that block. Cells
+    belong to a zone when their centers fall inside it.
+
+    Args:
+        src: Open rasterio dataset.
+        zones: Mapping of zone ids to zones, or a sequence of zones identified
+            by their position. A zone is a GeoJSON geometry or feature, or a
+            (west, south, east, north) bounding box.
+        percentiles: Percentiles to estimate for each zone.
+        capacity: Size of the quantile sketches. Larger values give more
+            accurate percentiles at the cost of memory.
+        seed: Seed of the quantile sketch compaction.
+
+    Returns:
+        dict: Statistics for each zone id, as returned by
+        ``ZoneStatistics.summary``.
+    """
+    if not isinstance(zones, dict):
+        zones = dict(enumerate(zones))
+    zones = {zone_id: _as_zone(zone) for zone_id, zone in zones.items()}
+    stats = {zone_id: ZoneStatistics(capacity=capacity, seed=seed) for zone_id in zones}
+
+    full = Window(0, 0, src.width, src.height)
+    windows = {}
+    for zone_id, (_, bounds) in zones.items():
+        try:
+            window = blocks.bbox_window(src, *bounds)
+        except ValueError:
+            continue
+        windows[zone_id] = window
+
+    if windows:
+        union = rasterio.windows.union(*windows.values()).intersection(full)
+        for block in blocks.iter_blocks(src, union):
+            block_zones = [
+                zone_id
+                for zone_id, window in windows.items()
+                if rasterio.windows.intersect(block, window)
+            ]
+            if not block_zones:
+                continue
+
+            values = blocks.read_block(src, block)
+            valid = ~numpy.isnan(values)
+            transform = rasterio.windows.transform(block, src.transform)
+            for zone_id in block_zones:
+                geometry, bounds = zones[zone_id]
+                mask = _zone_mask(geometry, bounds, transform, values.shape)
+                stats[zone_id].update(values[mask & valid])
+
+    return {
+        zone_id: zone_stats.summary(percentiles)
+        for zone_id, zone_stats in stats.items()
+    }
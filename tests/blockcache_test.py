@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.blockcache import BlockCache
+from bmi_dbseabed.blockcache import CompressedBlockCache
+from bmi_dbseabed.blockcache import read_cached
+from rasterio.windows import Window
+
+from .conftest import NODATA
+from .conftest import write_synthetic_tif
+
+
+def test_compressed_round_trip():
+    block = numpy.linspace(0, 100, 256, dtype="float32").reshape(16, 16)
+    block[:4] = numpy.nan
+    cache = CompressedBlockCache(max_bytes=1024**2)
+    cache.put("a", block)
+
+    cached = cache.get("a")
+    numpy.testing.assert_array_equal(cached, block)
+    assert cached.dtype == block.dtype
+    assert not cached.flags.writeable
+
+    stats = cache.stats()
+    assert stats["raw_bytes"] == block.nbytes
+    assert stats["ratio"] == block.nbytes / stats["bytes"] > 1
+
+
+def test_compressed_eviction():
+    blocks = [numpy.full(256, key, dtype="float64") for key in range(4)]
+    probe = CompressedBlockCache(1024)
+    probe.put(0, blocks[0])
+    size = probe.stats()["bytes"]
+
+    # two blocks fit by their compressed size, far below their raw size
+    cache = CompressedBlockCache(max_bytes=2 * size + size // 2)
+    for key, block in enumerate(blocks):
+        cache.put(key, block)
+    assert cache.get(0) is None
+    numpy.testing.assert_array_equal(cache.get(3), blocks[3])
+    stats = cache.stats()
+    assert (stats["blocks"], stats["evictions"]) == (2, 2)
+    assert stats["raw_bytes"] == 2 * blocks[0].nbytes
+
+
+@pytest.mark.parametrize("cache_type", [BlockCache, CompressedBlockCache])
+def test_read_cached(local_services, cache_type):
+    cache = cache_type(1024**2)
+    window = Window(5, 7, 40, 30)
+    with rasterio.open(DbSeabed.DATA_SERVICES["mud"]["link"]) as src:
+        expected = src.read(1, window=window, masked=True).filled(numpy.nan)
+        for _ in range(2):
+            values = read_cached(cache, "mud", src, window, "float32")
+            numpy.testing.assert_array_equal(values, expected)
+
+    # the window covers 3 x 3 tiles of 16 x 16 cells
+    assert cache.stats()["misses"] == cache.stats()["hits"] == 9
+
+
+def test_read_cached_decode(local_services, tmp_path):
+    path = os.path.join(tmp_path, "scaled.tif")
+    shutil.copy(DbSeabed.DATA_SERVICES["mud"]["link"], path)
+    with rasterio.open(path, "r+") as dst:
+        dst.scales = (0.5,)
+        dst.offsets = (1.0,)
+
+    cache = BlockCache(1024**2)
+    window = Window(5, 7, 40, 30)
+    with rasterio.open(path) as src:
+        raw = src.read(1, window=window, masked=True).filled(numpy.nan)
+        # stored and decoded tiles are cached apart
+        for _ in range(2):
+            numpy.testing.assert_array_equal(
+                read_cached(cache, path, src, window, "float32"), raw
+            )
+            numpy.testing.assert_array_equal(
+                read_cached(cache, path, src, window, "float32", decode=True),
+                raw * 0.5 + 1.0,
+            )
+    assert cache.stats()["blocks"] == 18
+
+
+def test_get_data(local_services, tmp_path):
+    cache = CompressedBlockCache(1024**2)
+    dbseabed = DbSeabed(block_cache=cache)
+    expected = DbSeabed().get_data(
+        "mud", -96, 20, -84, 29, os.path.join(tmp_path, "expected.tif")
+    )
+    dataset = dbseabed.get_data(
+        "mud", -96, 20, -84, 29, os.path.join(tmp_path, "cached.tif")
+    )
+
+    numpy.testing.assert_array_equal(dataset.values, expected.values)
+    numpy.testing.assert_array_equal(dataset.x.values, expected.x.values)
+    assert dataset.rio.transform() == expected.rio.transform()
+    with rasterio.open(os.path.join(tmp_path, "cached.tif")) as src:
+        numpy.testing.assert_array_equal(
+            src.read(1, masked=True).filled(numpy.nan), expected[0].values
+        )
+
+    # an overlapping clip reads only the tiles it does not share
+    misses = cache.stats()["misses"]
+    dbseabed.get_data("mud", -94, 22, -86, 27, os.path.join(tmp_path, "inner.tif"))
+    assert cache.stats()["misses"] == misses
+
+    # a rewritten source misses the cache
+    link = DbSeabed.DATA_SERVICES["mud"]["link"]
+    values = local_services["mud"]
+    write_synthetic_tif(link, numpy.where(values == NODATA, NODATA, values + 1))
+    dataset = dbseabed.get_data(
+        "mud", -96, 20, -84, 29, os.path.join(tmp_path, "changed.tif")
+    )
+    numpy.testing.assert_array_equal(dataset.values, expected.values + 1)
@@ -0,0 +1,455 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pytest
+import yaml
+from bmi_dbseabed import BmiDbSeabed
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.releases import release_changes
+
+from .conftest import write_synthetic_tif
+
+
+@pytest.fixture
+def config_file(local_services, tmp_path):
+    def _config_file(**options):
+        path = os.path.join(tmp_path, "config.yaml")
+        conf = {
+            "var_name": "carbonate",
+            "west": -96,
+            "south": 20,
+            "east": -84,
+            "north": 29,
+            "output": os.path.join(tmp_path, "download.tif"),
+            **options,
+        }
+        with open(path, "w") as fp:
+            yaml.safe_dump({"bmi-dbseabed": conf}, fp)
+        return path
+
+    return _config_file
+
+
+def test_profile_disabled(config_file):
+    model = BmiDbSeabed()
+    model.initialize(config_file())
+
+    assert "get_value" not in vars(model)
+    assert model.get_profile() == {}
+    model.finalize()
+
+
+def test_profile(config_file, tmp_path):
+    output = os.path.join(tmp_path, "profile.json")
+    model = BmiDbSeabed()
+    model.initialize(config_file(profile=True, profile_output=output))
+
+    name = model.get_output_var_names()[0]
+    dest = numpy.empty(model.get_grid_size(0), dtype=model.get_var_type(name))
+    for _ in range(3):
+        model.get_value(name, dest)
+    model.get_value_ptr(name)
+    model.get_grid_x(0, numpy.empty(model.get_grid_shape(0, numpy.empty(2, int))[1]))
+    model.get_grid_nodes_per_face(0, numpy.empty(35 * 47, int))
+
+    profile = model.get_profile()
+    # calls made by profiled calls are counted in the outer call only
+    assert profile["get_grid_nodes_per_face[0]"]["calls"] == 1
+    assert "get_grid_face_count[0]" not in profile
+    assert profile[f"get_value[{name}]"]["calls"] == 3
+    assert profile[f"get_value[{name}]"]["bytes_copied"] == 3 * dest.nbytes
+    assert profile[f"get_value_ptr[{name}]"]["calls"] == 1
+    assert profile["get_grid_x[0]"]["calls"] == 1
+    assert (
+        profile[f"get_value[{name}]"]["p99_seconds"]
+        >= profile[f"get_value[{name}]"]["p50_seconds"]
+    )
+
+    model.finalize()
+    with open(output) as fp:
+        assert json.load(fp)[f"get_value[{name}]"]["calls"] == 3
+
+
+def test_initialize(config_file):
+    model = BmiDbSeabed()
+    model.initialize(config_file())
+
+    name = model.get_output_var_names()[0]
+    assert name == "surficial_seafloor_carbonate__fraction"
+    assert model.get_var_type(name) == "float32"
+    assert model.get_grid_shape(0, numpy.empty(2, int)).tolist() == [36, 48]
+    numpy.testing.assert_allclose(
+        model.get_grid_origin(0, numpy.empty(2)), [20.125, -95.875]
+    )
+    assert model.get_value_ptr(name) is model.get_value_ptr(name)
+    model.finalize()
+
+
+def test_grid(config_file, tmp_path):
+    model = BmiDbSeabed()
+    model.initialize(config_file())
+    dataset = DbSeabed().get_data(
+        "carbonate", -96, 20, -84, 29, os.path.join(tmp_path, "expected.tif")
+    )
+
+    numpy.testing.assert_allclose(
+        model.get_grid_x(0, numpy.empty(48)), dataset.x.values, rtol=0, atol=1e-9
+    )
+    numpy.testing.assert_allclose(
+        model.get_grid_y(0, numpy.empty(36)), dataset.y.values, rtol=0, atol=1e-9
+    )
+    assert model.get_grid_node_count(0) == 36 * 48
+    assert model.get_grid_face_count(0) == 35 * 47
+    assert model.get_grid_edge_count(0) == 36 * 47 + 48 * 35
+    assert (model.get_grid_nodes_per_face(0, numpy.empty(35 * 47, int)) == 4).all()
+    model.finalize()
+
+
+def test_grid_node_coordinates(config_file):
+    model = BmiDbSeabed()
+    model.initialize(config_file(node_coordinates=True))
+
+    x, y = model.get_grid_node_coordinates(0)
+    assert x.shape == y.shape == (36, 48)
+    numpy.testing.assert_array_equal(x[0], model.get_grid_x(0, numpy.empty(48)))
+    numpy.testing.assert_array_equal(y[:, 0], model.get_grid_y(0, numpy.empty(36)))
+    assert model.get_grid_node_coordinates(0)[0] is x
+    assert not x.flags.writeable
+    model.finalize()
+
+
+def test_packed(config_file, tmp_path):
+    dense = BmiDbSeabed()
+    dense.initialize(config_file())
+    name = dense.get_output_var_names()[0]
+    expected = dense.get_value(name, numpy.empty(dense.get_grid_size(0), "float32"))
+
+    conf = config_file(
+        packed=True, snapshot=True, snapshot_dir=os.path.join(tmp_path, "cache")
+    )
+    for _ in range(2):
+        model = BmiDbSeabed()
+        model.initialize(conf)
+        numpy.testing.assert_array_equal(
+            model.get_value(name, numpy.empty_like(expected)), expected
+        )
+        numpy.testing.assert_array_equal(
+            model.get_value_at_indices(name, numpy.empty(3, "float32"), [0, 5, 700]),
+            expected[[0, 5, 700]],
+        )
+        numpy.testing.assert_array_equal(
+            model.get_value_ptr(name).reshape(-1), expected
+        )
+        model.set_value_at_indices(name, [0], numpy.array([1.0], "float32"))
+        assert model.get_value(name, numpy.empty_like(expected))[0] == 1.0
+        assert model._values.nbytes < expected.nbytes
+        model.finalize()
+
+
+def test_packed_releases(config_file, monkeypatch):
+    link = DbSeabed.DATA_SERVICES["carbonate"]["link"]
+    monkeypatch.setitem(
+        DbSeabed.DATA_SERVICES["carbonate"], "releases", {2019: link, 2021: link}
+    )
+    with pytest.raises(ValueError, match="releases"):
+        BmiDbSeabed().initialize(config_file(packed=True, releases="all"))
+
+
+def test_snapshot(config_file, tmp_path, monkeypatch):
+    conf = config_file(snapshot=True, snapshot_dir=os.path.join(tmp_path, "cache"))
+    model = BmiDbSeabed()
+    model.initialize(conf)
+    name = model.get_output_var_names()[0]
+    expected = model.get_value(name, numpy.empty(model.get_grid_size(0), "float32"))
+    x = model.get_grid_x(0, numpy.empty(48))
+    model.finalize()
+
+    # a warm start must not read any raster
+    def fail(*args, **kwargs):
+        raise AssertionError("get_data called on a warm start")
+
+    monkeypatch.setattr("bmi_dbseabed.dbseabed.DbSeabed.get_data", fail)
+    model = BmiDbSeabed()
+    model.initialize(conf)
+
+    assert model.get_output_var_names() == (name,)
+    assert model.get_var_units(name) == "percent"
+    assert model.get_grid_size(0) == expected.size
+    numpy.testing.assert_array_equal(
+        model.get_value(name, numpy.empty_like(expected)), expected
+    )
+    numpy.testing.assert_array_equal(model.get_grid_x(0, numpy.empty(48)), x)
+
+
+def test_no_releases(config_file):
+    model = BmiDbSeabed()
+    model.initialize(config_file())
+
+    assert model.get_start_time() == model.get_end_time() == 0.0
+    model.update()
+    assert model.get_current_time() == 0.0
+
+
+def test_releases(config_file, local_services, tmp_path, monkeypatch):
+    changed = local_services["carbonate"].copy()
+    changed[20:30, 30:40] = 1.0
+    releases = {
+        2019: DbSeabed.DATA_SERVICES["carbonate"]["link"],
+        2021: DbSeabed.DATA_SERVICES["carbonate"]["link"],
+        2024: write_synthetic_tif(tmp_path / "carbonate_2024.tif", changed),
+    }
+    monkeypatch.setitem(DbSeabed.DATA_SERVICES["carbonate"], "releases", releases)
+
+    model = BmiDbSeabed()
+    model.initialize(config_file(releases="all"))
+    name = model.get_output_var_names()[0]
+    before = model.get_value(name, numpy.empty(model.get_grid_size(0), "float32"))
+    ptr = model.get_value_ptr(name)
+
+    assert model.get_time_units() == "year"
+    assert (model.get_start_time(), model.get_end_time()) == (2019.0, 2024.0)
+    assert model.get_time_step() == 2.0
+
+    model.update()
+    assert model.get_current_time() == 2021.0
+    numpy.testing.assert_array_equal(
+        model.get_value(name, numpy.empty_like(before)), before
+    )
+
+    model.update_until(2030)
+    assert model.get_current_time() == 2024.0
+    after = model.get_value(name, numpy.empty_like(before)).reshape(36, 48)
+    # the clip starts at row 8 and column 8 of the synthetic raster
+    numpy.testing.assert_array_equal(after[12:22, 22:32], 1.0)
+    # the field is updated in place
+    assert model.get_value_ptr(name) is ptr
+    numpy.testing.assert_array_equal(ptr.reshape(36, 48), after)
+    changed_cells = ~numpy.isclose(after.reshape(-1), before, equal_nan=True)
+    assert changed_cells.sum() <= 100
+    model.finalize()
+
+    # only the two source blocks that overlap the change are kept
+    changes = release_changes(
+        releases[2024], (-95.875, 20.125, -84.125, 28.875), before.reshape(36, 48)
+    )
+    assert len(changes) == 2
+
+
+def test_invalid_release(config_file):
+    with pytest.raises(ValueError, match="Please provide a valid release"):
+        BmiDbSeabed().initialize(config_file(releases=[2001]))
+
+
+def test_set_value_shares_base(config_file):
+    conf = config_file()
+    members = [BmiDbSeabed(), BmiDbSeabed()]
+    for member in members:
+        member.initialize(conf)
+    name = members[0].get_output_var_names()[0]
+    base = members[0]._overlay.base
+    assert members[1]._overlay.base is base
+    assert not base.flags.writeable
+
+    members[0].set_value_at_indices(name, numpy.array([0, 100]), numpy.array([1, 2]))
+    dest = members[0].get_value(name, numpy.empty(base.size, "float32"))
+    numpy.testing.assert_array_equal(dest[[0, 100]], [1.0, 2.0])
+    numpy.testing.assert_array_equal(
+        members[0].get_value_at_indices(
+            name, numpy.empty(3, "float32"), numpy.array([100, 1, 0])
+        ),
+        [2.0, base.reshape(-1)[1], 1.0],
+    )
+    assert members[0].get_value_ptr(name).reshape(-1)[100] == 2.0
+
+    # the other member and the shared base are unchanged
+    assert members[1]._overlay.base is base
+    numpy.testing.assert_array_equal(
+        members[1].get_value(name, numpy.empty_like(dest)), base.reshape(-1)
+    )
+
+    values = base.copy()
+    values[5:10, 5:10] = 0.5
+    members[1].set_value(name, values)
+    assert members[1]._overlay.size <= 25
+    numpy.testing.assert_array_equal(
+        members[1].get_value(name, numpy.empty_like(dest)), values.reshape(-1)
+    )
+    for member in members:
+        member.finalize()
+
+
+def test_get_value_ptr_writable(config_file):
+    conf = config_file()
+    members = [BmiDbSeabed(), BmiDbSeabed()]
+    for member in members:
+        member.initialize(conf)
+    name = members[0].get_output_var_names()[0]
+    base = members[1]._overlay.base.copy()
+    members[0].set_value_at_indices(name, numpy.array([0]), numpy.array([1.0]))
+
+    # each member gets a writable field of its own, with the values set so far
+    ptr = members[0].get_value_ptr(name)
+    assert ptr.flags.writeable
+    assert ptr.reshape(-1)[0] == 1.0
+    ptr.reshape(-1)[5] = 3.0
+    dest = members[0].get_value(name, numpy.empty(base.size, "float32"))
+    assert dest[5] == 3.0
+    members[0].set_value_at_indices(name, numpy.array([6]), numpy.array([4.0]))
+    assert members[0].get_value_ptr(name) is ptr
+    assert ptr.reshape(-1)[6] == 4.0
+
+    # the writes are edits of the member only, and are kept by pickling
+    numpy.testing.assert_array_equal(members[1]._overlay.base, base)
+    assert members[1].get_value_ptr(name) is not ptr
+    restored = pickle.loads(pickle.dumps(members[0]))
+    numpy.testing.assert_array_equal(
+        restored.get_value(name, numpy.empty_like(dest))[[0, 5, 6]], [1.0, 3.0, 4.0]
+    )
+    for member in (*members, restored):
+        member.finalize()
+
+
+def _mean_value(model):
+    name = model.get_output_var_names()[0]
+    values = model.get_value(name, numpy.empty(model.get_grid_size(0), "float32"))
+    return float(numpy.nanmean(values)), model.get_current_time()
+
+
+def test_pickle(config_file):
+    model = BmiDbSeabed()
+    model.initialize(config_file(profile=True))
+    name = model.get_output_var_names()[0]
+    model.set_value_at_indices(name, numpy.array([0, 100]), numpy.array([1, 2]))
+    expected = model.get_value(name, numpy.empty(model.get_grid_size(0), "float32"))
+
+    data = pickle.dumps(model)
+    assert len(data) < 4096
+    restored = pickle.loads(data)
+    # the state is restored on first use of a state attribute only
+    assert "_pending" in vars(restored)
+    assert not hasattr(restored, "_missing")
+    assert "_pending" in vars(restored)
+    numpy.testing.assert_array_equal(
+        restored.get_value(name, numpy.empty_like(expected)), expected
+    )
+    assert "_pending" not in vars(restored)
+    # the field is shared with the models of the same configuration
+    assert restored._state is model._state
+    assert restored.get_profile()[f"get_value[{name}]"]["calls"] == 1
+    restored.finalize()
+    model.finalize()
+
+    uninitialized = pickle.loads(pickle.dumps(BmiDbSeabed()))
+    assert uninitialized.get_output_var_names() == ()
+
+
+def test_pickle_releases(config_file, local_services, tmp_path, monkeypatch):
+    changed = local_services["carbonate"].copy()
+    changed[20:30, 30:40] = 1.0
+    releases = {
+        2019: DbSeabed.DATA_SERVICES["carbonate"]["link"],
+        2024: write_synthetic_tif(tmp_path / "carbonate_2024.tif", changed),
+    }
+    monkeypatch.setitem(DbSeabed.DATA_SERVICES["carbonate"], "releases", releases)
+
+    model = BmiDbSeabed()
+    model.initialize(config_file(releases="all"))
+    model.update()
+    restored = pickle.loads(pickle.dumps(model))
+
+    assert restored.get_current_time() == 2024.0
+    assert _mean_value(restored) == _mean_value(model)
+    restored.finalize()
+    model.finalize()
+
+
+def test_pickle_data_changed(config_file, local_services):
+    model = BmiDbSeabed()
+    model.initialize(config_file())
+    data = pickle.dumps(model)
+    model.finalize()
+
+    link = DbSeabed.DATA_SERVICES["carbonate"]["link"]
+    write_synthetic_tif(link, local_services["carbonate"] + 1)
+    restored = pickle.loads(data)
+    with pytest.raises(RuntimeError, match="data changed"):
+        restored.get_output_var_names()
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_pickle_process_pool(config_file):
+    models = [BmiDbSeabed(), BmiDbSeabed()]
+    for model in models:
+        model.initialize(config_file())
+    name = models[0].get_output_var_names()[0]
+    models[1].set_value_at_indices(name, numpy.array([100]), numpy.array([1e6]))
+
+    with ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        results = list(executor.map(_mean_value, models))
+    assert results == [_mean_value(model) for model in models]
+    assert results[0] != results[1]
+    for model in models:
+        model.finalize()
+
+
+def test_block_cache(config_file, monkeypatch):
+    from bmi_dbseabed import bmi
+
+    monkeypatch.setattr(bmi, "_block_caches", {})
+    outer, inner = BmiDbSeabed(), BmiDbSeabed()
+    outer.initialize(config_file(block_cache_mb=1))
+    cache = bmi._block_caches[1024**2]
+    misses = cache.stats()["misses"]
+    inner.initialize(config_file(block_cache_mb=1, west=-94, east=-86))
+
+    # the inner model reads its tiles from the cache
+    assert cache.stats()["misses"] == misses
+    assert cache.stats()["hits"] > 0
+    name = outer.get_output_var_names()[0]
+    numpy.testing.assert_array_equal(
+        inner.get_value_ptr(name), outer.get_value_ptr(name)[:, 8:40]
+    )
+    for model in (outer, inner):
+        model.finalize()
+
+
+def test_fill(config_file):
+    plain, model = BmiDbSeabed(), BmiDbSeabed()
+    plain.initialize(config_file())
+    model.initialize(config_file(fill="nearest", fill_distance=30))
+
+    name = model.get_output_var_names()[0]
+    values = plain.get_value_ptr(name)
+    filled = model.get_value_ptr(name)
+    assert numpy.isnan(values).any()
+    assert not numpy.isnan(filled).any()
+    valid = ~numpy.isnan(values)
+    numpy.testing.assert_array_equal(filled[valid], values[valid])
+
+    report = model.get_fill_report()
+    assert report["method"] == "nearest"
+    assert report["filled"] == report["missing"] == numpy.isnan(values).sum()
+    assert report["remaining"] == 0
+    assert plain.get_fill_report() == {}
+    for member in (plain, model):
+        member.finalize()
+
+
+def test_fill_releases(config_file, monkeypatch):
+    monkeypatch.setitem(
+        DbSeabed.DATA_SERVICES["carbonate"],
+        "releases",
+        {2019: DbSeabed.DATA_SERVICES["carbonate"]["link"]},
+    )
+    with pytest.raises(ValueError, match="either releases or a fill method"):
+        BmiDbSeabed().initialize(config_file(releases="all", fill="idw"))
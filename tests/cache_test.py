@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import queue
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import unquote
+
+import numpy
+import pytest
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.cache import CacheBackend
+from bmi_dbseabed.cache import LocalCacheBackend
+from bmi_dbseabed.cache import S3CacheBackend
+
+BBOX = (-96, 20, -84, 29)
+
+
+class _ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """In-memory stand-in of the boto3 S3 client methods used by the cache."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def _object(self, Bucket, Key):
+        try:
+            return self.objects[Bucket, Key]
+        except KeyError:
+            raise _ClientError("404") from None
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self._object(Bucket, Key))}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self._object(Bucket, Key))}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Bucket, Key] = bytes(Body)
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, "rb") as fp:
+            self.objects[Bucket, Key] = fp.read()
+
+    def download_file(self, Bucket, Key, Filename):
+        with open(Filename, "wb") as fp:
+            fp.write(self._object(Bucket, Key))
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        return LocalCacheBackend(tmp_path / "cache")
+    return S3CacheBackend("bucket", client=FakeS3Client())
+
+
+def test_backend(backend, tmp_path):
+    assert not backend.exists("clips/a.json")
+    assert backend.get_bytes("clips/a.json") is None
+
+    backend.put_bytes("clips/a.json", b"0123456789")
+    path = tmp_path / "b.tif"
+    path.write_bytes(b"tiff")
+    backend.put_file("clips/b.tif", str(path))
+
+    assert backend.exists("clips/a.json")
+    assert backend.get_bytes("clips/a.json") == b"0123456789"
+    backend.get_file("clips/b.tif", str(tmp_path / "copy.tif"))
+    assert (tmp_path / "copy.tif").read_bytes() == b"tiff"
+
+
+def test_s3_paths(tmp_path):
+    client = FakeS3Client()
+    backend = S3CacheBackend("bucket", prefix="shared/", client=client)
+    link = tmp_path / "mud.tif"
+    link.write_bytes(b"tiff")
+
+    path = backend.source_path(str(link))
+
+    assert path.startswith("/vsis3/bucket/shared/sources/")
+    assert path.endswith("/mud.tif")
+    assert list(client.objects.values()) == [b"tiff"]
+    assert backend.gdal_options() == {}
+
+    backend = S3CacheBackend("bucket", client=client, endpoint_url="https://s3.local")
+    assert backend.gdal_options() == {
+        "AWS_S3_ENDPOINT": "s3.local",
+        "AWS_HTTPS": "YES",
+        "AWS_VIRTUAL_HOSTING": "FALSE",
+    }
+
+
+def test_local_publish_is_atomic(tmp_path):
+    backend = LocalCacheBackend(tmp_path / "cache")
+    with pytest.raises(FileNotFoundError):
+        backend.put_file("sources/a/mud.tif", str(tmp_path / "missing.tif"))
+
+    assert not backend.exists("sources/a/mud.tif")
+    assert os.listdir(tmp_path / "cache" / "sources" / "a") == []
+
+
+@pytest.mark.parametrize("cog", [None, "deflate"])
+def test_get_data_shares_clips(local_services, tmp_path, monkeypatch, cog):
+    cache = LocalCacheBackend(tmp_path / "cache")
+    first = DbSeabed(cache=cache)
+    expected = first.get_data(
+        "mud", *BBOX, output=os.path.join(tmp_path, "first.tif"), cog=cog
+    )
+    assert "cached" not in first.metadata
+    assert len(os.listdir(tmp_path / "cache" / "sources")) == 1
+
+    # another worker, which must not fetch or read the sources again
+    monkeypatch.setattr(
+        "bmi_dbseabed.cache._fetch", lambda *args: pytest.fail("source fetched")
+    )
+    monkeypatch.setattr(
+        DbSeabed, "_clip_memory", lambda *args: pytest.fail("clip read again")
+    )
+    second = DbSeabed(cache=cache)
+    dataset = second.get_data(
+        "mud", *BBOX, output=os.path.join(tmp_path, "second.tif"), cog=cog
+    )
+
+    numpy.testing.assert_array_equal(dataset.values, expected.values)
+    assert second.metadata["cached"] is True
+    assert second.tif_file == os.path.join(tmp_path, "second.tif")
+    assert second.metadata.get("cog") == first.metadata.get("cog")
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError, match="abstract"):
+        CacheBackend()
+
+
+class _ObjectFiles(dict):
+    # objects also written as files, for the endpoint process to serve
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+
+    def __setitem__(self, bucket_key, data):
+        path = os.path.join(self.root, *bucket_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(data)
+        super().__setitem__(bucket_key, data)
+
+
+def _serve_objects(root, ports, requests):
+    # S3 endpoint of the objects under root, with path-style addressing and
+    # range requests, which ignores signatures
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            key = unquote(self.path.split("?")[0]).lstrip("/")
+            requests.put(key)
+            path = os.path.join(root, *key.split("/"))
+            if not os.path.isfile(path):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            with open(path, "rb") as fp:
+                data = fp.read()
+            size = len(data)
+            ranges = self.headers.get("Range")
+            if ranges:
+                start, stop = ranges.removeprefix("bytes=").split("-")
+                start, stop = int(start), min(int(stop or size - 1), size - 1)
+                data = data[start : stop + 1]
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{stop}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+@pytest.fixture
+def s3_endpoint(tmp_path, monkeypatch):
+    """S3 stand-in client and the URL of an endpoint serving its objects."""
+    client = FakeS3Client()
+    client.objects = _ObjectFiles(str(tmp_path / "objects"))
+    # GDAL holds the GIL while it waits for a response, so the endpoint runs
+    # in another process
+    context = multiprocessing.get_context("spawn")
+    ports, requests = context.Queue(), context.Queue()
+    process = context.Process(
+        target=_serve_objects,
+        args=(client.objects.root, ports, requests),
+        daemon=True,
+    )
+    process.start()
+    # GDAL signs the requests, which the endpoint does not check
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "key")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    yield client, f"http://127.0.0.1:{ports.get(timeout=60)}", requests
+    process.terminate()
+    process.join()
+
+
+def test_get_data_s3_endpoint(local_services, tmp_path, s3_endpoint):
+    client, endpoint_url, requests = s3_endpoint
+    backend = S3CacheBackend(
+        "bucket", prefix=tmp_path.name, client=client, endpoint_url=endpoint_url
+    )
+    expected = DbSeabed().get_data(
+        "mud", *BBOX, output=os.path.join(tmp_path, "expected.tif")
+    )
+
+    dbseabed = DbSeabed(cache=backend)
+    dataset = dbseabed.get_data("mud", *BBOX, output=os.path.join(tmp_path, "mud.tif"))
+
+    numpy.testing.assert_array_equal(dataset.values, expected.values)
+    # the source is read back from the store of the endpoint
+    keys = []
+    while True:
+        try:
+            keys.append(requests.get(timeout=1))
+        except queue.Empty:
+            break
+    assert any(
+        key.startswith(f"bucket/{tmp_path.name}/sources/") and key.endswith("/mud.tif")
+        for key in keys
+    )
+    assert dbseabed.zonal_stats("mud", [BBOX])[0]["count"] > 0
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import os
+import subprocess
+import sys
 
 import pytest
 from bmi_dbseabed.cli import main
@@ -72,3 +74,125 @@ def test_data_download(cli_runner, tmpdir):
 
         assert result.exit_code == 0
         assert len(os.listdir(tmpdir)) == 1
+
+
+def test_expr_and_var_name(cli_runner):
+    result = cli_runner.invoke(
+        main,
+        [
+            "--var_name=carbonate",
+            "--expr=sand - mud",
+            "--bbox=-66.8,18,-66.2,18.4",
+            "test.tif",
+        ],
+    )
+    assert result.exit_code != 0
+
+
+def test_expr(cli_runner, local_services, tmpdir):
+    with tmpdir.as_cwd():
+        result = cli_runner.invoke(
+            main,
+            [
+                "--expr=sand - mud",
+                "--bbox=-98,18,-80,31",
+                "test.tif",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert os.path.isfile("test.tif")
+
+
+def test_timings(cli_runner, local_services, tmpdir):
+    with tmpdir.as_cwd():
+        result = cli_runner.invoke(
+            main,
+            [
+                "--var_name=carbonate",
+                "--bbox=-98,18,-80,31",
+                "--timings",
+                "test.tif",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert "write" in result.output
+        assert "total" in result.output
+        assert "process peak RSS" in result.output
+
+
+def test_dry_run(cli_runner, local_services, tmpdir):
+    with tmpdir.as_cwd():
+        result = cli_runner.invoke(
+            main,
+            [
+                "--var_name=carbonate",
+                "--bbox=-98,18,-80,31",
+                "--memory_budget=0.01",
+                "--dry_run",
+                "test.tif",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert "strategy: tiles" in result.output
+        assert not os.path.exists("test.tif")
+
+
+def test_cog(cli_runner, local_services, tmpdir):
+    with tmpdir.as_cwd():
+        result = cli_runner.invoke(
+            main,
+            ["--var_name=carbonate", "--bbox=-98,18,-80,31", "--cog=zstd", "test.tif"],
+        )
+
+        assert result.exit_code == 0
+        assert "cog: zstd" in result.output
+        assert "MB/s" in result.output
+
+
+def test_fill(cli_runner, local_services, tmpdir):
+    with tmpdir.as_cwd():
+        result = cli_runner.invoke(
+            main,
+            ["--var_name=carbonate", "--bbox=-96,20,-84,29", "--fill=idw", "test.tif"],
+        )
+
+        assert result.exit_code == 0
+        assert "fill: idw" in result.output
+        assert "no-data cells filled" in result.output
+
+        result = cli_runner.invoke(
+            main,
+            [
+                "--var_name=carbonate",
+                "--bbox=-96,20,-84,29",
+                "--fill=nearest",
+                "--fill_distance=1",
+                "test1.tif",
+            ],
+        )
+        assert result.exit_code == 0
+        assert "left beyond the fill distance" in result.output
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import bmi_dbseabed; bmi_dbseabed.DbSeabed().data_services",
+        "from bmi_dbseabed.cli import main; main(['--help'])",
+        "from bmi_dbseabed.cli import main; main(['--version'])",
+    ],
+)
+def test_startup_imports(code):
+    # heavy dependencies must only be imported when a raster is touched
+    heavy = ["bmipy", "numpy", "rasterio", "rioxarray", "xarray", "yaml"]
+    check = (
+        f"import sys\ntry:\n    {code}\nexcept SystemExit:\n    pass\n"
+        f"print(sorted(set({heavy!r}) & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.cog import format_report
+from bmi_dbseabed.cog import write_cog
+
+from .conftest import synthetic_values
+from .conftest import write_synthetic_tif
+
+BBOX = (-96, 20, -84, 29)
+
+
+@pytest.mark.parametrize("compress", ["deflate", "zstd", "lzw"])
+def test_write_cog(tmp_path, compress):
+    values = synthetic_values(0)
+    path = write_synthetic_tif(tmp_path / "values.tif", values)
+    output = str(tmp_path / "cog.tif")
+
+    report = write_cog(path, output, compress=compress, blocksize=16)
+
+    with rasterio.open(output) as src:
+        assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+        assert src.tags(ns="IMAGE_STRUCTURE")["PREDICTOR"] == "3"
+        assert src.compression.value.lower() == compress
+        assert src.block_shapes == [(16, 16)]
+        assert src.overviews(1) == [2, 4, 8]
+        numpy.testing.assert_array_equal(src.read(1), values)
+    assert report.raw_bytes == values.nbytes
+    assert report.file_bytes == os.path.getsize(output)
+    assert report.ratio == pytest.approx(report.raw_bytes / report.file_bytes)
+    assert compress in format_report(report)
+
+
+def test_write_cog_invalid_codec(tmp_path):
+    path = write_synthetic_tif(tmp_path / "values.tif", synthetic_values(0))
+    with pytest.raises(ValueError, match="compress"):
+        write_cog(path, compress="jpeg")
+
+
+@pytest.mark.parametrize("memory_budget", [None, 4096])
+def test_get_data_cog(local_services, tmp_path, memory_budget):
+    expected = DbSeabed().get_data(
+        "mud", *BBOX, output=os.path.join(tmp_path, "expected.tif")
+    )
+
+    dbseabed = DbSeabed()
+    dataset = dbseabed.get_data(
+        "mud",
+        *BBOX,
+        output=os.path.join(tmp_path, "cog.tif"),
+        memory_budget=memory_budget,
+        cog="zstd",
+    )
+
+    numpy.testing.assert_array_equal(dataset.values, expected.values)
+    assert dbseabed.metadata["cog"]["compress"] == "zstd"
+    assert "cog" in dbseabed.metadata["phases"]
+    for path in dbseabed.metadata.get("tiles", [dbseabed.tif_file]):
+        with rasterio.open(path) as src:
+            assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+
+
+def test_get_data_invalid_cog(local_services, tmp_path):
+    with pytest.raises(ValueError, match="cog"):
+        DbSeabed().get_data(
+            "mud", *BBOX, output=os.path.join(tmp_path, "cog.tif"), cog="jpeg"
+        )
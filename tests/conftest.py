@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from rasterio.transform import from_origin
+
+# synthetic rasters cover the Gulf of Mexico bounding box at 0.25 degree
+WEST, SOUTH, EAST, NORTH = -98.0, 18.0, -80.0, 31.0
+RES = 0.25
+NODATA = -9999.0
+
+
+def synthetic_values(seed, shape=(52, 72)):
+    """Random percent values with a block of no-data cells standing in for land."""
+    values = numpy.random.default_rng(seed).uniform(0, 100, shape).astype("float32")
+    values[: shape[0] // 4, : shape[1] // 3] = NODATA
+    return values
+
+
+def write_synthetic_tif(path, values, blocksize=16):
+    profile = {
+        "driver": "GTiff",
+        "width": values.shape[1],
+        "height": values.shape[0],
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:4326",
+        "transform": from_origin(WEST, NORTH, RES, RES),
+        "nodata": NODATA,
+        "tiled": True,
+        "blockxsize": blocksize,
+        "blockysize": blocksize,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(values, 1)
+    return str(path)
+
+
+@pytest.fixture
+def local_services(tmp_path, monkeypatch):
+    """Point every DATA_SERVICES link to a synthetic local GeoTIFF."""
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    arrays = {}
+    for seed, var_name in enumerate(DbSeabed.DATA_SERVICES):
+        arrays[var_name] = synthetic_values(seed)
+        link = write_synthetic_tif(source_dir / f"{var_name}.tif", arrays[var_name])
+        monkeypatch.setitem(DbSeabed.DATA_SERVICES[var_name], "link", link)
+    return arrays
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import pickle
 
 import pytest
 import xarray
@@ -114,3 +115,43 @@ def test_load_local_file(tmpdir, dbseabed_instance):
     file2_info = os.path.getmtime(os.path.join(tmpdir, "test.tif"))
 
     assert file1_info == file2_info
+
+
+def test_get_data_phases(local_services, tmpdir):
+    phases = []
+    dbseabed = DbSeabed(metrics_callback=phases.append, trace_memory=True)
+    dbseabed.get_data(
+        "carbonate",
+        west=-98,
+        south=18.0,
+        east=-80,
+        north=31,
+        output=os.path.join(tmpdir, "test.tif"),
+    )
+
+    assert [phase.name for phase in phases] == ["open", "clip", "read", "write"]
+    assert list(dbseabed.metadata["phases"]) == ["open", "clip", "read", "write"]
+    assert all(phase.seconds >= 0 for phase in phases)
+    assert phases[2].peak_memory > 0
+    assert phases[2].process_peak_rss > 0
+
+    dbseabed = DbSeabed()
+    dbseabed.get_data(
+        "carbonate", -98, 18, -80, 31, output=os.path.join(tmpdir, "test.tif")
+    )
+    assert dbseabed.metadata["phases"]["read"]["peak_memory"] is None
+
+
+def test_pickle(local_services, tmpdir):
+    dbseabed = DbSeabed(cache_dir=str(tmpdir))
+    dbseabed.get_data("mud", -96, 20, -84, 29, os.path.join(tmpdir, "mud.tif"))
+    dbseabed.build_index("mud")
+
+    data = pickle.dumps(dbseabed)
+    assert len(data) < 4096
+    restored = pickle.loads(data)
+    assert restored.tif_file == dbseabed.tif_file
+    assert restored.metadata == dbseabed.metadata
+    assert restored._indexes == {}
+    # the index is reloaded from the cache directory
+    assert restored.summary("mud") == dbseabed.summary("mud")
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import pytest
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed import DbSeabedEngine
+from bmi_dbseabed.engine import DatasetPool
+from bmi_dbseabed.engine import MosaicCache
+from bmi_dbseabed.engine import SingleFlight
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(flight.do, "key", fail)
+        started.wait()
+        second = executor.submit(flight.do, "key", fail)
+        for future in (first, second):
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+
+def test_mosaic_cache_is_bounded(monkeypatch):
+    built = []
+
+    def build(links):
+        built.append(tuple(links))
+        return "|".join(links)
+
+    monkeypatch.setattr("bmi_dbseabed.engine.mosaic_source", build)
+    mosaics = MosaicCache(max_size=2)
+    for links in (["a", "b"], ["c", "d"], ["a", "b"], ["e", "f"], ["a", "b"]):
+        assert mosaics.get(links) == "|".join(links)
+
+    # ("c", "d") is the least recently used when ("e", "f") is added
+    assert len(mosaics) == 2
+    assert built == [("a", "b"), ("c", "d"), ("e", "f")]
+    mosaics.get(["c", "d"])
+    assert built[-1] == ("c", "d")
+
+
+def test_get_data(local_services, tmp_path):
+    expected = DbSeabed().get_data(
+        "mud", -96, 20, -84, 29, os.path.join(tmp_path, "expected.tif")
+    )
+    with DbSeabedEngine() as engine:
+        result = engine.get_data(
+            "mud", -96, 20, -84, 29, os.path.join(tmp_path, "engine.tif")
+        )
+        engine.get_data("mud", -96, 20, -84, 29, os.path.join(tmp_path, "again.tif"))
+
+        numpy.testing.assert_array_equal(result.dataset.values, expected.values)
+        numpy.testing.assert_allclose(result.dataset.x.values, expected.x.values)
+        assert result.tif_file == os.path.join(tmp_path, "engine.tif")
+        assert result.metadata["variable_name"] == "mud"
+        assert result.metadata["coalesced"] is False
+        assert engine.stats["handles_opened"] == 1
+        assert engine.stats["handles_reused"] == 1
+
+
+def test_get_data_coalesces(local_services, tmp_path, monkeypatch):
+    engine = DbSeabedEngine()
+    clip = engine._clip
+
+    def slow_clip(*args):
+        time.sleep(0.2)
+        return clip(*args)
+
+    monkeypatch.setattr(engine, "_clip", slow_clip)
+
+    def request(index):
+        # half of the requests are identical, the others share only the clip
+        output = os.path.join(tmp_path, f"sand_{index % 2}.tif")
+        return engine.get_data("sand", -96, 20, -84, 29, output)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(request, range(8)))
+
+    assert engine.stats["requests"] == 8
+    assert engine.stats["clips"] == 1
+    assert engine.stats["coalesced"] == 7
+    for result in results:
+        numpy.testing.assert_array_equal(
+            result.dataset.values, results[0].dataset.values
+        )
+    engine.close()
+
+
+def test_dataset_pool_after_fork(local_services):
+    link = DbSeabed.DATA_SERVICES["mud"]["link"]
+    pool = DatasetPool()
+    with pool.acquire(link) as src:
+        inherited = src
+    assert pool._idle[link] == [inherited]
+
+    # as seen from a forked process
+    pool._pid = -1
+    with pool.acquire(link) as src:
+        assert src is not inherited
+    assert pool.opened == 2
+    assert pool._idle[link] == [src]
+    pool.close()
+    inherited.close()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.expression import Expression
+
+VAR_NAMES = list(DbSeabed.DATA_SERVICES)
+
+
+@pytest.mark.parametrize(
+    "text", ["sand -", "os.system('ls')", "sand.real", "error * 2", "sqrt(sand, 2)"]
+)
+def test_invalid_expression(text):
+    with pytest.raises(ValueError, match="Please provide a valid expression"):
+        Expression(text, VAR_NAMES)
+
+
+def test_expression_variables():
+    expr = Expression("carbonate * (1 - rock / 100) + carbonate", VAR_NAMES)
+    assert expr.variables == ("carbonate", "rock")
+
+
+def test_expression_does_not_modify_inputs():
+    sand = numpy.array([10.0, 20.0])
+    mud = numpy.array([1.0, 4.0])
+    result = Expression("-(sand - mud) * 2 + sqrt(mud)", VAR_NAMES).evaluate(
+        {"sand": sand, "mud": mud}
+    )
+
+    numpy.testing.assert_allclose(result, [-17.0, -30.0])
+    numpy.testing.assert_array_equal(sand, [10.0, 20.0])
+    numpy.testing.assert_array_equal(mud, [1.0, 4.0])
+
+
+def test_evaluate(local_services, tmp_path):
+    output = os.path.join(tmp_path, "result.tif")
+    data = DbSeabed().evaluate(
+        "carbonate * (1 - rock / 100) / carbonate_totlsu",
+        west=-96.1,
+        south=20.2,
+        east=-84.3,
+        north=29.9,
+        output=output,
+    )
+    expected = DbSeabed().get_data(
+        "carbonate",
+        west=-96.1,
+        south=20.2,
+        east=-84.3,
+        north=29.9,
+        output=os.path.join(tmp_path, "carbonate.tif"),
+    )
+    rock = DbSeabed().get_data(
+        "rock",
+        west=-96.1,
+        south=20.2,
+        east=-84.3,
+        north=29.9,
+        output=os.path.join(tmp_path, "rock.tif"),
+    )
+    uncertainty = DbSeabed().get_data(
+        "carbonate_totlsu",
+        west=-96.1,
+        south=20.2,
+        east=-84.3,
+        north=29.9,
+        output=os.path.join(tmp_path, "uncertainty.tif"),
+    )
+
+    assert data.shape == expected.shape
+    numpy.testing.assert_array_equal(data.x.values, expected.x.values)
+    numpy.testing.assert_array_equal(data.y.values, expected.y.values)
+    numpy.testing.assert_allclose(
+        data.values,
+        expected.values * (1 - rock.values / 100) / uncertainty.values,
+        rtol=1e-5,
+    )
+
+
+def test_evaluate_release(local_services, tmp_path, monkeypatch):
+    # the 2020 release of sand is a copy of mud
+    mud = DbSeabed.DATA_SERVICES["mud"]["link"]
+    monkeypatch.setitem(DbSeabed.DATA_SERVICES["sand"], "releases", {2020: mud})
+    monkeypatch.setitem(DbSeabed.DATA_SERVICES["mud"], "releases", {2020: mud})
+
+    dbseabed = DbSeabed()
+    data = dbseabed.evaluate(
+        "sand - mud", -96, 20, -84, 29, os.path.join(tmp_path, "r.tif"), release=2020
+    )
+    values = data.values[~numpy.isnan(data.values)]
+    assert values.size and (values == 0).all()
+    assert dbseabed.metadata["service_url"] == [mud, mud]
+
+    with pytest.raises(ValueError, match="Please provide a valid release"):
+        dbseabed.evaluate(
+            "sand - rock", -96, 20, -84, 29, os.path.join(tmp_path, "r.tif"), 2020
+        )
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [("sand * 2 ** -1", [2.0, 4.0]), ("sand ** -1 * 8", [2.0, 1.0]), ("-2", -2.0)],
+)
+def test_expression_constants(text, expected):
+    sand = numpy.array([4.0, 8.0], dtype="float32")
+    result = Expression(text, VAR_NAMES).evaluate({"sand": sand})
+
+    numpy.testing.assert_array_equal(result, expected)
+    if not isinstance(result, float):
+        assert result.dtype == numpy.float32
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.blockcache import BlockCache
+from bmi_dbseabed.gapfill import GapFiller
+
+
+def _gappy(seed=0, shape=(60, 70)):
+    rng = numpy.random.default_rng(seed)
+    values = rng.uniform(0, 100, shape).astype("float32")
+    values[rng.uniform(size=shape) < 0.3] = numpy.nan
+    values[10:30, 5:25] = numpy.nan
+    return values
+
+
+def _brute_force(values, max_distance, method, power=2.0):
+    # reference fill visiting every valid cell of every no-data cell
+    filled = values.astype("float64")
+    valid_rows, valid_cols = numpy.nonzero(~numpy.isnan(values))
+    for row, col in zip(*numpy.nonzero(numpy.isnan(values))):
+        distance = numpy.hypot(valid_rows - row, valid_cols - col)
+        near = distance <= max_distance
+        if not near.any():
+            continue
+        neighbours = values[valid_rows[near], valid_cols[near]]
+        if method == "nearest":
+            filled[row, col] = neighbours[numpy.argmin(distance[near])]
+        else:
+            weights = distance[near] ** -power
+            filled[row, col] = (weights * neighbours).sum() / weights.sum()
+    return filled
+
+
+@pytest.mark.parametrize("method", ["nearest", "idw"])
+def test_fill(method):
+    values = _gappy()
+    filled, report = GapFiller(method, max_distance=4).fill(values)
+
+    expected = _brute_force(values, 4, method)
+    valid = ~numpy.isnan(values)
+    numpy.testing.assert_array_equal(filled[valid], values[valid])
+    numpy.testing.assert_allclose(filled, expected, rtol=1e-5, equal_nan=True)
+    assert filled.dtype == values.dtype
+    assert report.method == method
+    assert report.missing == numpy.isnan(values).sum()
+    # the center of the 20 x 20 gap is more than 4 cells from valid cells
+    assert numpy.isnan(filled[20, 15])
+    assert report.filled == report.missing - numpy.isnan(filled).sum() > 0
+    assert report.remaining == numpy.isnan(filled).sum() > 0
+
+
+@pytest.mark.parametrize("method", ["nearest", "idw"])
+def test_fill_blocks(method):
+    values = _gappy(seed=1)
+    expected, _ = GapFiller(method, max_distance=5, block_size=1000).fill(values)
+    filled, report = GapFiller(method, max_distance=5, block_size=16, workers=4).fill(
+        values
+    )
+
+    numpy.testing.assert_array_equal(filled, expected)
+    assert report.blocks == 4 * 5
+
+
+def test_fill_far_gaps():
+    values = numpy.full((40, 40), numpy.nan, dtype="float32")
+    values[0, 0] = 1.0
+    filled, report = GapFiller("idw", max_distance=3, block_size=8).fill(values)
+
+    # blocks without valid cells within the distance are left as they are
+    assert report.filled == numpy.count_nonzero(~numpy.isnan(filled)) - 1 == 10
+    assert numpy.isnan(filled[8:, 8:]).all()
+
+
+def test_invalid_fill():
+    with pytest.raises(ValueError, match="Please provide a valid fill method"):
+        GapFiller("linear")
+    with pytest.raises(ValueError, match="Please provide a max distance"):
+        GapFiller(max_distance=0)
+    with pytest.raises(ValueError, match="Please provide a 2D float array"):
+        GapFiller().fill(numpy.zeros((3, 3), dtype="int32"))
+
+
+def test_get_data(local_services, tmp_path):
+    expected = DbSeabed().get_data(
+        "mud", -98, 18, -80, 31, os.path.join(tmp_path, "expected.tif")
+    )
+    dbseabed = DbSeabed()
+    output = os.path.join(tmp_path, "filled.tif")
+    dataset = dbseabed.get_data("mud", -98, 18, -80, 31, output, fill="nearest")
+
+    values, _ = GapFiller("nearest").fill(expected[0].values)
+    numpy.testing.assert_array_equal(dataset[0].values, values)
+    with rasterio.open(output) as src:
+        numpy.testing.assert_array_equal(
+            src.read(1, masked=True).filled(numpy.nan), values
+        )
+    report = dbseabed.metadata["fill"]
+    assert report["method"] == "nearest"
+    assert report["missing"] == numpy.isnan(expected.values).sum()
+    assert report["filled"] > 0
+    assert "fill" in dbseabed.metadata["phases"]
+
+    with pytest.raises(ValueError, match="either a memory budget or a fill"):
+        dbseabed.get_data(
+            "mud", -98, 18, -80, 31, output, memory_budget=1e6, fill="idw"
+        )
+
+
+@pytest.mark.parametrize("block_cache", [False, True])
+def test_get_data_halo(local_services, tmp_path, block_cache):
+    cache = BlockCache(1024**2) if block_cache else None
+    dbseabed = DbSeabed(block_cache=cache)
+    filler = GapFiller("idw", max_distance=4)
+    large = dbseabed.get_data(
+        "mud", -98, 18, -80, 31, os.path.join(tmp_path, "large.tif"), fill=filler
+    )
+    # the edges of the small box are next to the no-data block of the corner
+    small = dbseabed.get_data(
+        "mud", -94, 26, -90, 29, os.path.join(tmp_path, "small.tif"), fill=filler
+    )
+
+    # rows 8 to 19 and columns 16 to 31 of the grid
+    expected = large[0].values[8:20, 16:32]
+    numpy.testing.assert_array_equal(small[0].values, expected)
+    assert dbseabed.metadata["fill"]["missing"] == numpy.count_nonzero(
+        local_services["mud"][8:20, 16:32] == -9999
+    )
+
+
+def test_fill_halo():
+    values = numpy.full((3, 5), numpy.nan)
+    values[1, 0], values[1, 4] = 1.0, 4.0
+    # the cells of the margin are neighbours, but are not filled
+    filled, report = GapFiller("nearest", max_distance=1).fill(values, halo=1)
+    numpy.testing.assert_array_equal(filled, [[1.0, numpy.nan, 4.0]])
+    assert (report.missing, report.filled, report.remaining) == (3, 2, 1)
+
+    # a margin wider than the distance gives the same cells
+    wide = numpy.pad(values, 2, constant_values=7.0)
+    assert numpy.array_equal(
+        GapFiller("nearest", max_distance=1).fill(wide, halo=3)[0],
+        filled,
+        equal_nan=True,
+    )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import os
+
+import numpy
+import pytest
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.geometry import load_geometry
+
+TRIANGLE = {
+    "type": "Polygon",
+    "coordinates": [[(-95, 20), (-85, 20), (-85, 29), (-95, 20)]],
+}
+
+
+def test_invalid_geometry(tmp_path):
+    with pytest.raises(ValueError, match="Please provide a valid GeoJSON polygon"):
+        load_geometry({"type": "Point", "coordinates": (-90, 25)})
+    with pytest.raises(ValueError, match="Please provide a valid geometry file path"):
+        load_geometry(os.path.join(tmp_path, "missing.geojson"))
+
+
+def test_get_data_geometry(local_services, tmp_path):
+    geojson = os.path.join(tmp_path, "zone.geojson")
+    with open(geojson, "w") as fp:
+        json.dump({"type": "Feature", "geometry": TRIANGLE, "properties": {}}, fp)
+
+    dbseabed = DbSeabed()
+    data = dbseabed.get_data(
+        "sand", output=os.path.join(tmp_path, "sand.tif"), geometry=geojson
+    )
+    box = dbseabed.get_data(
+        "sand",
+        west=-95,
+        south=20,
+        east=-85,
+        north=29,
+        output=os.path.join(tmp_path, "box.tif"),
+    )
+
+    assert data.shape == box.shape
+    assert dbseabed.metadata["grid_bounding_box"] == [-95.0, 20.0, -85.0, 29.0]
+
+    # cells with centers below the diagonal keep their values, others are masked
+    x, y = numpy.meshgrid(data.x.values, data.y.values)
+    inside = (y - 20) < (x + 95) * 0.9
+    numpy.testing.assert_array_equal(data.values[0][inside], box.values[0][inside])
+    assert numpy.isnan(data.values[0][~inside]).all()
+
+    # the burn mask is reused for another variable on the same grid
+    mask = next(iter(dbseabed._burn_masks.values()))
+    dbseabed.get_data(
+        "mud", output=os.path.join(tmp_path, "mud.tif"), geometry=TRIANGLE
+    )
+    assert next(iter(dbseabed._burn_masks.values())) is mask
+
+
+def test_load_shapefile(tmp_path):
+    fiona = pytest.importorskip("fiona")
+
+    path = os.path.join(tmp_path, "zone.shp")
+    schema = {"geometry": "Polygon", "properties": {"id": "int"}}
+    with fiona.open(
+        path, "w", driver="ESRI Shapefile", schema=schema, crs="EPSG:3857"
+    ) as dst:
+        dst.write(
+            {
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[(0, 0), (1e5, 0), (1e5, 1e5), (0, 0)]],
+                },
+                "properties": {"id": 1},
+            }
+        )
+
+    (geometry,) = load_geometry(path)
+    ring = numpy.array(geometry["coordinates"][0])
+    assert ring[:, 0].max() == pytest.approx(0.898315, abs=1e-5)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.mosaic import build_vrt
+from bmi_dbseabed.service import QueryService
+from bmi_dbseabed.stencils import apply
+from bmi_dbseabed.stencils import roughness
+from rasterio.transform import from_origin
+
+from .conftest import NODATA
+from .conftest import NORTH
+from .conftest import RES
+from .conftest import WEST
+
+
+@pytest.fixture
+def sand_tiles(local_services, tmp_path, monkeypatch):
+    """Split the synthetic sand raster into four tiles."""
+    values = local_services["sand"]
+    rows, cols = values.shape[0] // 2, values.shape[1] // 2
+    tiles = []
+    for row in (0, rows):
+        for col in (0, cols):
+            west, north = WEST + col * RES, NORTH - row * RES
+            path = os.path.join(tmp_path, f"sand_{row}_{col}.tif")
+            profile = {
+                "driver": "GTiff",
+                "width": cols,
+                "height": rows,
+                "count": 1,
+                "dtype": "float32",
+                "crs": "EPSG:4326",
+                "transform": from_origin(west, north, RES, RES),
+                "nodata": NODATA,
+            }
+            with rasterio.open(path, "w", **profile) as dst:
+                dst.write(values[row : row + rows, col : col + cols], 1)
+            tiles.append(
+                {
+                    "link": path,
+                    "bounds": [west, north - rows * RES, west + cols * RES, north],
+                }
+            )
+    # a tile far from the requests, which must never be opened
+    tiles.append(
+        {"link": os.path.join(tmp_path, "missing.tif"), "bounds": [0, 0, 1, 1]}
+    )
+
+    expected = DbSeabed().get_data(
+        "sand", -96, 19, -84, 23.5, os.path.join(tmp_path, "single.tif")
+    )
+    monkeypatch.delitem(DbSeabed.DATA_SERVICES["sand"], "link")
+    monkeypatch.setitem(DbSeabed.DATA_SERVICES["sand"], "tiles", tiles)
+    return expected
+
+
+def test_get_links(sand_tiles):
+    assert len(DbSeabed.get_links("sand", -96, 19, -84, 23.5)) == 2
+    assert len(DbSeabed.get_links("sand")) == 5
+    with pytest.raises(ValueError, match="No data found"):
+        DbSeabed.get_links("sand", 50, 0, 60, 10)
+
+
+def test_get_data_mosaic(sand_tiles, tmp_path):
+    dbseabed = DbSeabed()
+    dataset = dbseabed.get_data(
+        "sand", -96, 19, -84, 23.5, os.path.join(tmp_path, "mosaic.tif")
+    )
+
+    assert len(dbseabed.metadata["service_url"]) == 2
+    numpy.testing.assert_array_equal(dataset.values, sand_tiles.values)
+    numpy.testing.assert_allclose(dataset.x.values, sand_tiles.x.values)
+    numpy.testing.assert_allclose(dataset.y.values, sand_tiles.y.values)
+
+
+def test_build_vrt_misaligned(sand_tiles, tmp_path):
+    links = DbSeabed.get_links("sand", -96, 19, -84, 23.5)
+    with rasterio.open(links[0]) as src:
+        profile = {
+            **src.profile,
+            "transform": src.transform * src.transform.translation(0.5, 0),
+        }
+        values = src.read()
+    shifted = os.path.join(tmp_path, "shifted.tif")
+    with rasterio.open(shifted, "w", **profile) as dst:
+        dst.write(values)
+
+    with pytest.raises(ValueError, match="not aligned"):
+        build_vrt([links[1], shifted])
+
+
+def test_sample_mosaic(sand_tiles, local_services):
+    pytest.importorskip("pyarrow")
+    values = numpy.where(
+        local_services["sand"] == NODATA, numpy.nan, local_services["sand"]
+    )
+
+    # the first point is on the west and north edges of the south east tile
+    batch = DbSeabed().sample("sand", [(-89.0, 24.5), (-90.1, 25.1)])
+    numpy.testing.assert_array_equal(
+        batch.column("sand").to_numpy(), [values[26, 36], values[23, 31]]
+    )
+    batch = DbSeabed().sample("sand", [(50.0, 50.0)])
+    assert numpy.isnan(batch.column("sand").to_numpy()).all()
+
+
+def test_zonal_stats_mosaic(sand_tiles):
+    stats = DbSeabed().zonal_stats("sand", [(-97, 19, -90, 30), (50, 50, 51, 51)])
+    assert stats[0]["count"] > 0
+    assert stats[1]["count"] == 0
+
+
+def test_query_service_mosaic(sand_tiles, local_services):
+    service = QueryService(cache_bytes=1024**2)
+    try:
+        metadata = service.metadata("sand")
+        assert len(metadata["service_url"]) == 5
+        assert metadata["grid_res"] == [RES, RES]
+        assert service.sample("sand", [(-89.0, 24.5)]) == [
+            pytest.approx(float(local_services["sand"][26, 36]))
+        ]
+    finally:
+        service.close()
+
+
+def test_get_stencil_mosaic(sand_tiles, local_services, tmp_path):
+    values = numpy.where(
+        local_services["sand"] == NODATA, numpy.nan, local_services["sand"]
+    )
+    whole = apply(roughness(2), values, (RES, RES))
+
+    # the halo of the clip within the south west tile is in the tiles to its
+    # north and east
+    dataset = DbSeabed().get_stencil(
+        "sand",
+        "roughness",
+        -96,
+        19,
+        -89.25,
+        24,
+        os.path.join(tmp_path, "roughness.tif"),
+        radius=2,
+    )
+    numpy.testing.assert_array_equal(dataset[0].values, whole[28:48, 8:35])
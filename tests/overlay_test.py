@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import numpy
+import pytest
+from bmi_dbseabed.overlay import SparseOverlay
+
+
+@pytest.fixture
+def base():
+    values = numpy.arange(12, dtype="float32").reshape(3, 4)
+    values[0, 0] = numpy.nan
+    return values
+
+
+def test_set_at_indices(base):
+    overlay = SparseOverlay(base)
+    overlay.set_at_indices([5, 2, 5], [50.0, 20.0, 55.0])
+    overlay.set_at_indices([2], 21.0)
+
+    expected = base.reshape(-1).copy()
+    expected[[2, 5]] = [21.0, 55.0]
+    numpy.testing.assert_array_equal(overlay.fill(numpy.empty(12, "float32")), expected)
+    numpy.testing.assert_array_equal(
+        overlay.take([5, 0, 2, 11], numpy.empty(4, "float32")),
+        expected[[5, 0, 2, 11]],
+    )
+    assert overlay.size == 2
+    assert overlay.nbytes == 2 * (8 + 4)
+
+
+def test_set_keeps_changed_cells(base):
+    overlay = SparseOverlay(base)
+    values = base.copy()
+    values[1, 1] = -1.0
+    overlay.set(values)
+
+    assert overlay.size == 1
+    numpy.testing.assert_array_equal(overlay.merged(), values)
+
+    with pytest.raises(ValueError, match="does not match"):
+        overlay.set(numpy.zeros(5))
+
+
+def test_merged_is_base_without_edits(base):
+    overlay = SparseOverlay(base)
+    assert overlay.merged() is base
+
+    overlay.set_at_indices([3], 0.0)
+    assert overlay.merged() is overlay.merged()
+    assert overlay.merged()[0, 3] == 0.0
+    assert base[0, 3] == 3.0
+
+
+def test_out_of_grid(base):
+    with pytest.raises(IndexError):
+        SparseOverlay(base).set_at_indices([12], 0.0)
+
+
+def test_materialize(base):
+    overlay = SparseOverlay(base)
+    overlay.set_at_indices([3], 30.0)
+    field = overlay.materialize()
+    field[1, 1] = -1.0
+
+    assert overlay.materialize() is overlay.merged() is field
+    assert base[1, 1] == 5.0
+    numpy.testing.assert_array_equal(overlay.edits()[0], [3, 5])
+    assert overlay.take([5], numpy.empty(1, "float32"))[0] == -1.0
+
+    # the base changes below the edits, in the field
+    overlay.update_base(numpy.array([0, 1]), numpy.array([3, 2]), [7.0, 8.0])
+    assert base[0, 3] == 7.0 and field[0, 3] == 30.0
+    assert field[1, 2] == 8.0 and field[1, 1] == -1.0
+    overlay.set(base)
+    assert overlay.size == 0 and overlay.merged() is field
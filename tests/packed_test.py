@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import pickle
+
+import numpy
+import pytest
+from bmi_dbseabed.overlay import SparseOverlay
+from bmi_dbseabed.packed import PackedField
+
+
+@pytest.fixture
+def coastal():
+    # a quarter of valid cells, in ragged runs along the rows
+    rng = numpy.random.default_rng(0)
+    values = rng.uniform(0, 100, (60, 80)).astype("float32")
+    rows, cols = numpy.indices(values.shape)
+    values[cols > 20 + 10 * numpy.sin(rows / 5)] = numpy.nan
+    return values
+
+
+@pytest.mark.parametrize("fraction", [None, 0.0, 1.0])
+def test_fill(coastal, fraction):
+    if fraction is not None:
+        coastal[:] = numpy.nan if fraction == 0.0 else 1.0
+    field = PackedField.pack(coastal)
+
+    assert field.shape == coastal.shape
+    assert field.values.size == numpy.count_nonzero(~numpy.isnan(coastal))
+    numpy.testing.assert_array_equal(field.to_dense(), coastal)
+    numpy.testing.assert_array_equal(
+        field.fill(numpy.empty(coastal.size, "float32")), coastal.reshape(-1)
+    )
+
+
+def test_take(coastal):
+    field = PackedField.pack(coastal)
+    inds = numpy.random.default_rng(1).integers(0, coastal.size, 500)
+
+    numpy.testing.assert_array_equal(
+        field.take(inds, numpy.empty(inds.size, "float32")), coastal.reshape(-1)[inds]
+    )
+    with pytest.raises(IndexError):
+        field.take([coastal.size], numpy.empty(1, "float32"))
+
+
+def test_size(coastal):
+    field = PackedField.pack(coastal)
+
+    valid = numpy.count_nonzero(~numpy.isnan(coastal))
+    assert field.nbytes < 0.5 * coastal.nbytes
+    assert field.nbytes == valid * 4 + field.starts.size * 8
+    assert len(pickle.dumps(field)) < 0.5 * len(pickle.dumps(coastal))
+
+
+def test_pack_requires_floats():
+    with pytest.raises(ValueError, match="float"):
+        PackedField.pack(numpy.zeros(4, dtype=int))
+
+
+def test_overlay(coastal):
+    overlay = SparseOverlay(PackedField.pack(coastal))
+    overlay.set_at_indices([0, 79], [1.0, 2.0])
+
+    expected = coastal.reshape(-1).copy()
+    expected[[0, 79]] = [1.0, 2.0]
+    numpy.testing.assert_array_equal(
+        overlay.fill(numpy.empty(coastal.size, "float32")), expected
+    )
+    numpy.testing.assert_array_equal(
+        overlay.take([0, 1, 79], numpy.empty(3, "float32")), expected[[0, 1, 79]]
+    )
+    numpy.testing.assert_array_equal(overlay.merged().reshape(-1), expected)
+
+    overlay.set(expected)
+    assert overlay.size == 2
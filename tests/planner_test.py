@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.planner import format_plan
+from bmi_dbseabed.planner import plan_clip
+from bmi_dbseabed.planner import transfer_bytes
+from rasterio.windows import Window
+
+from .conftest import synthetic_values
+from .conftest import write_synthetic_tif
+
+BBOX = (-96, 20, -84, 29)
+
+
+@pytest.mark.parametrize(
+    "memory_budget,strategy",
+    [(None, "memory"), (10**6, "memory"), (30_000, "blocks"), (4096, "tiles")],
+)
+def test_plan_clip(tmp_path, memory_budget, strategy):
+    path = write_synthetic_tif(tmp_path / "values.tif", synthetic_values(0))
+    with rasterio.open(path) as src:
+        plan = plan_clip(src, Window(0, 0, 72, 52), memory_budget)
+
+    assert plan.strategy == strategy
+    assert plan.shape == (52, 72)
+    assert plan.decoded_bytes == plan.output_bytes == 52 * 72 * 4
+    assert plan.transfer_bytes == 20 * 16 * 16 * 4
+    if strategy == "tiles":
+        assert plan.tile_shape == (16, 64)
+        assert plan.tiles == 8
+    assert memory_budget is None or plan.memory_bytes <= memory_budget
+    assert f"strategy: {strategy}" in format_plan(plan)
+
+
+def test_plan_clip_budget_too_small(tmp_path):
+    path = write_synthetic_tif(tmp_path / "values.tif", synthetic_values(0))
+    with rasterio.open(path) as src, pytest.raises(ValueError, match="at least 1024"):
+        plan_clip(src, Window(0, 0, 72, 52), memory_budget=100)
+
+
+def test_transfer_bytes_compressed(tmp_path):
+    path = str(tmp_path / "zeros.tif")
+    profile = {
+        "driver": "GTiff",
+        "width": 64,
+        "height": 64,
+        "count": 1,
+        "dtype": "float32",
+        "tiled": True,
+        "blockxsize": 16,
+        "blockysize": 16,
+        "compress": "deflate",
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(numpy.zeros((1, 64, 64), "float32"))
+
+    with rasterio.open(path) as src:
+        assert 0 < transfer_bytes(src, Window(0, 0, 20, 20)) < 4 * 16 * 16 * 4
+
+
+@pytest.mark.parametrize("memory_budget", [12_000, 4096])
+def test_get_data_memory_budget(local_services, tmp_path, memory_budget):
+    reference = DbSeabed()
+    expected = reference.get_data(
+        "mud", *BBOX, output=os.path.join(tmp_path, "expected.tif")
+    )
+
+    dbseabed = DbSeabed()
+    dataset = dbseabed.get_data(
+        "mud",
+        *BBOX,
+        output=os.path.join(tmp_path, "budget.tif"),
+        memory_budget=memory_budget,
+    )
+
+    plan = dbseabed.metadata["plan"]
+    assert plan["memory_bytes"] <= memory_budget
+    numpy.testing.assert_array_equal(dataset.values, expected.values)
+    numpy.testing.assert_allclose(dataset.x.values, expected.x.values)
+    assert (
+        dbseabed.metadata["grid_bounding_box"]
+        == reference.metadata["grid_bounding_box"]
+    )
+    if plan["strategy"] == "tiles":
+        assert dbseabed.tif_file == os.path.join(tmp_path, "budget.vrt")
+        assert len(dbseabed.metadata["tiles"]) == plan["tiles"]
+        assert all(os.path.isfile(tile) for tile in dbseabed.metadata["tiles"])
+    else:
+        assert plan["strategy"] == "blocks"
+        assert dbseabed.tif_file == os.path.join(tmp_path, "budget.tif")
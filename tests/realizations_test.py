@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+import rasterio
+import yaml
+from bmi_dbseabed import BmiDbSeabed
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.realizations import RealizationGenerator
+from rasterio.windows import Window
+
+
+def test_noise_is_seamless():
+    generator = RealizationGenerator(seed=3, correlation_length=2.0)
+    whole = generator.noise(Window(250, 250, 20, 20), realization=1)
+    part = generator.noise(Window(258, 255, 7, 12), realization=1)
+
+    numpy.testing.assert_array_equal(whole[5:17, 8:15], part)
+    assert not numpy.array_equal(
+        whole, generator.noise(Window(250, 250, 20, 20), realization=2)
+    )
+
+
+def test_noise_tiles_drawn_once(monkeypatch):
+    draws = []
+    default_rng = numpy.random.default_rng
+
+    def counting_rng(seed):
+        draws.append(tuple(seed))
+        return default_rng(seed)
+
+    monkeypatch.setattr(numpy.random, "default_rng", counting_rng)
+    generator = RealizationGenerator(seed=3, correlation_length=2.0)
+    for col in range(250, 270, 5):
+        generator.noise(Window(col, 250, 5, 20), realization=1)
+
+    # the halos of the blocks overlap the four tiles around (256, 256)
+    assert len(draws) == len(set(draws)) == 4
+
+
+def test_correlated_noise():
+    noise = RealizationGenerator(seed=0, correlation_length=3.0).noise(
+        Window(0, 0, 300, 300), realization=0
+    )
+
+    assert noise.std() == pytest.approx(1.0, abs=0.15)
+    lag = numpy.corrcoef(noise[:, :-1].reshape(-1), noise[:, 1:].reshape(-1))[0, 1]
+    assert lag > 0.9
+
+
+def test_get_realizations(local_services, tmp_path):
+    output = os.path.join(tmp_path, "realizations.tif")
+    dbseabed = DbSeabed()
+    dataset = dbseabed.get_realizations(
+        "sand", -96, 20, -84, 29, output, count=3, seed=5, correlation_length=1.5
+    )
+
+    assert dataset.shape == (3, 36, 48)
+    assert dbseabed.metadata["realizations"] == 3
+    with rasterio.open(output) as dst:
+        bands = dst.read()
+    valid = ~numpy.isnan(bands[0])
+    assert 0 < valid.sum() < valid.size
+    assert not numpy.array_equal(bands[0][valid], bands[1][valid])
+
+    # the same realizations with several workers
+    parallel = os.path.join(tmp_path, "parallel.tif")
+    dbseabed.get_realizations(
+        "sand",
+        -96,
+        20,
+        -84,
+        29,
+        parallel,
+        count=3,
+        seed=5,
+        correlation_length=1.5,
+        workers=3,
+    )
+    with rasterio.open(parallel) as dst:
+        numpy.testing.assert_array_equal(dst.read(), bands)
+
+    # the BMI presents one realization of the ensemble
+    config = os.path.join(tmp_path, "config.yaml")
+    with open(config, "w") as fp:
+        yaml.safe_dump(
+            {
+                "bmi-dbseabed": {
+                    "var_name": "sand",
+                    "west": -96,
+                    "south": 20,
+                    "east": -84,
+                    "north": 29,
+                    "output": os.path.join(tmp_path, "download.tif"),
+                    "realization": 1,
+                    "seed": 5,
+                    "correlation_length": 1.5,
+                }
+            },
+            fp,
+        )
+    model = BmiDbSeabed()
+    model.initialize(config)
+    name = model.get_output_var_names()[0]
+    numpy.testing.assert_array_equal(
+        model.get_value(name, numpy.empty(36 * 48, "float32")), bands[1].reshape(-1)
+    )
+    model.finalize()
+
+
+def test_get_realizations_without_uncertainty(tmp_path):
+    with pytest.raises(ValueError, match="uncertainty layer"):
+        DbSeabed().get_realizations(
+            "sand_totlsu", -96, 20, -84, 29, os.path.join(tmp_path, "r.tif"), count=2
+        )
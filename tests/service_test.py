@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.service import make_server
+from bmi_dbseabed.service import QueryService
+
+
+@pytest.fixture
+def service_url(local_services):
+    service = QueryService(cache_bytes=1024**2)
+    server = make_server(service, port=0)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def test_metadata(service_url):
+    metadata = json.loads(_get(f"{service_url}/metadata/sand"))
+    assert metadata["variable_units"] == "percent"
+    assert metadata["shape"] == [52, 72]
+
+
+def test_sample(service_url, local_services):
+    values = json.loads(
+        _get(f"{service_url}/sample/sand?point=-90.1,25.1&point=-97.9,30.9&point=0,0")
+    )["values"]
+
+    # cell centers are at -98.125 + 0.25 * col and 30.875 - 0.25 * row
+    assert values[0] == pytest.approx(float(local_services["sand"][23, 31]))
+    assert values[1:] == [None, None]
+
+
+def test_clip(service_url, tmp_path):
+    expected = DbSeabed().get_data(
+        "sand", -96, 20, -84, 29, os.path.join(tmp_path, "expected.tif")
+    )
+
+    def clip(_):
+        return _get(f"{service_url}/clip/sand?bbox=-96,20,-84,29")
+
+    # concurrent clients share the cached blocks
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(clip, range(8)))
+
+    assert len(set(responses)) == 1
+    path = os.path.join(tmp_path, "clip.tif")
+    with open(path, "wb") as fp:
+        fp.write(responses[0])
+    with rasterio.open(path) as src:
+        numpy.testing.assert_array_equal(src.read(1), expected[0].values)
+
+    metrics = json.loads(_get(f"{service_url}/metrics"))
+    assert metrics["cache"]["hits"] > metrics["cache"]["misses"] > 0
+    assert metrics["queries"]["clip[sand]"]["calls"] == 8
+
+
+def test_errors(service_url):
+    for path in ("clip/error?bbox=0,0,1,1", "clip/sand?bbox=1,2", "unknown"):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _get(f"{service_url}/{path}")
+        assert error.value.code in (400, 404)
+        assert "error" in json.loads(error.value.read())
+
+
+def test_server_errors(local_services):
+    class FailingService(QueryService):
+        def metadata(self, var_name):
+            raise RuntimeError("Metadata failed.")
+
+        def clip(self, var_name, west, south, east, north):
+            yield b"II*\x00"
+            raise RuntimeError("Clip failed.")
+
+    service = FailingService(cache_bytes=1024**2)
+    server = make_server(service, port=0)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _get(f"{url}/metadata/sand")
+        assert error.value.code == 500
+        assert json.loads(error.value.read()) == {"error": "Metadata failed."}
+
+        # a failure during a response closes the connection before its end
+        with pytest.raises(http.client.IncompleteRead):
+            _get(f"{url}/clip/sand?bbox=-96,20,-84,29")
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_arrow(service_url, local_services):
+    pa = pytest.importorskip("pyarrow")
+
+    table = pa.ipc.open_stream(
+        _get(f"{service_url}/clip/sand?bbox=-96,20,-84,29&format=arrow")
+    ).read_all()
+    values = numpy.where(
+        local_services["sand"] == -9999, numpy.nan, local_services["sand"]
+    )[8:44, 8:56]
+    assert table.num_rows == (~numpy.isnan(values)).sum()
+
+    table = pa.ipc.open_stream(
+        _get(f"{service_url}/sample/sand?point=-90.1,25.1&format=arrow")
+    ).read_all()
+    assert table.column("sand")[0].as_py() == pytest.approx(
+        float(local_services["sand"][23, 31])
+    )
+
+
+def test_compressed_cache(local_services):
+    plain = QueryService(cache_bytes=1024**2)
+    service = QueryService(cache_bytes=1024**2, compress=True)
+    expected = b"".join(plain.clip("sand", -96, 20, -84, 29))
+    for _ in range(2):
+        assert b"".join(service.clip("sand", -96, 20, -84, 29)) == expected
+
+    stats = service.metrics()["cache"]
+    assert stats["hits"] == stats["misses"] > 0
+    assert stats["raw_bytes"] == plain.metrics()["cache"]["bytes"]
+    plain.close()
+    service.close()
+
+
+def test_metrics_concurrent(local_services):
+    service = QueryService(cache_bytes=1024**2)
+
+    def sample(index):
+        service.sample(("sand", "mud")[index % 2], [(-90.1, 25.1)])
+        return service.metrics()
+
+    # metrics are read while other threads record their first calls
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(sample, range(200)))
+
+    queries = service.metrics()["queries"]
+    assert queries["sample[sand]"]["calls"] == queries["sample[mud]"]["calls"] == 100
+    service.close()
+
+
+@pytest.mark.parametrize("method", ["clip", "clip_table"])
+def test_clip_streamed(local_services, monkeypatch, method):
+    if method == "clip_table":
+        pytest.importorskip("pyarrow")
+    from bmi_dbseabed import service as service_module
+
+    windows = []
+    original = service_module.read_cached
+
+    def read_cached(cache, key, src, window, *args, **kwargs):
+        windows.append(window)
+        return original(cache, key, src, window, *args, **kwargs)
+
+    monkeypatch.setattr(service_module, "read_cached", read_cached)
+    service = QueryService(cache_bytes=1024**2)
+
+    # the bounding box covers 36 rows, read in strips of 8 as they are sent
+    pieces = getattr(service, method)("sand", -96, 20, -84, 29, rows=8)
+    next(pieces)
+    assert len(windows) <= 1
+    data = b"".join(pieces)
+    assert data
+    assert [window.height for window in windows] == [8, 8, 8, 8, 4]
+    assert {window.width for window in windows} == {48}
+    service.close()
+
+
+def test_clip_strips(local_services, tmp_path):
+    service = QueryService(cache_bytes=1024**2)
+    path = os.path.join(tmp_path, "clip.tif")
+    with open(path, "wb") as fp:
+        for piece in service.clip("sand", -96, 20, -84, 29, rows=8):
+            fp.write(piece)
+    expected = numpy.where(
+        local_services["sand"] == -9999, numpy.nan, local_services["sand"]
+    )[8:44, 8:56]
+    with rasterio.open(path) as src:
+        numpy.testing.assert_array_equal(src.read(1), expected)
+        assert src.block_shapes == [(8, 48)]
+        assert src.bounds == (-96.0, 20.0, -84.0, 29.0)
+    service.close()
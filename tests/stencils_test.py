@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import blocks
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.stencils import apply
+from bmi_dbseabed.stencils import gradient
+from bmi_dbseabed.stencils import METRES_PER_DEGREE
+from bmi_dbseabed.stencils import roughness
+from bmi_dbseabed.stencils import StencilProcessor
+from bmi_dbseabed.stencils import variability
+from rasterio.windows import Window
+
+from .conftest import RES
+
+
+def test_read_halo(local_services):
+    with rasterio.open(DbSeabed.DATA_SERVICES["rock"]["link"]) as src:
+        whole = blocks.read_block(src, Window(0, 0, src.width, src.height))
+        padded = numpy.pad(whole, 3, constant_values=numpy.nan)
+        for window in (Window(0, 0, 10, 10), Window(60, 40, 12, 12)):
+            numpy.testing.assert_array_equal(
+                blocks.read_halo(src, window, 3),
+                padded[
+                    window.row_off : window.row_off + window.height + 6,
+                    window.col_off : window.col_off + window.width + 6,
+                ],
+            )
+
+
+def test_known_values():
+    # a ramp rising by 3 per cell to the east and 4 per cell to the north
+    rows, cols = numpy.mgrid[0:5, 0:6]
+    values = (3.0 * cols - 4.0 * rows).astype("float32")
+    result = apply(gradient(), values, (1.0, 1.0))
+    numpy.testing.assert_allclose(result[1:-1, 1:-1], 5.0)
+    assert numpy.isnan(result[0]).all()
+    result = apply(gradient(radius=2), values, (1.0, 1.0))
+    numpy.testing.assert_allclose(result[2:-2, 2:-2], 5.0)
+
+    # on a 1 degree grid at 60 degrees north, a degree of longitude is half
+    # as long as a degree of latitude
+    result = apply(gradient(), values, (1.0, 1.0), lat=numpy.full(5, 60.0))
+    numpy.testing.assert_allclose(
+        result[1:-1, 1:-1], numpy.hypot(6.0, 4.0) / METRES_PER_DEGREE, rtol=1e-6
+    )
+    with pytest.raises(ValueError, match="Please provide a radius"):
+        gradient(radius=0)
+
+    result = apply(roughness(), values, (1.0, 1.0))
+    assert result[2, 2] == 2 * 3 + 2 * 4
+    # corners see only their valid neighbours
+    assert result[0, 0] == 3 + 4
+
+    values[2, 2] = numpy.nan
+    result = apply(variability(), values, (1.0, 1.0))
+    assert numpy.isnan(result[2, 2])
+    expected = numpy.nanstd(values[0:3, 1:4])
+    assert result[1, 2] == pytest.approx(expected, rel=1e-6)
+
+
+@pytest.mark.parametrize(
+    "stencil", [gradient(), variability(radius=2), roughness(radius=3)]
+)
+def test_blocks_match_whole_array(local_services, stencil):
+    with rasterio.open(DbSeabed.DATA_SERVICES["grainsize"]["link"]) as src:
+        whole = apply(
+            stencil,
+            blocks.read_block(src, Window(0, 0, src.width, src.height)),
+            (RES, RES),
+            lat=src.xy(numpy.arange(src.height), 0)[1],
+        )
+        window = Window(5, 7, 50, 40)
+        for processor in (
+            StencilProcessor(stencil),
+            StencilProcessor(stencil, workers=4, block_shape=(10, 12)),
+        ):
+            numpy.testing.assert_array_equal(
+                processor.read(src, Window(0, 0, src.width, src.height)), whole
+            )
+            numpy.testing.assert_array_equal(
+                processor.read(src, window), whole[7:47, 5:55]
+            )
+    assert not numpy.isnan(whole).all()
+
+
+def test_get_stencil(local_services, tmp_path):
+    output = os.path.join(tmp_path, "roughness.tif")
+    dbseabed = DbSeabed()
+    dataset = dbseabed.get_stencil(
+        "rock", "roughness", -96, 20, -84, 29, output, radius=2, workers=2
+    )
+
+    with rasterio.open(DbSeabed.DATA_SERVICES["rock"]["link"]) as src:
+        whole = apply(
+            roughness(2),
+            blocks.read_block(src, Window(0, 0, src.width, src.height)),
+            (RES, RES),
+        )
+    numpy.testing.assert_array_equal(dataset[0].values, whole[8:44, 8:56])
+    assert dbseabed.metadata["stencil"] == "roughness"
+    assert dbseabed.metadata["halo"] == 2
+    assert dbseabed.metadata["variable_units"] == "percent"
+
+    dbseabed.get_stencil("grainsize", "gradient", -96, 20, -84, 29, output)
+    assert dbseabed.metadata["variable_units"] == "phi per metre"
+
+    with pytest.raises(ValueError, match="Please provide a valid stencil name"):
+        dbseabed.get_stencil("rock", "slope", -96, 20, -84, 29, output)
+    with pytest.raises(ValueError, match="Please provide a radius"):
+        dbseabed.get_stencil("rock", "variability", -96, 20, -84, 29, output, 0)
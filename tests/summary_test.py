@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import pytest
+import rasterio
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed import summary
+from bmi_dbseabed.summary import SummaryIndex
+
+from .conftest import NODATA
+from .conftest import write_synthetic_tif
+
+
+@pytest.fixture
+def gradient(tmp_path):
+    # values increase from west to east, so most blocks are within or out of
+    # a range and few straddle its bounds
+    values = numpy.tile(numpy.linspace(0, 100, 72, dtype="float32"), (52, 1))
+    values[:13, :24] = NODATA
+    path = write_synthetic_tif(tmp_path / "gradient.tif", values)
+    values[values == NODATA] = numpy.nan
+    return path, values
+
+
+@pytest.mark.parametrize("value_range", [None, (0.0, 100.0)])
+def test_summary(gradient, value_range):
+    path, values = gradient
+    with rasterio.open(path) as src:
+        index = SummaryIndex.build(src, bins=10, value_range=value_range)
+
+    result = index.summary()
+    assert len(index.windows) == 4 * 5
+    assert result["count"] == numpy.count_nonzero(~numpy.isnan(values))
+    assert result["min"] == numpy.nanmin(values)
+    assert result["max"] == numpy.nanmax(values)
+    assert result["mean"] == pytest.approx(numpy.nanmean(values))
+    assert sum(result["histogram"]) == result["count"]
+    assert result["edges"][0] == 0.0 and result["edges"][-1] == 100.0
+
+
+def test_count_range(gradient, monkeypatch):
+    path, values = gradient
+    with rasterio.open(path) as src:
+        index = SummaryIndex.build(src, value_range=(0.0, 100.0))
+
+        reads = []
+        read_block = summary.blocks.read_block
+        monkeypatch.setattr(
+            summary.blocks,
+            "read_block",
+            lambda *args: reads.append(args) or read_block(*args),
+        )
+        count = index.count_range(src, low=20, high=40)
+
+    assert count == numpy.count_nonzero((values >= 20) & (values <= 40))
+    # only the column of blocks around each bound is read
+    assert 0 < len(reads) <= 2 * 4
+
+
+def test_select(gradient):
+    path, values = gradient
+    with rasterio.open(path) as src:
+        index = SummaryIndex.build(src, value_range=(0.0, 100.0))
+        x, y, selected = index.select(src, low=60)
+        transform = src.transform
+
+    rows, cols = numpy.nonzero(values >= 60)
+    assert selected.size == rows.size
+    assert (selected >= 60).all()
+    expected = sorted(zip(transform.c + (cols + 0.5) * transform.a, values[rows, cols]))
+    assert sorted(zip(x, selected)) == expected
+    assert set(y) <= set(transform.f + (rows + 0.5) * transform.e)
+
+
+def test_build_index_persists(local_services, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    expected = DbSeabed(cache_dir=cache_dir).summary("grainsize")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("index built again")
+
+    monkeypatch.setattr(SummaryIndex, "build", fail)
+    dbseabed = DbSeabed(cache_dir=cache_dir)
+    assert dbseabed.summary("grainsize") == expected
+
+    values = local_services["grainsize"]
+    valid = values[values != NODATA]
+    assert expected["count"] == valid.size
+    assert dbseabed.count("grainsize", high=50) == numpy.count_nonzero(valid <= 50)
+    _, _, selected = dbseabed.select("grainsize", low=50, high=60)
+    assert sorted(selected) == sorted(valid[(valid >= 50) & (valid <= 60)])
+
+
+def test_save_concurrent(gradient, tmp_path, monkeypatch):
+    path, _ = gradient
+    with rasterio.open(path) as src:
+        index = SummaryIndex.build(src, bins=8)
+    path = str(tmp_path / "index" / "gradient.npz")
+
+    # writers of the same index do not share a temporary file
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: index.save(path), range(16)))
+
+    numpy.testing.assert_array_equal(SummaryIndex.load(path).count, index.count)
+    assert os.listdir(tmp_path / "index") == ["gradient.npz"]
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(numpy, "savez", fail)
+    with pytest.raises(OSError, match="disk full"):
+        index.save(path)
+    assert os.listdir(tmp_path / "index") == ["gradient.npz"]
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+
+import numpy
+import pytest
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.cli import main
+from click.testing import CliRunner
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _expected(local_services, var_names):
+    # rows 8:44 and columns 8:56 of the synthetic rasters are in the bbox
+    columns = {
+        name: numpy.where(
+            local_services[name] == -9999, numpy.nan, local_services[name]
+        )[8:44, 8:56]
+        for name in var_names
+    }
+    valid = numpy.zeros((36, 48), dtype=bool)
+    for values in columns.values():
+        valid |= ~numpy.isnan(values)
+    return columns, valid
+
+
+def test_get_table_parquet(local_services, tmp_path):
+    output = os.path.join(tmp_path, "table.parquet")
+    parquet = DbSeabed().get_table(
+        ["sand", "mud"], -96, 20, -84, 29, output=output, row_group_size=500
+    )
+    table = parquet.read()
+    columns, valid = _expected(local_services, ["sand", "mud"])
+
+    assert table.column_names == ["x", "y", "sand", "mud"]
+    assert table.num_rows == valid.sum()
+    assert parquet.metadata.num_row_groups > 1
+    assert (
+        max(
+            parquet.metadata.row_group(index).num_rows
+            for index in range(parquet.metadata.num_row_groups)
+        )
+        <= 500
+    )
+    numpy.testing.assert_array_equal(
+        table.column("sand").to_numpy(), columns["sand"][valid]
+    )
+    x = -98 + 0.125 + 0.25 * numpy.arange(8, 56)
+    numpy.testing.assert_allclose(
+        table.column("x").to_numpy(), numpy.broadcast_to(x, (36, 48))[valid]
+    )
+
+
+def test_get_table_reader(local_services):
+    reader = DbSeabed().get_table("sand", -96, 20, -84, 29)
+    _, valid = _expected(local_services, ["sand"])
+
+    assert sum(batch.num_rows for batch in reader) == valid.sum()
+
+
+def test_sample(local_services):
+    batch = DbSeabed().sample(["sand", "mud"], [(-90.1, 25.1), (0, 0)])
+
+    assert batch.column("sand")[0].as_py() == pytest.approx(
+        float(local_services["sand"][23, 31])
+    )
+    assert numpy.isnan(batch.column("mud")[1].as_py())
+
+
+def test_cli_parquet(local_services, tmp_path):
+    import pyarrow.parquet as pq
+
+    output = os.path.join(tmp_path, "sand.parquet")
+    result = CliRunner().invoke(
+        main, ["--var_name=sand,mud", "--bbox=-96,20,-84,29", output]
+    )
+
+    assert result.exit_code == 0
+    assert pq.read_table(output).column_names == ["x", "y", "sand", "mud"]
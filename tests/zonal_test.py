@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import numpy
+import pytest
+from bmi_dbseabed import DbSeabed
+from bmi_dbseabed.zonal import QuantileSketch
+
+
+def test_quantile_sketch():
+    values = numpy.random.default_rng(1).normal(size=200000)
+    sketch = QuantileSketch(capacity=512, seed=0)
+    for chunk in numpy.array_split(values, 37):
+        sketch.update(chunk)
+
+    for q in (5, 25, 50, 75, 95):
+        assert sketch.quantile(q) == pytest.approx(
+            numpy.percentile(values, q), abs=0.05
+        )
+
+
+def test_zonal_stats(local_services):
+    polygon = {
+        "type": "Polygon",
+        "coordinates": [[(-95, 20), (-85, 20), (-85, 29), (-95, 20)]],
+    }
+    stats = DbSeabed().zonal_stats(
+        "sand",
+        {"box": (-97, 19, -90, 30), "triangle": polygon, "outside": (0, 0, 1, 1)},
+        percentiles=(50,),
+    )
+
+    # cell centers of the synthetic 0.25 degree grid starting at -98, 31
+    values = numpy.where(
+        local_services["sand"] == -9999, numpy.nan, local_services["sand"]
+    )
+    x = -98 + 0.125 + 0.25 * numpy.arange(values.shape[1])
+    y = 31 - 0.125 - 0.25 * numpy.arange(values.shape[0])
+    in_box = numpy.logical_and.outer((y >= 19) & (y <= 30), (x >= -97) & (x <= -90))
+    box = values[in_box & ~numpy.isnan(values)]
+
+    assert stats["box"]["count"] == box.size
+    assert stats["box"]["mean"] == pytest.approx(box.mean(), rel=1e-5)
+    assert stats["box"]["max"] == pytest.approx(box.max())
+    assert stats["box"]["p50"] == pytest.approx(numpy.median(box), abs=0.5)
+    assert 0 < stats["triangle"]["count"] < values.size
+    assert stats["outside"]["count"] == 0
+
+
+def test_zonal_stats_invalid_var_name():
+    with pytest.raises(ValueError, match="Please provide a valid var_name value."):
+        DbSeabed().zonal_stats("error", [(-97, 19, -90, 30)])